@@ -0,0 +1,56 @@
+"""Сравнение последовательной рассылки и BroadcastEngine на локальном фейковом API.
+
+Запуск: python -m benchmarks.bench_broadcast --users 2000 --latency 0.02
+"""
+import argparse
+import json
+import time
+
+import telebot
+
+from benchmarks.fake_api import FakeBotApi
+from bot.broadcast import BroadcastEngine
+
+MESSAGE = "Время пить воду!"
+
+
+def run_sequential(bot, chat_ids):
+    start = time.perf_counter()
+    for chat_id in chat_ids:
+        bot.send_message(chat_id, MESSAGE)
+    return time.perf_counter() - start
+
+
+def run_engine(bot, chat_ids, workers, rate):
+    engine = BroadcastEngine(bot, workers=workers, rate=rate)
+    stats = engine.broadcast(chat_ids, MESSAGE)
+    engine.executor.shutdown()
+    return stats.duration
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--workers", type=int, default=16)
+    parser.add_argument("--rate", type=float, default=1000)
+    args = parser.parse_args()
+
+    chat_ids = list(range(1, args.users + 1))
+    with FakeBotApi(latency=args.latency):
+        bot = telebot.TeleBot("123:fake", threaded=False)
+        sequential = run_sequential(bot, chat_ids)
+        engine = run_engine(bot, chat_ids, args.workers, args.rate)
+
+    print(json.dumps({
+        "users": args.users,
+        "latency": args.latency,
+        "sequential_s": round(sequential, 3),
+        "sequential_msg_s": round(args.users / sequential, 1),
+        "engine_s": round(engine, 3),
+        "engine_msg_s": round(args.users / engine, 1),
+    }, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""Диспетчеризация обновлений: цепочка фильтров TeleBot против CommandRouter.
+
+Регистрируется тот же набор команд, что в main.py, плюс echo_all в конце.
+Проигрывается смесь обновлений, похожая на реальную: чаще всего /start,
+/next, /status и обычный текст, реже остальные команды.
+Запуск: python -m benchmarks.bench_dispatch --updates 50000
+"""
+import argparse
+import json
+import random
+import time
+
+import telebot
+from telebot import types
+
+from bot.router import route_commands
+
+COMMANDS = [
+    "start", "about", "ping", "sum", "max", "confirm", "subscribe", "unsubscribe", "status",
+    "next", "schedule", "timezone", "times", "metrics", "test", "hide", "show",
+]
+# Доли в смеси: None - текст без команды, уходит в echo_all
+UPDATE_MIX = {
+    "start": 15, "next": 15, "status": 10, "subscribe": 8, "schedule": 6, "sum": 5, "max": 3,
+    "unsubscribe": 3, "times": 2, "timezone": 2, "hide": 1, "show": 1, "ping": 1, None: 28,
+}
+
+
+def make_bot(routed):
+    bot = telebot.TeleBot("123:fake", threaded=False)
+    if routed:
+        route_commands(bot)
+    handled = {}
+
+    def register(command):
+        @bot.message_handler(commands=[command])
+        def handler(message):
+            handled[command] = handled.get(command, 0) + 1
+
+    for command in COMMANDS:
+        register(command)
+    bot.message_handler(commands=["help"])(lambda message: None)
+
+    @bot.message_handler(func=lambda message: True)
+    def echo_all(message):
+        handled[None] = handled.get(None, 0) + 1
+
+    return bot, handled
+
+
+def make_updates(count, seed=1):
+    rng = random.Random(seed)
+    kinds = list(UPDATE_MIX)
+    weights = list(UPDATE_MIX.values())
+    updates = []
+    for update_id, kind in enumerate(rng.choices(kinds, weights, k=count)):
+        text = f"/{kind} 1 2 3" if kind else "привет"
+        updates.append(types.Update.de_json({
+            "update_id": update_id,
+            "message": {
+                "message_id": update_id,
+                "date": 0,
+                "chat": {"id": update_id % 100, "type": "private"},
+                "from": {"id": update_id % 100, "is_bot": False, "first_name": "User"},
+                "text": text,
+            },
+        }))
+    return updates
+
+
+def run(routed, updates, batch=100):
+    bot, handled = make_bot(routed)
+    start = time.perf_counter()
+    for i in range(0, len(updates), batch):
+        bot.process_new_updates(updates[i:i + batch])
+    duration = time.perf_counter() - start
+    return handled, round(len(updates) / duration, 1)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--updates", type=int, default=50000)
+    args = parser.parse_args()
+
+    updates = make_updates(args.updates)
+    chain_handled, chain_rate = run(False, updates)
+    routed_handled, routed_rate = run(True, updates)
+    assert chain_handled == routed_handled
+
+    print(json.dumps({
+        "updates": args.updates,
+        "filter_chain_updates_s": chain_rate,
+        "router_updates_s": routed_rate,
+    }, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+"""Сквозной бенчмарк main.py на локальном фейковом Bot API.
+
+Бот собирается через create_app и получает обновления обычным long
+polling из FakeBotApi, ответы приходят в тот же фейковый API. Сценарии:
+  next, sum   - задержка от появления обновления до ответа (p50/p95)
+  replay      - пропускная способность на смеси команд от разных чатов
+  broadcast   - рассылка напоминания --users подписчикам
+Задержка API и 429 на каждый N-й вызов задаются флагами. Результат -
+JSON в stdout и в --output; --compare сравнивает с прошлым прогоном и
+завершается с кодом 1 при ухудшении больше --tolerance.
+Лимиты Outbox, рассылки и FloodControl подняты, чтобы мерить сам путь
+обновления, а не настроенные ограничения.
+Запуск: python -m benchmarks.bench_e2e --output e2e.json --compare e2e-base.json
+"""
+import argparse
+import json
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+from benchmarks.fake_api import FakeBotApi
+
+SCENARIOS = ("next", "sum", "replay", "broadcast")
+SETTINGS = {
+    "BOT_TOKEN": "123:fake",
+    "SUBSCRIBERS_DB": ":memory:",
+    "INTAKE_DIR": "",
+    "METRICS_PORT": "0",
+    "OUTBOX_RATE": "100000",
+    "BROADCAST_RATE": "100000",
+    "FLOOD_GLOBAL_RATE": "1000000",
+}
+# Смесь команд для replay: каждая дает ровно один sendMessage
+REPLAY_MIX = ("/start", "/next", "/status", "/sum 1 2 3", "/schedule", "/subscribe", "привет", "/max 5 -2 7")
+
+
+def message_update(chat_id, text):
+    return {"message": {
+        "message_id": 1,
+        "date": int(time.time()),
+        "chat": {"id": chat_id, "type": "private"},
+        "from": {"id": chat_id, "is_bot": False, "first_name": "User"},
+        "text": text,
+    }}
+
+
+def start_app(log_level):
+    for name, value in SETTINGS.items():
+        os.environ.setdefault(name, value)
+    os.environ.setdefault("LOG_FILE", os.path.join(tempfile.gettempdir(), "bench_e2e.log"))
+    import main
+
+    main.create_app()
+    logging.getLogger().setLevel(log_level)
+    thread = threading.Thread(
+        target=main.bot.infinity_polling, kwargs={"timeout": 5, "long_polling_timeout": 1}, daemon=True
+    )
+    thread.start()
+    return main
+
+
+def percentiles(latencies):
+    latencies = sorted(latencies)
+    return {
+        "count": len(latencies),
+        "p50_ms": round(statistics.median(latencies) * 1000, 2),
+        "p95_ms": round(latencies[int(len(latencies) * 0.95)] * 1000, 2),
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 2),
+    }
+
+
+def command_latency(api, text, count, first_chat, timeout):
+    latencies = []
+    for i in range(count):
+        expected = api.calls.get("sendMessage", 0) + 1
+        start = time.perf_counter()
+        api.push_update(message_update(first_chat + i, text))
+        if not api.wait_calls("sendMessage", expected, timeout):
+            raise RuntimeError(f"Нет ответа на {text} за {timeout} с")
+        latencies.append(time.perf_counter() - start)
+    return percentiles(latencies)
+
+
+def replay(api, count, first_chat, timeout):
+    expected = api.calls.get("sendMessage", 0) + count
+    start = time.perf_counter()
+    for i in range(count):
+        api.push_update(message_update(first_chat + i, REPLAY_MIX[i % len(REPLAY_MIX)]))
+    if not api.wait_calls("sendMessage", expected, timeout):
+        raise RuntimeError(f"Обработано меньше {count} обновлений за {timeout} с")
+    duration = time.perf_counter() - start
+    return {"updates": count, "updates_s": round(count / duration, 1), "duration_ms": round(duration * 1000, 1)}
+
+
+def broadcast(app, api, users, first_chat):
+    for chat_id in range(first_chat, first_chat + users):
+        app.subscribers.add(chat_id)
+    recipients = len(app.subscribers)
+    calls = api.calls.get("sendMessage", 0)
+    rate_limited = api.rate_limited
+    start = time.perf_counter()
+    thread = app.scheduler.send_water_reminder()
+    if thread is not None:
+        thread.join()
+    duration = time.perf_counter() - start
+    rate_limited = api.rate_limited - rate_limited
+    sent = api.calls.get("sendMessage", 0) - calls - rate_limited
+    return {
+        "recipients": recipients,
+        "sent": sent,
+        "rate_limited": rate_limited,
+        "msg_s": round(sent / duration, 1),
+        "duration_ms": round(duration * 1000, 1),
+    }
+
+
+def flatten(results):
+    return {
+        f"{scenario}.{name}": value
+        for scenario, values in results.items()
+        for name, value in values.items()
+    }
+
+
+def compare(current, baseline, tolerance):
+    """Ухудшения метрик: *_ms больше - хуже, *_s меньше - хуже"""
+    regressions = []
+    if baseline.get("settings") != current["settings"]:
+        print(f"Настройки прогонов различаются: {baseline.get('settings')}", file=sys.stderr)
+    base = flatten(baseline["results"])
+    for key, value in flatten(current["results"]).items():
+        old = base.get(key)
+        if not old:
+            continue
+        change = (value - old) / old
+        worse = change > tolerance if key.endswith("_ms") else change < -tolerance if key.endswith("_s") else False
+        print(f"{key:<28} {old:>12} -> {value:<12} {change:+.1%}{'  ХУЖЕ' if worse else ''}", file=sys.stderr)
+        if worse:
+            regressions.append(key)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--latency", type=float, default=0.005)
+    parser.add_argument("--rate-limit-every", type=int, default=0)
+    parser.add_argument("--retry-after", type=int, default=1)
+    parser.add_argument("--commands", type=int, default=200)
+    parser.add_argument("--updates", type=int, default=2000)
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--output")
+    parser.add_argument("--compare")
+    parser.add_argument("--tolerance", type=float, default=0.1)
+    parser.add_argument("--log-level", default="WARNING")
+    args = parser.parse_args()
+    scenarios = [name for name in args.scenarios.split(",") if name]
+
+    api = FakeBotApi(latency=args.latency, rate_limit_every=args.rate_limit_every, retry_after=args.retry_after)
+    with api:
+        app = start_app(args.log_level)
+        results = {}
+        # У каждого сценария свои chat_id, чтобы не срабатывал FloodControl
+        if "next" in scenarios:
+            results["next"] = command_latency(api, "/next", args.commands, 10_000, args.timeout)
+        if "sum" in scenarios:
+            results["sum"] = command_latency(api, "/sum 1 2 3 4 5", args.commands, 20_000, args.timeout)
+        if "replay" in scenarios:
+            results["replay"] = replay(api, args.updates, 100_000, args.timeout)
+        if "broadcast" in scenarios:
+            results["broadcast"] = broadcast(app, api, args.users, 1_000_000)
+        app.bot.stop_polling()
+
+    report = {
+        "settings": {
+            "latency": args.latency,
+            "rate_limit_every": args.rate_limit_every,
+            "retry_after": args.retry_after,
+            "commands": args.commands,
+            "updates": args.updates,
+            "users": args.users,
+            "python": sys.version.split()[0],
+        },
+        "results": results,
+    }
+    print(json.dumps(report, ensure_ascii=False))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""Цена фильтра FloodControl на одно обновление и память при большом числе чатов.
+
+Проигрывается поток обновлений от множества чатов, среди которых несколько
+шумных чатов шлют одно и то же и /test. Сравнивается число вызовов
+обработчиков без фильтра и с ним.
+Запуск: python -m benchmarks.bench_flood --updates 50000 --chats 20000
+"""
+import argparse
+import json
+import time
+import tracemalloc
+
+import telebot
+from telebot import types
+
+from bot.flood import FloodControl, limit_flood
+from bot.router import route_commands
+
+NOISY_CHATS = 10
+
+
+def make_updates(count, chats):
+    updates = []
+    for update_id in range(count):
+        if update_id % 2:
+            chat_id = update_id % NOISY_CHATS
+            text = "/test" if update_id % 6 == 1 else "спам"
+        else:
+            chat_id = NOISY_CHATS + update_id % chats
+            text = "/start"
+        updates.append(types.Update.de_json({
+            "update_id": update_id,
+            "message": {
+                "message_id": update_id,
+                "date": 0,
+                "chat": {"id": chat_id, "type": "private"},
+                "from": {"id": chat_id, "is_bot": False, "first_name": "User"},
+                "text": text,
+            },
+        }))
+    return updates
+
+
+def run(updates, flood=None, batch=100):
+    bot = telebot.TeleBot("123:fake", threaded=False)
+    if flood is not None:
+        limit_flood(bot, flood)
+    route_commands(bot)
+    handled = [0]
+
+    def handler(message):
+        handled[0] += 1
+
+    bot.message_handler(commands=["start"])(handler)
+    bot.message_handler(commands=["test"])(handler)
+    bot.message_handler(func=lambda message: True)(handler)
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    for i in range(0, len(updates), batch):
+        bot.process_new_updates(updates[i:i + batch])
+    duration = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {"handled": handled[0], "updates_s": round(len(updates) / duration, 1), "peak_kb": peak // 1024}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--updates", type=int, default=50000)
+    parser.add_argument("--chats", type=int, default=20000)
+    args = parser.parse_args()
+
+    updates = make_updates(args.updates, args.chats)
+    # Общий лимит не должен мешать замеру: проверяются лимиты чатов и команд
+    flood = FloodControl(global_rate=1e9, admin_only={"test"}, max_entries=args.chats // 2)
+    print(json.dumps({
+        "updates": args.updates,
+        "chats": args.chats,
+        "no_filter": run(updates),
+        "flood_control": run(updates, flood),
+        "tracked_entries": len(flood.buckets),
+    }, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
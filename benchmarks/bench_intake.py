@@ -0,0 +1,96 @@
+"""/stats по журналу воды: построчный разбор файла корзины в Python против
+маски numpy по memmap и bincount по дням.
+
+Журнал заполняется сразу массивами numpy: rows записей по chats чатам
+за days дней, распределенных по корзинам как в IntakeLog.
+Запуск: python -m benchmarks.bench_intake --rows 20000000 --chats 200000
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from bot.intake import DAY, RECORD, RECORD_DTYPE, IntakeLog
+
+
+def fill(log, rows, chats, days, now):
+    rng = np.random.default_rng(1)
+    data = np.empty(rows, dtype=np.dtype(RECORD_DTYPE))
+    data["chat_id"] = rng.integers(1, chats + 1, rows)
+    data["ts"] = now - rng.integers(0, days * DAY, rows)
+    data["ml"] = rng.choice([0, 250, 250, 250, 330, 500], rows)
+    buckets = data["chat_id"] % log.buckets
+    order = np.argsort(buckets, kind="stable")
+    data, buckets = data[order], buckets[order]
+    bounds = np.searchsorted(buckets, np.arange(log.buckets + 1))
+    for bucket in range(log.buckets):
+        data[bounds[bucket]:bounds[bucket + 1]].tofile(log._path(bucket))
+
+
+def legacy_stats(log, chat_id, now):
+    """Разбор корзины по записям и сумма по дням в словаре"""
+    with open(log._path(chat_id % log.buckets), "rb") as f:
+        raw = f.read()
+    totals = {}
+    for row_chat, ts, ml in RECORD.iter_unpack(raw):
+        if row_chat == chat_id:
+            day = ts // DAY
+            totals[day] = totals.get(day, 0) + ml
+    today = int(now) // DAY
+    week = [totals.get(day, 0) for day in range(today - 6, today + 1)]
+    streak = 0
+    day = today if totals.get(today) else today - 1
+    while totals.get(day):
+        streak += 1
+        day -= 1
+    return week, streak
+
+
+def measure(func, chat_ids):
+    start = time.perf_counter()
+    for chat_id in chat_ids:
+        func(chat_id)
+    return round((time.perf_counter() - start) / len(chat_ids) * 1000, 2)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=20_000_000)
+    parser.add_argument("--chats", type=int, default=200_000)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--queries", type=int, default=20)
+    args = parser.parse_args()
+
+    now = int(time.time())
+    with tempfile.TemporaryDirectory() as directory:
+        log = IntakeLog(directory)
+        fill(log, args.rows, args.chats, args.days, now)
+        chat_ids = list(range(1, args.queries + 1))
+
+        for chat_id in chat_ids[:3]:
+            stats = log.stats(chat_id, now=now)
+            assert (stats.week, stats.streak) == legacy_stats(log, chat_id, now)
+
+        appends = 100_000
+        start = time.perf_counter()
+        for i in range(appends):
+            log.append(i % args.chats, 250, now)
+        log.flush()
+        append_rate = round(appends / (time.perf_counter() - start))
+
+        size = sum(os.path.getsize(log._path(bucket)) for bucket in range(log.buckets))
+        print(json.dumps({
+            "rows": args.rows + appends,
+            "log_mb": round(size / 2 ** 20, 1),
+            "bucket_rows": (args.rows + appends) // log.buckets,
+            "legacy_stats_ms": measure(lambda chat_id: legacy_stats(log, chat_id, now), chat_ids),
+            "numpy_stats_ms": measure(lambda chat_id: log.stats(chat_id, now=now), chat_ids),
+            "appends_s": append_rate,
+        }, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""Время рассылки с логированием и без.
+
+Сравниваются три варианта на боте-заглушке без сети, чтобы была видна
+только цена логирования:
+  off    - логирование выключено;
+  sync   - прежняя схема: FileHandler в вызывающем потоке и INFO-строка
+           с f-строкой на каждого получателя;
+  queue  - QueueHandler/QueueListener и итог рассылки одной строкой.
+Запуск: python -m benchmarks.bench_logging --users 20000
+"""
+import argparse
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import tempfile
+
+from bot.broadcast import BroadcastEngine
+
+FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+
+class NullBot:
+    def __init__(self, log_each=None):
+        self.log_each = log_each
+
+    def send_message(self, chat_id, text, **kwargs):
+        if self.log_each:
+            self.log_each.info(f"Напоминание отправлено пользователю {chat_id}")
+
+
+def configure(mode, path):
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    listener = None
+    if mode == "off":
+        root.setLevel(logging.CRITICAL)
+        return None
+    root.setLevel(logging.INFO)
+    file_handler = logging.FileHandler(path, encoding="utf-8")
+    file_handler.setFormatter(logging.Formatter(FORMAT))
+    if mode == "sync":
+        root.addHandler(file_handler)
+    else:
+        log_queue = queue.SimpleQueue()
+        root.addHandler(logging.handlers.QueueHandler(log_queue))
+        listener = logging.handlers.QueueListener(log_queue, file_handler)
+        listener.start()
+    return listener
+
+
+def run(mode, users, workers, path):
+    listener = configure(mode, path)
+    log_each = logging.getLogger("bench") if mode == "sync" else None
+    engine = BroadcastEngine(NullBot(log_each), workers=workers, rate=10 ** 9)
+    stats = engine.broadcast(range(users), "Время пить воду!")
+    engine.executor.shutdown()
+    if listener:
+        listener.stop()
+    return round(stats.duration, 3)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=20000)
+    parser.add_argument("--workers", type=int, default=8)
+    args = parser.parse_args()
+
+    results = {"users": args.users}
+    with tempfile.TemporaryDirectory() as tmp:
+        for mode in ("off", "sync", "queue"):
+            results[f"{mode}_s"] = run(mode, args.users, args.workers, os.path.join(tmp, f"{mode}.log"))
+    print(json.dumps(results))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Пропускная способность /next: старый get_next_reminder_time против NextReminderReply.
+
+Переходы через конец месяца, года и летнее время проверяет
+tests/test_user_schedule.py; здесь только считается, где падала старая версия.
+Запуск: python -m benchmarks.bench_next --calls 200000
+"""
+import argparse
+import json
+import time
+from datetime import datetime
+
+from bot.user_schedule import CompiledSchedule, NextReminderReply, format_next_reminder
+
+TIMES = ["09:00", "13:00", "15:00", "17:00", "23:00"]
+
+
+def legacy_next(current_time):
+    """Прежняя реализация: strptime на каждый вызов и day + 1 при переходе"""
+    for time_str in TIMES:
+        reminder_time = datetime.strptime(time_str, "%H:%M").replace(
+            year=current_time.year,
+            month=current_time.month,
+            day=current_time.day
+        )
+        if reminder_time > current_time:
+            return reminder_time
+
+    return datetime.strptime(TIMES[0], "%H:%M").replace(
+        year=current_time.year,
+        month=current_time.month,
+        day=current_time.day + 1
+    )
+
+
+def legacy_reply():
+    now = datetime.now()
+    next_time = legacy_next(now)
+    return format_next_reminder(next_time, (next_time - now).total_seconds())
+
+
+def legacy_boundary_crashes():
+    """Сколько из граничных дат роняли старую версию (day + 1 вне месяца)"""
+    dates = [
+        datetime(2026, 1, 31, 23, 30),
+        datetime(2026, 2, 28, 23, 1),
+        datetime(2028, 2, 28, 23, 1),
+        datetime(2026, 12, 31, 23, 59),
+        datetime(2026, 6, 10, 13, 0),
+    ]
+    crashes = 0
+    for now in dates:
+        try:
+            legacy_next(now)
+        except ValueError:
+            crashes += 1
+    return len(dates), crashes
+
+
+def measure(func, calls):
+    start = time.perf_counter()
+    for _ in range(calls):
+        func()
+    elapsed = time.perf_counter() - start
+    return round(calls / elapsed)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=200000)
+    args = parser.parse_args()
+
+    cases, legacy_failures = legacy_boundary_crashes()
+    reply = NextReminderReply(CompiledSchedule(TIMES))
+    print(json.dumps({
+        "boundary_cases": cases,
+        "legacy_boundary_crashes": legacy_failures,
+        "legacy_calls_per_s": measure(legacy_reply, args.calls),
+        "cached_calls_per_s": measure(reply.get, args.calls),
+    }))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""Задержка ответа на команду во время массовой рассылки: бот напрямую
+против очереди Outbox с полосами приоритета, на локальном фейковом API.
+
+Запуск: python -m benchmarks.bench_outbox --users 2000 --latency 0.02
+"""
+import argparse
+import json
+import statistics
+import threading
+import time
+
+import telebot
+
+from benchmarks.fake_api import FakeBotApi
+from bot.broadcast import BroadcastEngine, TokenBucket
+from bot.outbox import BULK, Outbox, QueuedBot
+
+MESSAGE = "Время пить воду!"
+
+
+class SharedLimitBot:
+    """Без очереди: ответы и рассылка только делят общий лимит токена"""
+
+    def __init__(self, bot, rate):
+        self.bot = bot
+        self.bucket = TokenBucket(rate)
+
+    def send_message(self, *args, **kwargs):
+        self.bucket.acquire()
+        return self.bot.send_message(*args, **kwargs)
+
+
+def measure_replies(bot, done, interval):
+    latencies = []
+    while not done.is_set():
+        start = time.perf_counter()
+        bot.send_message(1, "/status")
+        latencies.append(time.perf_counter() - start)
+        time.sleep(interval)
+    return latencies
+
+
+def run(bot, bulk_bot, chat_ids, args):
+    # Лимит держит сам бот, у движка он заведомо выше
+    engine = BroadcastEngine(bulk_bot, workers=args.workers, rate=args.rate * 10)
+    done = threading.Event()
+    result = {}
+    replies = threading.Thread(
+        target=lambda: result.update(latencies=measure_replies(bot, done, args.interval))
+    )
+    replies.start()
+    stats = engine.broadcast(chat_ids, MESSAGE)
+    done.set()
+    replies.join()
+    engine.executor.shutdown()
+    latencies = sorted(result["latencies"])
+    return {
+        "broadcast_msg_s": round(stats.throughput, 1),
+        "reply_p50_ms": round(statistics.median(latencies) * 1000, 1),
+        "reply_p95_ms": round(latencies[int(len(latencies) * 0.95)] * 1000, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--workers", type=int, default=16)
+    parser.add_argument("--rate", type=float, default=100)
+    parser.add_argument("--interval", type=float, default=0.05)
+    args = parser.parse_args()
+
+    chat_ids = list(range(2, args.users + 2))
+    with FakeBotApi(latency=args.latency):
+        bot = telebot.TeleBot("123:fake", threaded=False)
+        shared = SharedLimitBot(bot, args.rate)
+        before = run(shared, shared, chat_ids, args)
+
+        outbox = Outbox(workers=args.workers + 2, rate=args.rate, bulk_rate=args.rate * 0.8)
+        queued_bot = QueuedBot(bot, outbox)
+        after = run(queued_bot, queued_bot.lane(BULK), chat_ids, args)
+
+    print(json.dumps({
+        "users": args.users,
+        "latency": args.latency,
+        "direct": before,
+        "outbox": after,
+    }, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
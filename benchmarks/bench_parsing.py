@@ -0,0 +1,75 @@
+"""Разбор чисел для /sum и /max на входе около 1 МБ: старый разбор
+через replace/split/списки против однопроходного int_stats.
+
+Запуск: python -m benchmarks.bench_parsing --size 1048576 --repeat 5
+"""
+import argparse
+import json
+import random
+import time
+import tracemalloc
+
+from utils.parsing import int_stats
+
+SEPARATORS = (" ", ", ", "\n")
+
+
+def legacy_parse(text):
+    """Прежний parse_ints_from_text и подсчет суммы и максимума по списку"""
+    text = text.replace(",", " ")
+    tokens = [t for t in text.split() if not t.startswith("/")]
+    result = []
+    for t in tokens:
+        cleaned_token = t.strip().lstrip("-")
+        if cleaned_token.isdigit():
+            result.append(int(t))
+    return sum(result), max(result)
+
+
+def make_input(size):
+    rng = random.Random(1)
+    parts = []
+    length = 0
+    while length < size:
+        part = str(rng.randint(-10 ** 6, 10 ** 6)) + rng.choice(SEPARATORS)
+        parts.append(part)
+        length += len(part)
+    return "".join(parts)
+
+
+def measure(func, data, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(data)
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    func(data)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {"ms": round(best * 1000, 1), "mb_s": round(len(data) / best / 2 ** 20, 1),
+            "peak_kb": peak // 1024}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size", type=int, default=2 ** 20)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    text = make_input(args.size)
+    data = text.encode()
+    stats = int_stats(data)
+    assert (stats.total, stats.maximum) == legacy_parse(text)
+
+    print(json.dumps({
+        "bytes": len(data),
+        "numbers": stats.count,
+        "legacy": measure(legacy_parse, text, args.repeat),
+        "int_stats_str": measure(int_stats, text, args.repeat),
+        "int_stats_bytes": measure(int_stats, data, args.repeat),
+    }, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
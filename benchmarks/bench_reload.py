@@ -0,0 +1,87 @@
+"""Стоимость смены расписания по умолчанию: перезагрузка настроек против
+перезапуска планировщика.
+
+Перезапуск заново строит задания таймера и индекс персональных расписаний
+из базы - O(подписчиков). Перезагрузка (apply_config в bot/scheduler.py) меняет
+только задания изменившихся слотов и общие минуты по умолчанию в
+ReminderIndex - O(слотов + поясов). Половина чатов с персональным поясом
+живет по расписанию по умолчанию, половина - со своим временем.
+Запуск: python -m benchmarks.bench_reload --users 1000,10000,100000
+"""
+import argparse
+import json
+import time
+
+from bot.reminder_config import ReminderConfig
+from bot.storage import MemorySubscriberStore
+from bot.timer import ReminderTimer
+from bot.user_schedule import UserReminders
+
+ZONES = ["Europe/Moscow", "Europe/Berlin", "Asia/Tokyo", "America/New_York", "Asia/Vladivostok"]
+OLD = ReminderConfig(["09:00", "13:00", "15:00", "17:00", "23:00"], "Пейте воду")
+NEW = ReminderConfig(["08:00", "13:00", "15:00", "18:00", "22:30"], "Пора пить воду")
+
+
+def make_store(users):
+    store = MemorySubscriberStore()
+    for chat_id in range(users):
+        store.add(chat_id)
+        store.set_schedule(chat_id, ZONES[chat_id % len(ZONES)], "07:30,12:00,19:00" if chat_id % 2 else None)
+    return store
+
+
+def restart(store, config):
+    timer = ReminderTimer()
+    for reminder_time in config.times:
+        timer.add_daily(reminder_time, lambda: None)
+    return UserReminders(store, timer, lambda chat_ids: None, config.times, "Europe/Moscow")
+
+
+def reload(jobs, timer, user_reminders, config):
+    """То же, что делает apply_config: задания только изменившихся слотов"""
+    for reminder_time in jobs.keys() - set(config.times):
+        timer.cancel(jobs.pop(reminder_time))
+    for reminder_time in config.times:
+        if reminder_time not in jobs:
+            jobs[reminder_time] = timer.add_daily(reminder_time, lambda: None)
+    user_reminders.set_default_times(config.times)
+
+
+def measure(func, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return round(best * 1000, 3)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", default="1000,10000,100000")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    results = {}
+    for users in [int(x) for x in args.users.split(",")]:
+        store = make_store(users)
+        user_reminders = restart(store, OLD)
+        timer = user_reminders.timer
+        jobs = {reminder_time: timer.add_daily(reminder_time, lambda: None) for reminder_time in OLD.times}
+        configs = [NEW, OLD]
+
+        def swap():
+            configs.reverse()
+            reload(jobs, timer, user_reminders, configs[0])
+
+        results[users] = {
+            "restart_ms": measure(lambda: restart(store, NEW), args.repeat),
+            "reload_ms": measure(swap, args.repeat),
+        }
+        # Чат без своего времени после перезагрузки живет по новому расписанию
+        assert user_reminders.get(0)[1] == tuple(configs[0].minutes)
+    print(json.dumps(results))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""CPU на подготовку одного ответа: сборка текста и сериализация клавиатуры
+на каждый вызов против RenderCache и готового JSON клавиатур.
+
+Замеряется то, что делают /start, /confirm и /schedule до отправки запроса,
+включая преобразование reply_markup внутри apihelper.
+Запуск: python -m benchmarks.bench_render --messages 20000
+"""
+import argparse
+import json
+import time
+
+from telebot import apihelper
+
+from bot.keyboards import (
+    confirm_keyboard_json, main_keyboard_json, make_confirm_keyboard, make_main_keyboard,
+)
+from bot.render import ApproximateCount, RenderCache, render_schedule
+from bot.storage import MemorySubscriberStore
+
+TIMES = ["09:00", "13:00", "15:00", "17:00", "23:00", "18:42"]
+REGULAR_HOURS = {"09:", "13:", "15:", "17:", "23:"}
+
+
+def legacy_schedule(subscribers):
+    schedule_text = "Расписание напоминаний:\n\n"
+    for time_str in TIMES:
+        if any(time_str.startswith(x) for x in ["09:", "13:", "15:", "17:", "23:"]):
+            schedule_text += f"• {time_str}\n"
+        else:
+            schedule_text += f"• {time_str} (тестовое)\n"
+    schedule_text += f"\nВсего подписанных пользователей: {len(subscribers)}"
+    return schedule_text
+
+
+def measure(func, messages):
+    start = time.process_time()
+    for _ in range(messages):
+        func()
+    return round((time.process_time() - start) / messages * 1e6, 2)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--messages", type=int, default=20000)
+    args = parser.parse_args()
+
+    subscribers = MemorySubscriberStore()
+    for chat_id in range(1000):
+        subscribers.add(chat_id)
+    cache = RenderCache()
+    count = ApproximateCount(subscribers)
+
+    def cached_schedule():
+        times = tuple(TIMES)
+        value = count.get()
+        return cache.get("schedule", (times, value), lambda: render_schedule(times, value, REGULAR_HOURS))
+
+    assert cached_schedule() == legacy_schedule(subscribers)
+    cases = {
+        "start": (lambda: apihelper._convert_markup(make_main_keyboard()),
+                  lambda: apihelper._convert_markup(main_keyboard_json())),
+        "confirm": (lambda: apihelper._convert_markup(make_confirm_keyboard()),
+                    lambda: apihelper._convert_markup(confirm_keyboard_json())),
+        "schedule": (lambda: legacy_schedule(subscribers), cached_schedule),
+    }
+    result = {"messages": args.messages}
+    for name, (legacy, cached) in cases.items():
+        result[name] = {"legacy_us": measure(legacy, args.messages), "cached_us": measure(cached, args.messages)}
+    print(json.dumps(result, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
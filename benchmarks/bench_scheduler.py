@@ -0,0 +1,80 @@
+"""Точность срабатывания и холостая нагрузка: цикл опроса против ReminderTimer.
+
+Цикл опроса воспроизводит старый WaterReminderScheduler.run (проверка
+каждые --poll секунд, в боте было 30 и 60). Запуск:
+python -m benchmarks.bench_scheduler --jobs 5 --spacing 1.3 --poll 0.5
+"""
+import argparse
+import json
+import statistics
+import threading
+import time
+from datetime import datetime, timedelta
+
+from bot.timer import ReminderTimer
+
+
+def run_polling(due_times, poll):
+    lateness = []
+    pending = sorted(due_times)
+    wakeups = 0
+    cpu_start = time.process_time()
+    while pending:
+        wakeups += 1
+        now = datetime.now()
+        while pending and pending[0] <= now:
+            lateness.append((now - pending.pop(0)).total_seconds())
+        time.sleep(poll)
+    return lateness, wakeups, time.process_time() - cpu_start
+
+
+def run_timer(due_times):
+    lateness = []
+    done = threading.Event()
+    timer = ReminderTimer()
+
+    def make_callback(due):
+        def callback():
+            lateness.append((datetime.now() - due).total_seconds())
+            if len(lateness) == len(due_times):
+                done.set()
+        return callback
+
+    for due in due_times:
+        timer.add_job(make_callback(due), due)
+    cpu_start = time.process_time()
+    thread = threading.Thread(target=timer.run, daemon=True)
+    thread.start()
+    done.wait()
+    timer.stop()
+    thread.join()
+    return lateness, len(due_times), time.process_time() - cpu_start
+
+
+def describe(lateness, wakeups, cpu):
+    return {
+        "mean_late_ms": round(statistics.mean(lateness) * 1000, 2),
+        "max_late_ms": round(max(lateness) * 1000, 2),
+        "wakeups": wakeups,
+        "cpu_ms": round(cpu * 1000, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--jobs", type=int, default=5)
+    parser.add_argument("--spacing", type=float, default=1.3)
+    parser.add_argument("--poll", type=float, default=0.5)
+    args = parser.parse_args()
+
+    def due_times():
+        start = datetime.now() + timedelta(seconds=0.37)
+        return [start + timedelta(seconds=args.spacing * i) for i in range(args.jobs)]
+
+    polling = describe(*run_polling(due_times(), args.poll))
+    timer = describe(*run_timer(due_times()))
+    print(json.dumps({"polling": polling, "timer": timer}))
+
+
+if __name__ == "__main__":
+    main()
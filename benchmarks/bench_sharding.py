@@ -0,0 +1,119 @@
+"""Шардированная рассылка несколькими процессами на локальном фейковом API.
+
+Сравнивает время рассылки одним и несколькими воркерами и проверяет
+падение воркера: один процесс убивается посреди шарда, его шард после
+истечения аренды дорассылает оставшийся. В выводе число пропущенных
+чатов и повторных отправок.
+Запуск: python -m benchmarks.bench_sharding --users 4000 --workers 4 --latency 0.02
+"""
+import argparse
+import collections
+import json
+import multiprocessing
+import os
+import tempfile
+import time
+
+from benchmarks.fake_api import FakeBotApi
+from bot.sharding import ShardCoordinator, ShardWorker, shard_rate
+from bot.storage import SQLiteSubscriberStore
+
+MESSAGE = "Время пить воду!"
+
+
+class RecordingApi(FakeBotApi):
+    def __init__(self, latency=0.0):
+        super().__init__(latency)
+        self.delivered = collections.Counter()
+        # Убитый воркер рвет соединения, трассировки сервера тут не нужны
+        self.server.handle_error = lambda request, client_address: None
+
+    def dispatch(self, method, params):
+        if method == "sendMessage":
+            with self.lock:
+                self.delivered[params.get("chat_id")] += 1
+        return super().dispatch(method, params)
+
+
+def worker_process(api_url, db_path, shard_db, shards, lease, rate, threads, chunk_size):
+    import telebot
+    from telebot import apihelper
+    from bot.broadcast import BroadcastEngine
+
+    apihelper.API_URL = api_url
+    bot = telebot.TeleBot("123:fake", threaded=False)
+    engine = BroadcastEngine(bot, workers=threads, rate=rate, per_chat_interval=0)
+    coordinator = ShardCoordinator(shard_db, shards, lease)
+    ShardWorker(coordinator, SQLiteSubscriberStore(db_path), engine,
+                chunk_size=chunk_size, poll_interval=0.1, checkpoint_interval=0.1).run()
+
+
+def run(args, tmp, workers, kill_after=None):
+    db_path = os.path.join(tmp, f"subscribers-{workers}-{kill_after}.db")
+    shard_db = os.path.join(tmp, f"shards-{workers}-{kill_after}.db")
+    store = SQLiteSubscriberStore(db_path)
+    for chat_id in range(1, args.users + 1):
+        store.add(chat_id)
+    store.flush()
+
+    context = multiprocessing.get_context("spawn")
+    with RecordingApi(latency=args.latency) as api:
+        coordinator = ShardCoordinator(shard_db, args.shards, args.lease)
+        worker_args = (api.url, db_path, shard_db, args.shards, args.lease,
+                       shard_rate(args.rate, workers), args.threads, args.chunk)
+        processes = [context.Process(target=worker_process, args=worker_args) for _ in range(workers)]
+        for process in processes:
+            process.start()
+        # Ждем, пока воркеры поднимутся, чтобы не мерить время запуска интерпретатора
+        time.sleep(args.startup)
+
+        start = time.perf_counter()
+        coordinator.plan("bench", MESSAGE, store.shard_bounds(args.shards))
+        if kill_after is not None:
+            time.sleep(kill_after)
+            processes[0].kill()
+        progress = coordinator.wait("bench", poll_interval=0.05, timeout=120)
+        elapsed = time.perf_counter() - start
+
+        for process in processes:
+            process.kill()
+            process.join()
+        delivered = dict(api.delivered)
+
+    return {
+        "s": round(elapsed, 3),
+        "msg_s": round(args.users / elapsed, 1),
+        "shards_done": progress["done"],
+        "missing": sum(1 for chat_id in range(1, args.users + 1) if str(chat_id) not in delivered),
+        "duplicates": sum(count - 1 for count in delivered.values()),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=4000)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--shards", type=int, default=16)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--rate", type=float, default=100000)
+    parser.add_argument("--lease", type=float, default=1.0)
+    parser.add_argument("--chunk", type=int, default=50)
+    parser.add_argument("--startup", type=float, default=2.0)
+    parser.add_argument("--kill-after", type=float, default=0.5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Логи дочерних процессов не должны попадать в bot.log
+        os.environ["LOG_FILE"] = os.path.join(tmp, "workers.log")
+        results = {
+            "users": args.users,
+            "single_worker": run(args, tmp, 1),
+            f"{args.workers}_workers": run(args, tmp, args.workers),
+            "worker_killed": run(args, tmp, args.workers, kill_after=args.kill_after),
+        }
+    print(json.dumps(results, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
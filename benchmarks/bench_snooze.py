@@ -0,0 +1,77 @@
+"""Очередь «Позже» на сотнях тысяч отложенных напоминаний: вставка с
+повторными нажатиями, снятие наступивших и память на запись.
+
+Сравнивается с наивной очередью: список кортежей (время, chat_id, текст),
+который перебирается целиком при каждой проверке.
+Запуск: python -m benchmarks.bench_snooze --pending 300000
+"""
+import argparse
+import json
+import random
+import time
+import tracemalloc
+
+from bot.snooze import SnoozeQueue
+
+
+class LegacyQueue:
+    def __init__(self):
+        self.items = []
+
+    def snooze(self, chat_id, delay, now):
+        self.items.append((now + delay, chat_id, "Время пить воду!"))
+
+    def pop_due(self, now):
+        ready = [chat_id for due, chat_id, _ in self.items if due <= now]
+        self.items = [item for item in self.items if item[0] > now]
+        return ready
+
+
+def run(queue, taps, checks, now):
+    tracemalloc.start()
+    start = time.perf_counter()
+    for chat_id, delay in taps:
+        queue.snooze(chat_id, delay, now=now)
+    insert = time.perf_counter() - start
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    delivered = 0
+    start = time.perf_counter()
+    # Проверки каждые 15 с в течение часа
+    for step in range(checks):
+        delivered += len(queue.pop_due(now=now + step * 15))
+    pop = time.perf_counter() - start
+    return {
+        "insert_us": round(insert / len(taps) * 1e6, 2),
+        "check_ms": round(pop / checks * 1000, 2),
+        "bytes_per_entry": memory // len(taps),
+        "delivered": delivered,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pending", type=int, default=300_000)
+    parser.add_argument("--repeat-taps", type=float, default=0.2)
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    chats = [rng.randrange(1, 10 ** 10) for _ in range(args.pending)]
+    # Часть пользователей нажимает «Позже» повторно
+    chats += rng.sample(chats, int(args.pending * args.repeat_taps))
+    taps = [(chat_id, rng.randrange(60, 3600)) for chat_id in chats]
+    now = int(time.time())
+
+    snooze = run(SnoozeQueue(ttl=6 * 3600), taps, 240, now)
+    legacy = run(LegacyQueue(), taps, 240, now)
+    print(json.dumps({
+        "pending": args.pending,
+        "taps": len(taps),
+        "legacy": legacy,
+        "snooze_queue": snooze,
+    }, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
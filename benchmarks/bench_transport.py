@@ -0,0 +1,84 @@
+"""Пропускная способность вызовов Bot API: сессии pyTelegramBotAPI по умолчанию
+(своя на каждый поток) против общего пула Transport, на локальном фейковом API.
+
+Нагрузка идет волнами: каждая волна - новые потоки, как у рассылок и
+вызовов из разных обработчиков. Установка соединения стоит --connect-cost
+секунд, чтобы учесть TLS-рукопожатие настоящего API.
+Запуск: python -m benchmarks.bench_transport --rounds 20 --threads 16 --calls 10
+"""
+import argparse
+import json
+import threading
+import time
+
+import telebot
+
+from benchmarks.fake_api import FakeBotApi
+from bot.transport import Transport
+
+
+class HandshakeApi(FakeBotApi):
+    """Фейковый API, где каждое новое соединение платит connect_cost"""
+
+    def __init__(self, latency=0.0, connect_cost=0.0):
+        super().__init__(latency)
+        self.connections = 0
+        handler = self.server.RequestHandlerClass
+        api = self
+
+        class Handler(handler):
+            def setup(self):
+                super().setup()
+                with api.lock:
+                    api.connections += 1
+                time.sleep(connect_cost)
+
+        self.server.RequestHandlerClass = Handler
+
+
+def run(bot, args):
+    def calls():
+        for i in range(args.calls):
+            bot.send_message(i + 1, "ping")
+
+    start = time.perf_counter()
+    for _ in range(args.rounds):
+        threads = [threading.Thread(target=calls) for _ in range(args.threads)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    duration = time.perf_counter() - start
+    return round(args.rounds * args.threads * args.calls / duration, 1)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--calls", type=int, default=10)
+    parser.add_argument("--latency", type=float, default=0.005)
+    parser.add_argument("--connect-cost", type=float, default=0.03)
+    parser.add_argument("--pool-size", type=int, default=16)
+    args = parser.parse_args()
+
+    result = {"requests": args.rounds * args.threads * args.calls, "latency": args.latency,
+              "connect_cost": args.connect_cost}
+    with HandshakeApi(args.latency, args.connect_cost) as api:
+        bot = telebot.TeleBot("123:fake", threaded=False)
+        result["default_req_s"] = run(bot, args)
+        result["default_connections"] = api.connections
+
+        api.connections = 0
+        transport = Transport(pool_size=args.pool_size).install()
+        try:
+            result["pool_req_s"] = run(bot, args)
+        finally:
+            transport.close()
+        result["pool_connections"] = api.connections
+
+    print(json.dumps(result, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
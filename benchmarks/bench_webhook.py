@@ -0,0 +1,101 @@
+"""Нагрузочный тест вебхука: синтетические обновления пачками на локальный WebhookServer.
+
+Обработчик отвечает через фейковый Bot API, поэтому учитывается и
+стоимость исходящих запросов. Проверяется порядок внутри каждого чата.
+Запуск: python -m benchmarks.bench_webhook --updates 2000 --chats 50 --batch 20
+"""
+import argparse
+import json
+import threading
+import time
+import urllib.request
+
+import telebot
+
+from benchmarks.fake_api import FakeBotApi
+from bot.webhook import UpdateDispatcher, WebhookServer
+
+
+def make_update(update_id, chat_id, seq):
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "from": {"id": chat_id, "is_bot": False, "first_name": "User"},
+            "text": f"/sum {seq}",
+            "entities": [{"type": "bot_command", "offset": 0, "length": 4}],
+        },
+    }
+
+
+def post(url, payload):
+    request = urllib.request.Request(
+        url, data=json.dumps(payload).encode(), headers={"Content-Type": "application/json"}
+    )
+    with urllib.request.urlopen(request) as response:
+        return response.status
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--updates", type=int, default=2000)
+    parser.add_argument("--chats", type=int, default=50)
+    parser.add_argument("--batch", type=int, default=20)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--clients", type=int, default=4)
+    parser.add_argument("--latency", type=float, default=0.005)
+    args = parser.parse_args()
+
+    seen = {}
+    lock = threading.Lock()
+    bot = telebot.TeleBot("123:fake", threaded=False)
+
+    @bot.message_handler(commands=["sum"])
+    def handle(message):
+        bot.send_message(message.chat.id, "ok")
+        with lock:
+            seen.setdefault(message.chat.id, []).append(int(message.text.split()[1]))
+
+    updates = [
+        make_update(i, i % args.chats + 1, i // args.chats) for i in range(args.updates)
+    ]
+    # Каждый клиент шлет свои чаты, чтобы порядок отправки внутри чата был определен
+    per_client = [[u for u in updates if u["message"]["chat"]["id"] % args.clients == c]
+                  for c in range(args.clients)]
+
+    with FakeBotApi(latency=args.latency):
+        dispatcher = UpdateDispatcher(bot, workers=args.workers)
+        server = WebhookServer(dispatcher, "127.0.0.1", 0, "/webhook")
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        url = f"http://127.0.0.1:{server.port}/webhook"
+
+        def client(chunk):
+            for i in range(0, len(chunk), args.batch):
+                post(url, chunk[i:i + args.batch])
+
+        start = time.perf_counter()
+        clients = [threading.Thread(target=client, args=(chunk,)) for chunk in per_client]
+        for thread in clients:
+            thread.start()
+        for thread in clients:
+            thread.join()
+        accepted = time.perf_counter() - start
+        dispatcher.join()
+        processed = time.perf_counter() - start
+        server.shutdown()
+
+    in_order = all(values == sorted(values) for values in seen.values())
+    print(json.dumps({
+        "updates": args.updates,
+        "accept_s": round(accepted, 3),
+        "processed_s": round(processed, 3),
+        "updates_per_s": round(args.updates / processed, 1),
+        "handled": sum(len(v) for v in seen.values()),
+        "per_chat_order_ok": in_order,
+    }))
+
+
+if __name__ == "__main__":
+    main()
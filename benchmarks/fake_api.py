@@ -0,0 +1,162 @@
+import collections
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from telebot import apihelper
+
+
+# Методы, на которые fake API может отвечать 429
+SEND_METHODS = ("sendMessage", "editMessageText", "answerCallbackQuery")
+
+
+class FakeBotApi:
+    """Локальный сервер, отвечающий как Telegram Bot API (для бенчмарков).
+
+    latency - задержка каждого ответа. rate_limit_every=N - каждый N-й
+    вызов из SEND_METHODS получает 429 с retry_after. Обновления для
+    getUpdates кладутся через push_update и отдаются с учетом offset и
+    long polling, как у настоящего API."""
+
+    def __init__(self, latency=0.0, host="127.0.0.1", port=0, rate_limit_every=0, retry_after=1):
+        self.latency = latency
+        self.rate_limit_every = rate_limit_every
+        self.retry_after = retry_after
+        self.calls = {}
+        self.rate_limited = 0
+        self.sends = 0
+        self.lock = threading.Lock()
+        self.changed = threading.Condition(self.lock)
+        self.updates = collections.deque()
+        self.update_id = 0
+        self.message_id = 0
+        self.server = ThreadingHTTPServer((host, port), self._make_handler())
+        self.server.daemon_threads = True
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/bot{{0}}/{{1}}"
+
+    def _make_handler(self):
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Заголовки и тело уходят разными write, без этого каждый ответ
+            # ждал бы delayed ACK клиента (~40 мс)
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                self.handle_method()
+
+            def do_POST(self):
+                self.handle_method()
+
+            def handle_method(self):
+                parsed = urlparse(self.path)
+                method = parsed.path.rsplit("/", 1)[-1]
+                params = {k: v[0] for k, v in parse_qs(parsed.query).items()}
+                length = int(self.headers.get("Content-Length") or 0)
+                if length:
+                    body = self.rfile.read(length).decode()
+                    params.update({k: v[0] for k, v in parse_qs(body).items()})
+                status, payload = api.dispatch(method, params)
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def push_update(self, update):
+        """Кладет обновление (dict без update_id) в очередь getUpdates"""
+        with self.lock:
+            self.update_id += 1
+            self.updates.append(dict(update, update_id=self.update_id))
+            self.changed.notify_all()
+            return self.update_id
+
+    def wait_calls(self, method, count, timeout=60.0):
+        """Ждет, пока method будет вызван не меньше count раз"""
+        deadline = time.monotonic() + timeout
+        with self.lock:
+            while self.calls.get(method, 0) < count:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self.changed.wait(remaining)
+            return True
+
+    def _get_updates(self, params):
+        offset = int(params.get("offset", 0))
+        limit = int(params.get("limit", 100))
+        deadline = time.monotonic() + float(params.get("timeout", 0))
+        with self.lock:
+            while True:
+                while self.updates and self.updates[0]["update_id"] < offset:
+                    self.updates.popleft()
+                remaining = deadline - time.monotonic()
+                if self.updates or remaining <= 0:
+                    return [self.updates[i] for i in range(min(limit, len(self.updates)))]
+                self.changed.wait(remaining)
+
+    def dispatch(self, method, params):
+        if self.latency:
+            time.sleep(self.latency)
+        if method == "getUpdates":
+            return 200, {"ok": True, "result": self._get_updates(params)}
+
+        with self.lock:
+            # calls считает и вызовы, получившие 429
+            self.calls[method] = self.calls.get(method, 0) + 1
+            self.changed.notify_all()
+            if method in SEND_METHODS:
+                self.sends += 1
+                if self.rate_limit_every and self.sends % self.rate_limit_every == 0:
+                    self.rate_limited += 1
+                    return 429, {
+                        "ok": False, "error_code": 429,
+                        "description": f"Too Many Requests: retry after {self.retry_after}",
+                        "parameters": {"retry_after": self.retry_after},
+                    }
+            self.message_id += 1
+            message_id = self.message_id
+
+        if method == "getMe":
+            result = {"id": 1, "is_bot": True, "first_name": "Fake", "username": "fake_bot"}
+        elif method in ("sendMessage", "editMessageText"):
+            result = {
+                "message_id": int(params.get("message_id", message_id)),
+                "date": int(time.time()),
+                "chat": {"id": int(params.get("chat_id", 0)), "type": "private"},
+                "text": params.get("text", ""),
+            }
+        else:
+            result = True
+        return 200, {"ok": True, "result": result}
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        apihelper.API_URL = self.url
+        return self
+
+    def stop(self):
+        apihelper.API_URL = None
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
@@ -0,0 +1,416 @@
+"""Асинхронный вариант бота на AsyncTeleBot.
+
+Обработчики, рассылка и планировщик напоминаний работают в одном
+event loop и делят одну aiohttp-сессию с пулом соединений. Запросы к
+хранилищу подписчиков (SQLite) уходят в потоки через asyncio.to_thread,
+чтобы не останавливать event loop.
+Запуск: python -m bot.async_app (нужен aiohttp).
+"""
+import asyncio
+import time
+from datetime import datetime, timedelta
+
+from telebot import asyncio_helper
+from telebot.async_telebot import AsyncTeleBot
+
+from config import (
+    BOT_TOKEN, WATER_REMINDER_TIMES, WATER_REMINDER_MESSAGE, SUBSCRIBERS_DB,
+    BROADCAST_WORKERS, BROADCAST_RATE, DEFAULT_TIMEZONE, SUBSCRIBER_COUNT_TTL,
+    SNOOZE_MINUTES, SNOOZE_TTL, SNOOZE_MAX_PENDING, SNOOZE_CHECK_INTERVAL,
+    ADMIN_IDS, FLOOD_CHAT_RATE, FLOOD_CHAT_BURST, FLOOD_GLOBAL_RATE, FLOOD_MAX_CHATS, ADMIN_ONLY_COMMANDS,
+)
+from bot.broadcast import (
+    PERMANENT, RATE_LIMITED, TRANSIENT, backoff_delay, classify_error, get_retry_after, is_unexpected_error,
+)
+from bot.flood import FloodControl, limit_flood
+from bot.keyboards import confirm_keyboard_json
+from bot.render import ApproximateCount, RenderCache, render_schedule
+from bot.router import route_commands
+from bot.snooze import create_snooze_queue
+from bot.storage import create_store
+from bot.timer import ReminderTimer
+from bot.user_schedule import (
+    UserReminders, CompiledSchedule, NextReminderReply, format_minute, format_next_reminder, get_zone,
+)
+from utils.logger import logger, setup_logger
+from utils.metrics import instrument_bot, metrics
+from utils.parsing import int_stats, numbers_reply
+
+ASYNC_POOL_SIZE = 100
+
+
+class AsyncTokenBucket:
+    def __init__(self, rate):
+        self.rate = float(rate)
+        self.max_rate = self.rate
+        self.tokens = self.rate
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                if now < self.paused_until:
+                    await asyncio.sleep(self.paused_until - now)
+                    continue
+                self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def pause(self, seconds):
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+        self.tokens = 0.0
+
+    def slow_down(self, factor=0.8):
+        self.rate = max(1.0, self.rate * factor)
+
+    def recover(self, step=0.05):
+        self.rate = min(self.max_rate, self.rate + step)
+
+
+class AsyncTimer(ReminderTimer):
+    """ReminderTimer, который ждет в event loop вместо отдельного потока"""
+
+    def __init__(self):
+        super().__init__()
+        self.changed = asyncio.Event()
+
+    def _notify(self):
+        self.changed.set()
+
+    async def run(self):
+        self.running = True
+        while self.running:
+            self.changed.clear()
+            with self.condition:
+                job, delay = self._pop_due()
+            if job is None:
+                try:
+                    await asyncio.wait_for(self.changed.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            try:
+                result = job.callback()
+                if asyncio.iscoroutine(result):
+                    await result
+            except Exception as e:
+                logger.error("Ошибка задания %s: %s", job.name, e)
+
+
+class AsyncUserReminders(UserReminders):
+    """UserReminders для event loop: проверка подписки при срабатывании
+    (запросы к SQLite) выполняется в потоке через asyncio.to_thread"""
+
+    async def fire(self, due):
+        self.deliver_due(due, await asyncio.to_thread(self.due_chats, due))
+
+
+class AsyncWaterReminderScheduler:
+    def __init__(self, bot, subscribers):
+        self.bot = bot
+        self.subscribers = subscribers
+        self.bucket = AsyncTokenBucket(BROADCAST_RATE)
+        self.concurrency = asyncio.Semaphore(BROADCAST_WORKERS)
+        self.timer = AsyncTimer()
+        self.snoozes = create_snooze_queue(SUBSCRIBERS_DB, SNOOZE_TTL, SNOOZE_MAX_PENDING)
+        self.next_reply = NextReminderReply(CompiledSchedule(WATER_REMINDER_TIMES))
+        self.tasks = set()
+        self.setup_schedule()
+
+    def setup_schedule(self):
+        for reminder_time in WATER_REMINDER_TIMES:
+            self.timer.add_daily(reminder_time, self.send_water_reminder)
+            logger.info("Напоминание настроено на %s", reminder_time)
+
+        self.user_reminders = AsyncUserReminders(
+            self.subscribers, self.timer, self.send_user_reminders,
+            WATER_REMINDER_TIMES, DEFAULT_TIMEZONE,
+        )
+        self.timer.add_job(
+            self.send_snoozed_reminders, datetime.now(), timedelta(seconds=SNOOZE_CHECK_INTERVAL), name="snooze"
+        )
+
+    def _spawn(self, coro):
+        task = asyncio.ensure_future(coro)
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+        return task
+
+    async def send_one(self, chat_id, text):
+        """Возвращает None при успехе или вид ошибки из classify_error"""
+        async with self.concurrency:
+            kind = TRANSIENT
+            for attempt in range(3):
+                await self.bucket.acquire()
+                try:
+                    await self.bot.send_message(chat_id, text)
+                    self.bucket.recover()
+                    return None
+                except Exception as e:
+                    kind = classify_error(e)
+                    if kind == RATE_LIMITED:
+                        retry_after = get_retry_after(e)
+                        logger.warning("Превышен лимит Telegram, пауза %s с", retry_after)
+                        metrics.inc("bot_rate_limited_total")
+                        self.bucket.pause(retry_after)
+                        self.bucket.slow_down()
+                        continue
+                    if kind == TRANSIENT and attempt < 2:
+                        metrics.inc("bot_send_retries_total")
+                        await asyncio.sleep(backoff_delay(attempt))
+                        continue
+                    metrics.inc("bot_send_failures_total", kind=kind, error=type(e).__name__)
+                    if is_unexpected_error(e):
+                        logger.error("Ошибка отправки пользователю %s: %s", chat_id, e, exc_info=e)
+                    else:
+                        logger.debug("Ошибка отправки пользователю %s: %s", chat_id, e)
+                    return kind
+            return kind
+
+    async def broadcast(self, chunks, text):
+        """Рассылает text по асинхронному потоку порций chat_id"""
+        start = time.monotonic()
+        sent = total = failed = 0
+        async for chunk in chunks:
+            total += len(chunk)
+            results = await asyncio.gather(*(self.send_one(chat_id, text) for chat_id in chunk))
+            dead = [chat_id for chat_id, kind in zip(chunk, results) if kind == PERMANENT]
+            if dead:
+                await asyncio.to_thread(self.subscribers.discard_many, dead)
+                metrics.inc("bot_dead_chat_sends_total", len(dead))
+                metrics.inc("bot_dead_chats_pruned_total", len(dead))
+            sent += results.count(None)
+            failed += len(results) - results.count(None)
+        duration = time.monotonic() - start
+        logger.info("Рассылка завершена: %s успешно, %s с ошибками из %s за %.2f с", sent, failed, total, duration)
+        metrics.observe("bot_broadcast_duration_seconds", duration)
+        metrics.inc("bot_messages_sent_total", sent)
+        metrics.set("bot_broadcast_messages_per_second", round(sent / duration, 2) if duration else 0)
+
+    async def default_chunks(self):
+        """Подписчики без персонального расписания; чтение из базы идет вне event loop"""
+        chunks = self.subscribers.iter_chunks()
+        while True:
+            chunk = await asyncio.to_thread(next, chunks, None)
+            if chunk is None:
+                return
+            yield [chat_id for chat_id in chunk if chat_id not in self.user_reminders]
+
+    def send_water_reminder(self):
+        if not self.subscribers:
+            logger.info("Нет подписанных пользователей для отправки напоминания")
+            return
+        current_time = datetime.now().strftime("%H:%M")
+        logger.info("Отправка напоминаний в %s для %s пользователей", current_time, len(self.subscribers))
+        return self._spawn(self.broadcast(self.default_chunks(), WATER_REMINDER_MESSAGE))
+
+    def send_user_reminders(self, chat_ids):
+        async def chunks():
+            yield chat_ids
+        return self._spawn(self.broadcast(chunks(), WATER_REMINDER_MESSAGE))
+
+    async def send_snoozed_reminders(self):
+        """Наступившие «Позже»; отписавшихся отсеивает запрос к базе в потоке"""
+        due = self.snoozes.pop_due()
+        if not due:
+            return None
+        chat_ids = await asyncio.to_thread(lambda: [chat_id for chat_id in due if chat_id in self.subscribers])
+        if not chat_ids:
+            return None
+        logger.info("Отложенные напоминания: %s чатов", len(chat_ids))
+        return self.send_user_reminders(chat_ids)
+
+    def snooze(self, chat_id, minutes):
+        """Откладывает напоминание чата, возвращает текст ответа"""
+        due = self.snoozes.snooze(chat_id, minutes * 60)
+        if due is None:
+            return "Сейчас не получается отложить напоминание, попробуйте позже."
+        user_schedule = self.user_reminders.get(chat_id)
+        zone = get_zone(user_schedule[0]) if user_schedule else None
+        return f"Хорошо, напомню в {datetime.fromtimestamp(due, zone):%H:%M}."
+
+    def get_next_reminder_time(self):
+        return self.next_reply.get()[0]
+
+    def get_next_reminder_reply(self):
+        return self.next_reply.get()[1]
+
+
+def register_handlers(bot, scheduler):
+    subscribers = scheduler.subscribers
+    render_cache = RenderCache()
+    subscriber_count = ApproximateCount(subscribers, SUBSCRIBER_COUNT_TTL)
+
+    @bot.message_handler(commands=['start', 'help'])
+    async def send_welcome(message):
+        welcome_text = (
+            "Water Reminder Bot \n\n"
+            "Я буду напоминать вам пить воду в оптимальное время:\n"
+            "• 09:00 - Утро\n"
+            "• 13:00 - Обед\n"
+            "• 15:00 - Послеобеденное время\n"
+            "• 17:00 - Вечер\n"
+            "• 23:00 - Перед сном\n\n"
+            "Команды:\n"
+            "/start - начать работу\n"
+            "/subscribe - подписаться на напоминания\n"
+            "/unsubscribe - отписаться от напоминаний\n"
+            "/status - статус подписки\n"
+            "/next - следующее напоминание\n"
+            "/schedule - расписание напоминаний\n"
+            "/sum - сумма чисел\n"
+            "/max - максимум чисел\n"
+            "/confirm - подтверждение действия"
+        )
+        await bot.reply_to(message, welcome_text)
+        logger.info("Пользователь %s вызвал команду /start", message.from_user.id)
+
+    @bot.message_handler(commands=['subscribe'])
+    async def subscribe_user(message):
+        chat_id = message.chat.id
+        if not await asyncio.to_thread(subscribers.add, chat_id):
+            await bot.reply_to(message, "Вы уже подписаны на напоминания о воде!")
+        else:
+            response = (
+                "Вы успешно подписались на напоминания о воде! "
+                "Я буду напоминать вам в 9, 13, 15, 17 и 23 часа."
+            )
+            await bot.reply_to(message, response)
+            logger.info("Пользователь %s подписался на напоминания", chat_id)
+
+    @bot.message_handler(commands=['unsubscribe'])
+    async def unsubscribe_user(message):
+        chat_id = message.chat.id
+        if await asyncio.to_thread(subscribers.discard, chat_id):
+            await bot.reply_to(message, "Вы отписались от напоминаний о воде.")
+            logger.info("Пользователь %s отписался от напоминаний", chat_id)
+        else:
+            await bot.reply_to(message, "Вы не были подписаны на напоминания.")
+
+    @bot.message_handler(commands=['status'])
+    async def check_status(message):
+        if await asyncio.to_thread(subscribers.__contains__, message.chat.id):
+            await bot.reply_to(message, "Вы подписаны на напоминания о воде.")
+        else:
+            response = (
+                "Вы не подписаны на напоминания о воде. "
+                "Используйте /subscribe для подписки."
+            )
+            await bot.reply_to(message, response)
+
+    @bot.message_handler(commands=['next'])
+    async def next_reminder(message):
+        user_next = scheduler.user_reminders.next_reminder(message.chat.id)
+        if user_next:
+            time_until = user_next - datetime.now(user_next.tzinfo)
+            response = format_next_reminder(user_next, time_until.total_seconds())
+        else:
+            response = scheduler.get_next_reminder_reply()
+        await bot.reply_to(message, response)
+
+    @bot.message_handler(commands=['schedule'])
+    async def show_schedule(message):
+        user_schedule = scheduler.user_reminders.get(message.chat.id)
+        if user_schedule:
+            tz_name, minutes = user_schedule
+            schedule_text = f"📅 Ваше расписание ({tz_name}):\n\n"
+            schedule_text += "".join(f"• {format_minute(m)}\n" for m in minutes)
+            await bot.reply_to(message, schedule_text)
+            return
+
+        times = tuple(WATER_REMINDER_TIMES)
+        count = subscriber_count.get()
+        schedule_text = render_cache.get(
+            "schedule", (times, count),
+            lambda: render_schedule(times, count, title="📅 Расписание напоминаний:"),
+        )
+        await bot.reply_to(message, schedule_text)
+
+    @bot.message_handler(commands=['sum'])
+    async def sum_numbers(message):
+        stats = int_stats(message.text)
+
+        if not stats.count:
+            await bot.reply_to(message, "Не найдено чисел для сложения.\nПример: /sum 2 3 10 или /sum 2, 3, -5")
+            return
+
+        await bot.reply_to(message, numbers_reply("sum", stats))
+        logger.info("Пользователь %s вычислил сумму %s чисел = %s", message.from_user.id, stats.count, stats.total)
+
+    @bot.message_handler(commands=['max'])
+    async def max_number(message):
+        stats = int_stats(message.text)
+
+        if not stats.count:
+            await bot.reply_to(message, "Не найдено чисел для поиска максимума.\nПример: /max 2 3 10 или /max 2, 3, -5")
+            return
+
+        await bot.reply_to(message, numbers_reply("max", stats))
+        logger.info("Пользователь %s нашел максимум %s чисел = %s", message.from_user.id, stats.count, stats.maximum)
+
+    @bot.message_handler(commands=['confirm'])
+    async def confirm_action(message):
+        await bot.send_message(message.chat.id, "Подтвердите ваше действие:", reply_markup=confirm_keyboard_json())
+        logger.info("Пользователь %s запросил подтверждение", message.from_user.id)
+
+    @bot.callback_query_handler(func=lambda call: call.data.startswith('confirm:'))
+    async def handle_confirmation(call):
+        choice = call.data.split(':', 1)[1]
+
+        responses = {
+            'yes': 'Действие подтверждено!',
+            'no': 'Действие отменено.',
+            'later': 'Хорошо, напомню позже.',
+            'unsure': 'Вернемся к этому позже.'
+        }
+        if choice == 'later':
+            responses['later'] = scheduler.snooze(call.message.chat.id, SNOOZE_MINUTES)
+
+        await bot.answer_callback_query(call.id, "Принято!")
+        await bot.edit_message_text(
+            responses.get(choice, 'Неизвестный выбор'),
+            call.message.chat.id,
+            call.message.message_id
+        )
+        logger.info("Пользователь %s выбрал: %s", call.from_user.id, choice)
+
+    @bot.message_handler(func=lambda message: True)
+    async def echo_all(message):
+        response = (
+            "Не понимаю ваше сообщение. "
+            "Используйте /help для просмотра доступных команд."
+        )
+        await bot.reply_to(message, response)
+
+
+async def main():
+    setup_logger()
+    if not BOT_TOKEN:
+        raise RuntimeError("BOT_TOKEN не найден в .env файле")
+    asyncio_helper.REQUEST_LIMIT = ASYNC_POOL_SIZE
+    flood = FloodControl(
+        FLOOD_CHAT_RATE, FLOOD_CHAT_BURST, FLOOD_GLOBAL_RATE,
+        admin_only=ADMIN_ONLY_COMMANDS, admin_ids=ADMIN_IDS, max_entries=FLOOD_MAX_CHATS,
+    )
+    bot = instrument_bot(route_commands(limit_flood(AsyncTeleBot(BOT_TOKEN), flood)))
+    scheduler = AsyncWaterReminderScheduler(bot, create_store(SUBSCRIBERS_DB))
+    register_handlers(bot, scheduler)
+
+    timer_task = asyncio.create_task(scheduler.timer.run())
+    logger.info("ЗАПУСК БОТА (asyncio)")
+    try:
+        await bot.infinity_polling(skip_pending=True, timeout=20)
+    finally:
+        scheduler.timer.stop()
+        timer_task.cancel()
+        await bot.close_session()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,61 @@
+import queue
+import threading
+import time
+
+from utils.logger import logger
+
+
+class BatchWriter:
+    """Фоновая запись пачками: put() кладет элемент в очередь, поток
+    собирает до batch_size элементов или ждет flush_interval секунд и
+    передает пачку в write_batch.
+
+    Элементы нумеруются по порядку. flush() ждет только элементы, которые
+    были в очереди в момент вызова, поэтому непрерывный поток новых
+    записей его не задерживает (в отличие от queue.join())."""
+
+    def __init__(self, write_batch, name, batch_size=500, flush_interval=0.2):
+        self.write_batch = write_batch
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue = queue.Queue()
+        self.condition = threading.Condition()
+        self.submitted = 0
+        self.written = 0
+        self.thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self.thread.start()
+
+    def put(self, item):
+        with self.condition:
+            self.submitted += 1
+            self.queue.put(item)
+
+    def _run(self):
+        while True:
+            batch = [self.queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(self.queue.get(timeout=timeout))
+                except queue.Empty:
+                    break
+            try:
+                self.write_batch(batch)
+            except Exception as e:
+                logger.error("Ошибка записи пачки в %s: %s", self.thread.name, e)
+            finally:
+                with self.condition:
+                    self.written += len(batch)
+                    self.condition.notify_all()
+
+    def flush(self, timeout=None):
+        """Ждет записи всего, что было поставлено до вызова; False по таймауту"""
+        with self.condition:
+            target = self.submitted
+            return self.condition.wait_for(lambda: self.written >= target, timeout)
+
+    def __len__(self):
+        return self.submitted - self.written
@@ -0,0 +1,339 @@
+import asyncio
+import collections
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.logger import logger
+from utils.metrics import metrics
+
+# Сколько ошибок одной рассылки попадает в лог полностью, остальные только в итог
+ERROR_LOG_SAMPLES = 5
+# Недоступные чаты отписываются пачками такого размера, не дожидаясь конца рассылки
+DEAD_CHATS_BATCH = 500
+
+PERMANENT = "permanent"
+RATE_LIMITED = "rate_limited"
+TRANSIENT = "transient"
+REJECTED = "rejected"
+
+PERMANENT_DESCRIPTIONS = (
+    "chat not found",
+    "user is deactivated",
+    "bot was blocked",
+    "bot was kicked",
+    "peer_id_invalid",
+    "bot can't initiate conversation",
+)
+
+
+def is_network_error(error):
+    """Обрыв соединения или таймаут запроса к Telegram. requests и aiohttp
+    не импортируются здесь: проверяются только уже загруженные ботом"""
+    requests = sys.modules.get("requests")
+    if requests is not None and isinstance(error, (requests.ConnectionError, requests.Timeout)):
+        return True
+    aiohttp = sys.modules.get("aiohttp")
+    if aiohttp is not None and isinstance(error, aiohttp.ClientConnectionError):
+        return True
+    return isinstance(error, asyncio.TimeoutError)
+
+
+def http_status(error):
+    """HTTP-код ответа для ApiHTTPException (requests и aiohttp), иначе None"""
+    result = getattr(error, "result", None)
+    return getattr(result, "status_code", None) or getattr(result, "status", None)
+
+
+def classify_error(error):
+    """Вид ошибки отправки:
+    PERMANENT    - чат недоступен навсегда (403, chat not found), подписку надо снять;
+    RATE_LIMITED - 429, нужно подождать retry_after и снизить скорость;
+    TRANSIENT    - сеть, таймауты и 5xx, имеет смысл повторить;
+    REJECTED     - прочие 4xx и любые другие исключения (в том числе ошибки
+                   в коде вроде TypeError): повтор не поможет."""
+    code = getattr(error, "error_code", None)
+    if code is None:
+        status = http_status(error)
+        if is_network_error(error) or (isinstance(status, int) and status >= 500):
+            return TRANSIENT
+        return REJECTED
+    if code == 429:
+        return RATE_LIMITED
+    if code == 403:
+        return PERMANENT
+    description = (getattr(error, "description", "") or "").lower()
+    if any(text in description for text in PERMANENT_DESCRIPTIONS):
+        return PERMANENT
+    if code >= 500:
+        return TRANSIENT
+    return REJECTED
+
+
+def is_unexpected_error(error):
+    """Не ответ Telegram и не сбой сети - такое логируется с трейсбеком"""
+    return getattr(error, "error_code", None) is None and http_status(error) is None and not is_network_error(error)
+
+
+def backoff_delay(attempt, base=0.5, cap=30.0):
+    """Экспоненциальная задержка с джиттером, чтобы повторы не шли одной волной"""
+    return min(cap, base * 2 ** attempt) * random.uniform(0.5, 1.5)
+
+
+class SendError(Exception):
+    def __init__(self, kind, error):
+        super().__init__(str(error))
+        self.kind = kind
+        self.error = error
+
+
+class TokenBucket:
+    """Глобальный лимит отправки: rate сообщений в секунду"""
+
+    def __init__(self, rate, capacity=None, min_rate=1.0):
+        self.rate = float(rate)
+        self.max_rate = self.rate
+        self.min_rate = min(float(min_rate), self.rate)
+        self.capacity = float(capacity or rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            wait = self.try_acquire()
+            if not wait:
+                return
+            time.sleep(wait)
+
+    def try_acquire(self):
+        """Берет токен без ожидания: 0 если взят, иначе сколько ждать следующего"""
+        with self.lock:
+            now = time.monotonic()
+            if now < self.paused_until:
+                return self.paused_until - now
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0
+            return (1 - self.tokens) / self.rate
+
+    def pause(self, seconds):
+        """Останавливает выдачу токенов всем потокам (ответ 429 от Telegram)"""
+        with self.lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+            self.tokens = 0.0
+
+    def slow_down(self, factor=0.8):
+        """Снижает скорость после 429; recover() постепенно возвращает ее обратно"""
+        with self.lock:
+            self.rate = max(self.min_rate, self.rate * factor)
+
+    def recover(self, step=0.05):
+        if self.rate < self.max_rate:
+            with self.lock:
+                self.rate = min(self.max_rate, self.rate + step)
+
+
+class ChatRateLimiter:
+    """Ограничение частоты сообщений в один чат"""
+
+    def __init__(self, interval=1.0):
+        self.interval = interval
+        self.next_allowed = {}
+        self.lock = threading.Lock()
+        self.last_cleanup = time.monotonic()
+
+    def wait(self, chat_id):
+        with self.lock:
+            now = time.monotonic()
+            if now - self.last_cleanup > 60:
+                self.next_allowed = {k: v for k, v in self.next_allowed.items() if v > now}
+                self.last_cleanup = now
+            allowed = max(now, self.next_allowed.get(chat_id, 0.0))
+            self.next_allowed[chat_id] = allowed + self.interval
+        if allowed > now:
+            time.sleep(allowed - now)
+
+
+class BroadcastStats:
+    def __init__(self):
+        self.total = 0
+        self.sent = 0
+        self.failed = 0
+        self.rate_limited = 0
+        self.retried = 0
+        self.dead = 0
+        self.errors = {}
+        self.started = time.monotonic()
+        self.finished = None
+        self.lock = threading.Lock()
+
+    def add(self, field, value=1):
+        with self.lock:
+            setattr(self, field, getattr(self, field) + value)
+
+    def record_error(self, chat_id, kind, error):
+        """Считает ошибку по виду и классу и пишет в лог только первые ERROR_LOG_SAMPLES"""
+        key = (kind, type(error).__name__)
+        with self.lock:
+            self.failed += 1
+            if kind == PERMANENT:
+                self.dead += 1
+            self.errors[key] = self.errors.get(key, 0) + 1
+            logged = self.failed <= ERROR_LOG_SAMPLES
+        if logged:
+            exc_info = error if is_unexpected_error(error) else None
+            logger.error("Ошибка отправки пользователю %s: %s", chat_id, error, exc_info=exc_info)
+        else:
+            logger.debug("Ошибка отправки пользователю %s: %s", chat_id, error)
+
+    @property
+    def duration(self):
+        end = self.finished if self.finished is not None else time.monotonic()
+        return end - self.started
+
+    @property
+    def throughput(self):
+        return self.sent / self.duration if self.duration > 0 else 0.0
+
+    def summary(self):
+        text = (
+            f"{self.sent} успешно, {self.failed} с ошибками из {self.total}, "
+            f"429: {self.rate_limited}, повторов: {self.retried}, за {self.duration:.2f} с "
+            f"({self.throughput:.1f} сообщ/с)"
+        )
+        if self.dead:
+            text += f", недоступных чатов: {self.dead} ({self.dead / self.total:.1%} отправок)"
+        if self.errors:
+            text += ", ошибки: " + ", ".join(
+                f"{kind}/{name}={count}" for (kind, name), count in sorted(self.errors.items())
+            )
+        return text
+
+
+def record_broadcast_metrics(stats):
+    metrics.observe("bot_broadcast_duration_seconds", stats.duration)
+    metrics.inc("bot_messages_sent_total", stats.sent)
+    metrics.inc("bot_rate_limited_total", stats.rate_limited)
+    metrics.inc("bot_send_retries_total", stats.retried)
+    metrics.inc("bot_dead_chat_sends_total", stats.dead)
+    metrics.set("bot_broadcast_messages_per_second", round(stats.throughput, 2))
+    for (kind, error), count in stats.errors.items():
+        metrics.inc("bot_send_failures_total", count, kind=kind, error=error)
+
+
+def get_retry_after(error):
+    parameters = (error.result_json or {}).get("parameters") or {}
+    return parameters.get("retry_after", 1)
+
+
+class BroadcastEngine:
+    """Рассылка через пул потоков с глобальным лимитом и лимитом на каждый чат"""
+
+    def __init__(self, bot, workers=8, rate=30, per_chat_interval=1.0, max_retries=3):
+        self.bot = bot
+        self.workers = workers
+        self.max_retries = max_retries
+        self.bucket = TokenBucket(rate)
+        self.chat_limiter = ChatRateLimiter(per_chat_interval)
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="broadcast")
+
+    def send(self, chat_id, text, stats, **kwargs):
+        error = None
+        for attempt in range(self.max_retries + 1):
+            self.bucket.acquire()
+            self.chat_limiter.wait(chat_id)
+            try:
+                self.bot.send_message(chat_id, text, **kwargs)
+                stats.add("sent")
+                self.bucket.recover()
+                return True
+            except Exception as e:
+                error = e
+                kind = classify_error(e)
+                if kind == RATE_LIMITED:
+                    retry_after = get_retry_after(e)
+                    stats.add("rate_limited")
+                    logger.warning("Превышен лимит Telegram, пауза %s с", retry_after)
+                    self.bucket.pause(retry_after)
+                    self.bucket.slow_down()
+                elif kind == TRANSIENT and attempt < self.max_retries:
+                    stats.add("retried")
+                    time.sleep(backoff_delay(attempt))
+                else:
+                    raise SendError(kind, e)
+        raise SendError(classify_error(error), error)
+
+    def broadcast(self, chat_ids, text, on_dead=None, on_progress=None, **kwargs):
+        """Отправляет text во все чаты и ждет завершения, возвращает BroadcastStats.
+        on_dead получает пачки недоступных навсегда чатов для отписки.
+        on_progress(cursor, stats) вызывается при продвижении курсора - последнего
+        chat_id, до которого включительно завершены все отправки в порядке chat_ids."""
+        stats = BroadcastStats()
+        in_flight = threading.BoundedSemaphore(self.workers * 2)
+        dead_chats = []
+        dead_lock = threading.Lock()
+
+        def prune(force=False):
+            with dead_lock:
+                if not dead_chats or not (force or len(dead_chats) >= DEAD_CHATS_BATCH):
+                    return
+                batch = dead_chats[:]
+                dead_chats.clear()
+            if on_dead:
+                on_dead(batch)
+                metrics.inc("bot_dead_chats_pruned_total", len(batch))
+
+        def task(chat_id):
+            try:
+                self.send(chat_id, text, stats, **kwargs)
+            except SendError as e:
+                stats.record_error(chat_id, e.kind, e.error)
+                if e.kind == PERMANENT:
+                    with dead_lock:
+                        dead_chats.append(chat_id)
+                    prune()
+            except Exception as e:
+                stats.record_error(chat_id, REJECTED, e)
+            finally:
+                in_flight.release()
+
+        futures = collections.deque()
+        cursor = None
+        for chat_id in chat_ids:
+            in_flight.acquire()
+            stats.total += 1
+            futures.append((chat_id, self.executor.submit(task, chat_id)))
+            advanced = False
+            while futures and futures[0][1].done():
+                cursor = futures.popleft()[0]
+                advanced = True
+            if advanced and on_progress:
+                on_progress(cursor, stats)
+        for chat_id, future in futures:
+            future.result()
+            cursor = chat_id
+        prune(force=True)
+        if on_progress and cursor is not None:
+            on_progress(cursor, stats)
+
+        stats.finished = time.monotonic()
+        logger.info("Рассылка завершена: %s", stats.summary())
+        record_broadcast_metrics(stats)
+        return stats
+
+    def start_broadcast(self, chat_ids, text, on_dead=None, **kwargs):
+        """Запускает рассылку в отдельном потоке, не блокируя планировщик"""
+        thread = threading.Thread(
+            target=self.broadcast,
+            args=(chat_ids, text, on_dead),
+            kwargs=kwargs,
+            daemon=True,
+        )
+        thread.start()
+        return thread
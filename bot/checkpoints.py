@@ -0,0 +1,155 @@
+import atexit
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+from bot.db import ThreadLocalConnection
+from utils.logger import logger
+
+RUNNING = "running"
+DONE = "done"
+EXPIRED = "expired"
+
+# Завершенные рассылки хранятся неделю, потом удаляются при открытии новой
+JOURNAL_RETENTION = 7 * 24 * 3600
+
+
+def reminder_slot_id(test=False, now=None):
+    """id рассылки: минута слота расписания, у /test - свое пространство
+    с точностью до секунды, чтобы не совпасть со слотом той же минуты"""
+    now = now or datetime.now()
+    if test:
+        return now.strftime("test %Y-%m-%d %H:%M:%S")
+    return now.strftime("%Y-%m-%d %H:%M")
+
+
+class BroadcastRecord:
+    def __init__(self, broadcast_id, text, cursor=None, sent=0, failed=0):
+        self.broadcast_id = broadcast_id
+        self.text = text
+        self.cursor = cursor
+        self.sent = sent
+        self.failed = failed
+
+    def __repr__(self):
+        return f"BroadcastRecord({self.broadcast_id}, cursor={self.cursor})"
+
+
+class BroadcastJournal:
+    """Журнал рассылок в SQLite: у каждой рассылки свой id и курсор -
+    chat_id, до которого включительно все отправки завершены.
+
+    checkpoint() только запоминает последнее значение в памяти, на диск
+    его пишет фоновый поток раз в flush_interval одной транзакцией,
+    поэтому цикл рассылки не ждет диска. После падения рассылка
+    продолжается с курсора, повторно могут уйти только сообщения
+    за последние flush_interval секунд."""
+
+    def __init__(self, path, flush_interval=1.0):
+        self.path = path
+        self.flush_interval = flush_interval
+        self._connection = ThreadLocalConnection(path)
+        self.lock = threading.Lock()
+        self.latest = {}
+        self.stopped = threading.Event()
+
+        with self._connection() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS broadcasts ("
+                "id TEXT PRIMARY KEY, text TEXT NOT NULL, state TEXT NOT NULL, cursor INTEGER, "
+                "sent INTEGER NOT NULL DEFAULT 0, failed INTEGER NOT NULL DEFAULT 0, "
+                "started_at REAL NOT NULL, updated_at REAL NOT NULL)"
+            )
+
+        self.writer = threading.Thread(target=self._write_loop, name="broadcast-journal", daemon=True)
+        self.writer.start()
+        atexit.register(self.close)
+
+    def begin(self, broadcast_id, text):
+        """Открывает рассылку. Для уже начатой возвращает запись с курсором,
+        для завершенной или просроченной - None, ее повторять не нужно."""
+        now = time.time()
+        with self._connection() as conn:
+            conn.execute(
+                "DELETE FROM broadcasts WHERE state != ? AND updated_at < ?", (RUNNING, now - JOURNAL_RETENTION)
+            )
+            conn.execute(
+                "INSERT OR IGNORE INTO broadcasts (id, text, state, started_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (broadcast_id, text, RUNNING, now, now),
+            )
+            row = conn.execute(
+                "SELECT text, state, cursor, sent, failed FROM broadcasts WHERE id = ?", (broadcast_id,)
+            ).fetchone()
+        text, state, cursor, sent, failed = row
+        if state != RUNNING:
+            return None
+        return BroadcastRecord(broadcast_id, text, cursor, sent, failed)
+
+    def checkpoint(self, record, cursor, sent, failed):
+        """Запоминает прогресс; sent и failed считаются с начала этого запуска"""
+        with self.lock:
+            self.latest[record.broadcast_id] = (
+                cursor if cursor is not None else record.cursor,
+                record.sent + sent,
+                record.failed + failed,
+            )
+
+    def finish(self, record, sent, failed):
+        with self.lock:
+            self.latest.pop(record.broadcast_id, None)
+        with self._connection() as conn:
+            conn.execute(
+                "UPDATE broadcasts SET state = ?, sent = ?, failed = ?, updated_at = ? WHERE id = ?",
+                (DONE, record.sent + sent, record.failed + failed, time.time(), record.broadcast_id),
+            )
+
+    def resumable(self, grace):
+        """Незавершенные рассылки моложе grace секунд; более старые помечаются
+        просроченными: напоминание, пришедшее через час, уже не нужно."""
+        now = time.time()
+        with self._connection() as conn:
+            expired = conn.execute(
+                "UPDATE broadcasts SET state = ?, updated_at = ? WHERE state = ? AND started_at < ?",
+                (EXPIRED, now, RUNNING, now - grace),
+            ).rowcount
+            rows = conn.execute(
+                "SELECT id, text, cursor, sent, failed FROM broadcasts WHERE state = ? ORDER BY started_at",
+                (RUNNING,),
+            ).fetchall()
+        if expired:
+            logger.warning("Незавершенных рассылок старше %s с: %s, они пропущены", grace, expired)
+        return [BroadcastRecord(*row) for row in rows]
+
+    def _write_loop(self):
+        while not self.stopped.wait(self.flush_interval):
+            self.flush()
+
+    def flush(self):
+        with self.lock:
+            latest, self.latest = self.latest, {}
+        if not latest:
+            return
+        now = time.time()
+        try:
+            with self._connection() as conn:
+                conn.executemany(
+                    "UPDATE broadcasts SET cursor = ?, sent = ?, failed = ?, updated_at = ? "
+                    "WHERE id = ? AND state = ?",
+                    [(cursor, sent, failed, now, broadcast_id, RUNNING)
+                     for broadcast_id, (cursor, sent, failed) in latest.items()],
+                )
+        except sqlite3.Error as e:
+            logger.error("Ошибка записи журнала рассылок в %s: %s", self.path, e)
+
+    def close(self):
+        self.stopped.set()
+        self.flush()
+
+
+def create_journal(path):
+    """Журнал нужен только при хранении подписчиков на диске"""
+    if not path or path == ":memory:":
+        return None
+    return BroadcastJournal(path)
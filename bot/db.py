@@ -0,0 +1,23 @@
+import sqlite3
+import threading
+
+
+class ThreadLocalConnection:
+    """Соединение SQLite на каждый поток в режиме WAL: читатели не ждут
+    писателя, synchronous=NORMAL - без fsync на каждый коммит.
+    Вызов возвращает соединение текущего потока; connect_kwargs уходят
+    в sqlite3.connect (timeout, isolation_level)."""
+
+    def __init__(self, path, **connect_kwargs):
+        self.path = path
+        self.connect_kwargs = {"check_same_thread": False, **connect_kwargs}
+        self.local = threading.local()
+
+    def __call__(self):
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, **self.connect_kwargs)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self.local.conn = conn
+        return conn
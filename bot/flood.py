@@ -0,0 +1,161 @@
+import collections
+import inspect
+import threading
+import time
+
+from telebot import util
+
+from utils.logger import logger
+from utils.metrics import metrics
+
+# Команды, которые дорого обходятся: /test рассылает всем подписчикам,
+# /ping делает три запроса к API. Значение - (запросов в секунду, запас)
+DEFAULT_COMMAND_LIMITS = {
+    "ping": (1 / 10, 2),
+    "test": (1 / 60, 1),
+}
+
+
+class FloodControl:
+    """Ограничение входящих обновлений до вызова обработчиков.
+
+    Токен-бакеты на каждый чат, на каждую пару (чат, дорогая команда) и
+    общий на весь бот. Бакет чата - это два числа в OrderedDict, число
+    бакетов ограничено max_entries, давно не писавшие чаты вытесняются
+    (LRU), поэтому память не растет с числом пользователей. Повтор того же
+    текста сообщения из того же чата в пределах duplicate_window секунд
+    отбрасывается; для сравнения хранится хеш текста, а не сам текст.
+    Команды из admin_only доступны только пользователям из admin_ids -
+    это единственная проверка прав, обработчики ее не повторяют."""
+
+    def __init__(self, chat_rate=1.0, chat_burst=5, global_rate=200.0, command_limits=None,
+                 admin_only=(), admin_ids=(), max_entries=100_000, duplicate_window=2.0):
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.global_rate = global_rate
+        self.global_bucket = [float(global_rate), time.monotonic()]
+        self.command_limits = dict(DEFAULT_COMMAND_LIMITS if command_limits is None else command_limits)
+        self.admin_only = frozenset(admin_only)
+        self.admin_ids = frozenset(admin_ids)
+        self.max_entries = max_entries
+        self.duplicate_window = duplicate_window
+        self.buckets = collections.OrderedDict()
+        self.last_texts = collections.OrderedDict()
+        self.lock = threading.Lock()
+        metrics.gauge("bot_flood_tracked_entries", lambda: len(self.buckets))
+
+    def _take(self, bucket, rate, burst, now):
+        tokens = min(burst, bucket[0] + (now - bucket[1]) * rate)
+        bucket[1] = now
+        if tokens < 1:
+            bucket[0] = tokens
+            return False
+        bucket[0] = tokens - 1
+        return True
+
+    def _take_keyed(self, key, rate, burst, now):
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            bucket = self.buckets[key] = [float(burst), now]
+            if len(self.buckets) > self.max_entries:
+                self.buckets.popitem(last=False)
+        else:
+            self.buckets.move_to_end(key)
+        return self._take(bucket, rate, burst, now)
+
+    def _is_duplicate(self, chat_id, text_hash, now):
+        last = self.last_texts.get(chat_id)
+        return last is not None and last[0] == text_hash and now - last[1] < self.duplicate_window
+
+    def _remember_text(self, chat_id, text_hash, now):
+        """Запоминается только принятое сообщение: повтор не продлевает окно,
+        а отклоненное по лимиту не делает повтором следующую попытку"""
+        self.last_texts[chat_id] = (text_hash, now)
+        self.last_texts.move_to_end(chat_id)
+        if len(self.last_texts) > self.max_entries:
+            self.last_texts.popitem(last=False)
+
+    def check(self, chat_id, user_id, text=None):
+        """Причина отказа или None, если обновление можно обрабатывать;
+        text - текст сообщения, только он проверяется на повтор"""
+        command = util.extract_command(text) if text else None
+        if command in self.admin_only and user_id not in self.admin_ids:
+            return "admin_only"
+        text_hash = hash(text) if text is not None else None
+        now = time.monotonic()
+        with self.lock:
+            if text_hash is not None and self._is_duplicate(chat_id, text_hash, now):
+                return "duplicate"
+            if not self._take(self.global_bucket, self.global_rate, self.global_rate, now):
+                return "global"
+            if not self._take_keyed(chat_id, self.chat_rate, self.chat_burst, now):
+                return "chat"
+            limit = self.command_limits.get(command)
+            if limit and not self._take_keyed((chat_id, command), limit[0], limit[1], now):
+                return "command"
+            if text_hash is not None:
+                self._remember_text(chat_id, text_hash, now)
+        return None
+
+    def _reject(self, reason, chat_id, command=None):
+        if command in self.command_limits or command in self.admin_only:
+            metrics.inc("bot_updates_rejected_total", reason=reason, command=command)
+        else:
+            metrics.inc("bot_updates_rejected_total", reason=reason)
+        logger.debug("Обновление от %s отброшено: %s", chat_id, reason)
+        return True
+
+    def reject_message(self, message):
+        """Фильтр для message_handler: True - сообщение отбрасывается"""
+        text = message.text if message.content_type == "text" else None
+        reason = self.check(message.chat.id, message.from_user.id if message.from_user else None, text)
+        if reason is None:
+            return False
+        return self._reject(reason, message.chat.id, util.extract_command(text) if text else None)
+
+    def reject_callback(self, call):
+        """Нажатия кнопок ограничиваются теми же бакетами, но не попадают
+        в проверку повторов: callback_data не сравнивается с текстами"""
+        chat_id = call.message.chat.id if call.message else call.from_user.id
+        reason = self.check(chat_id, call.from_user.id)
+        if reason is None:
+            return False
+        return self._reject(reason, chat_id)
+
+
+def drop_update(update):
+    """Отброшенное сообщение ничего не отправляет в API"""
+
+
+async def drop_update_async(update):
+    pass
+
+
+def answer_dropped(bot):
+    """Отброшенное нажатие кнопки получает пустой answer_callback_query,
+    иначе кнопка у пользователя крутится до таймаута клиента"""
+    def answer(call):
+        try:
+            bot.answer_callback_query(call.id)
+        except Exception as e:
+            logger.debug("Не удалось ответить на отброшенный callback: %s", e)
+
+    async def answer_async(call):
+        try:
+            await bot.answer_callback_query(call.id)
+        except Exception as e:
+            logger.debug("Не удалось ответить на отброшенный callback: %s", e)
+
+    return answer_async if inspect.iscoroutinefunction(bot.process_new_updates) else answer
+
+
+def limit_flood(bot, flood):
+    """Регистрирует фильтр FloodControl раньше всех обработчиков бота.
+    Вызывать до route_commands и регистрации остальных обработчиков."""
+    if getattr(bot, "flood_control", None) is not None:
+        return bot
+    drop = drop_update_async if inspect.iscoroutinefunction(bot.process_new_updates) else drop_update
+    bot.message_handler(func=flood.reject_message, content_types=util.content_type_media)(drop)
+    bot.callback_query_handler(func=flood.reject_callback)(answer_dropped(bot))
+    bot.flood_control = flood
+    return bot
@@ -1,67 +1,91 @@
 from datetime import datetime
 import telebot
 
-from config import subscribed_users, WATER_REMINDER_TIMES
+from config import (
+    ADMIN_IDS, OUTBOX_WORKERS, OUTBOX_RATE, BROADCAST_RATE, SUBSCRIBER_COUNT_TTL,
+    FLOOD_CHAT_RATE, FLOOD_CHAT_BURST, FLOOD_GLOBAL_RATE, FLOOD_MAX_CHATS, ADMIN_ONLY_COMMANDS,
+)
+from bot.flood import FloodControl, limit_flood
+from bot.intake import CALLBACK_PREFIX, format_intake_stats, utc_offset
+from bot.outbox import queued
+from bot.render import ApproximateCount, RenderCache, render_day_parts, render_schedule, render_time_list
+from bot.router import route_commands
+from bot.user_schedule import format_minute, format_next_reminder
 from utils.logger import logger
+from utils.metrics import instrument_bot, metrics
+
+COMMANDS_TEXT = (
+    "Команды:\n"
+    "/start - начать работу\n"
+    "/subscribe - подписаться на напоминания\n"
+    "/unsubscribe - отписаться от напоминаний\n"
+    "/status - статус подписки\n"
+    "/next - следующее напоминание\n"
+    "/schedule - расписание напоминаний\n"
+    "/stats - статистика выпитой воды\n"
+    "/timezone - часовой пояс\n"
+    "/times - свое время напоминаний"
+)
+
+
+def render_welcome(times):
+    return (
+        "Water Reminder Bot \n\n"
+        "Я буду напоминать вам пить воду в оптимальное время:\n"
+        f"{render_day_parts(times)}\n\n{COMMANDS_TEXT}"
+    )
 
 
 class BotHandlers:
     def __init__(self, bot, scheduler):
-        self.bot = bot
+        flood = FloodControl(
+            FLOOD_CHAT_RATE, FLOOD_CHAT_BURST, FLOOD_GLOBAL_RATE,
+            admin_only=ADMIN_ONLY_COMMANDS, admin_ids=ADMIN_IDS, max_entries=FLOOD_MAX_CHATS,
+        )
+        bot = queued(bot, OUTBOX_WORKERS, OUTBOX_RATE, BROADCAST_RATE)
+        self.bot = instrument_bot(route_commands(limit_flood(bot, flood)))
         self.scheduler = scheduler
+        self.subscribers = scheduler.subscribers
+        self.intake = scheduler.intake
+        self.render_cache = RenderCache()
+        self.subscriber_count = ApproximateCount(self.subscribers, SUBSCRIBER_COUNT_TTL)
         self.setup_handlers()
 
     def setup_handlers(self):
 
         @self.bot.message_handler(commands=['start', 'help'])
         def send_welcome(message):
-            welcome_text = (
-                "Water Reminder Bot \n\n"
-                "Я буду напоминать вам пить воду в оптимальное время:\n"
-                "• 09:00 - Утро\n"
-                "• 13:00 - Обед\n"
-                "• 15:00 - Послеобеденное время\n"
-                "• 17:00 - Вечер\n"
-                "• 23:00 - Перед сном\n\n"
-                "Команды:\n"
-                "/start - начать работу\n"
-                "/subscribe - подписаться на напоминания\n"
-                "/unsubscribe - отписаться от напоминаний\n"
-                "/status - статус подписки\n"
-                "/next - следующее напоминание\n"
-                "/schedule - расписание напоминаний"
-            )
+            times = self.scheduler.config.times
+            welcome_text = self.render_cache.get("welcome", times, lambda: render_welcome(times))
             self.bot.reply_to(message, welcome_text)
-            logger.info(f"Пользователь {message.from_user.id} вызвал команду /start")
+            logger.info("Пользователь %s вызвал команду /start", message.from_user.id)
 
         @self.bot.message_handler(commands=['subscribe'])
         def subscribe_user(message):
             chat_id = message.chat.id
-            if chat_id in subscribed_users:
+            if not self.subscribers.add(chat_id):
                 self.bot.reply_to(message, "Вы уже подписаны на напоминания о воде!")
             else:
-                subscribed_users.add(chat_id)
                 response = (
                     "Вы успешно подписались на напоминания о воде! "
-                    "Я буду напоминать вам в 9, 13, 15, 17 и 23 часа."
+                    f"Я буду напоминать вам в {render_time_list(self.scheduler.config.times)}."
                 )
                 self.bot.reply_to(message, response)
-                logger.info(f"Пользователь {chat_id} подписался на напоминания")
+                logger.info("Пользователь %s подписался на напоминания", chat_id)
 
         @self.bot.message_handler(commands=['unsubscribe'])
         def unsubscribe_user(message):
             chat_id = message.chat.id
-            if chat_id in subscribed_users:
-                subscribed_users.remove(chat_id)
+            if self.subscribers.discard(chat_id):
                 self.bot.reply_to(message, "Вы отписались от напоминаний о воде.")
-                logger.info(f"Пользователь {chat_id} отписался от напоминаний")
+                logger.info("Пользователь %s отписался от напоминаний", chat_id)
             else:
                 self.bot.reply_to(message, "ℹВы не были подписаны на напоминания.")
 
         @self.bot.message_handler(commands=['status'])
         def check_status(message):
             chat_id = message.chat.id
-            if chat_id in subscribed_users:
+            if chat_id in self.subscribers:
                 self.bot.reply_to(message, "Вы подписаны на напоминания о воде.")
             else:
                 response = (
@@ -72,28 +96,140 @@ class BotHandlers:
 
         @self.bot.message_handler(commands=['next'])
         def next_reminder(message):
-            next_time = self.scheduler.get_next_reminder_time()
-            current_time = datetime.now()
-            time_until = next_time - current_time
-
-            hours = int(time_until.total_seconds() // 3600)
-            minutes = int((time_until.total_seconds() % 3600) // 60)
-
-            response = (
-                f"Следующее напоминание через {hours}ч {minutes}м "
-                f"в {next_time.strftime('%H:%M')}"
-            )
+            user_next = self.scheduler.user_reminders.next_reminder(message.chat.id)
+            if user_next:
+                time_until = user_next - datetime.now(user_next.tzinfo)
+                response = format_next_reminder(user_next, time_until.total_seconds())
+            else:
+                response = self.scheduler.get_next_reminder_reply()
             self.bot.reply_to(message, response)
 
         @self.bot.message_handler(commands=['schedule'])
         def show_schedule(message):
-            schedule_text = "📅 Расписание напоминаний:\n\n"
-            for time_str in WATER_REMINDER_TIMES:
-                schedule_text += f"• {time_str}\n"
+            user_schedule = self.scheduler.user_reminders.get(message.chat.id)
+            if user_schedule:
+                tz_name, minutes = user_schedule
+                schedule_text = f"📅 Ваше расписание ({tz_name}):\n\n"
+                schedule_text += "".join(f"• {format_minute(m)}\n" for m in minutes)
+                self.bot.reply_to(message, schedule_text)
+                return
 
-            schedule_text += f"\nВсего подписанных пользователей: {len(subscribed_users)}"
+            times = self.scheduler.config.times
+            count = self.subscriber_count.get()
+            schedule_text = self.render_cache.get(
+                "schedule", (times, count),
+                lambda: render_schedule(times, count, title="📅 Расписание напоминаний:"),
+            )
             self.bot.reply_to(message, schedule_text)
 
+        @self.bot.message_handler(commands=['stats'])
+        def show_stats(message):
+            if self.intake is None:
+                self.bot.reply_to(message, "Статистика недоступна: журнал воды выключен.")
+                return
+            user_schedule = self.scheduler.user_reminders.get(message.chat.id)
+            stats = self.intake.stats(message.chat.id, utc_offset(user_schedule[0] if user_schedule else None))
+            self.bot.reply_to(message, format_intake_stats(stats))
+
+        @self.bot.callback_query_handler(func=lambda call: call.data.startswith(CALLBACK_PREFIX))
+        def handle_intake(call):
+            if self.intake is None or call.message is None:
+                self.bot.answer_callback_query(call.id, "Журнал воды выключен.")
+                return
+            try:
+                ml = int(call.data[len(CALLBACK_PREFIX):])
+            except ValueError:
+                self.bot.answer_callback_query(call.id)
+                return
+            ml = max(0, min(ml, 2000))
+            chat_id = call.message.chat.id
+            self.intake.append(chat_id, ml)
+
+            result = f"✅ Выпито {ml} мл" if ml else "Напоминание пропущено"
+            self.bot.answer_callback_query(call.id, "Записано!")
+            # Старые сообщения Telegram отдает без текста, их кнопки не убрать
+            if call.message.text:
+                self.bot.edit_message_text(f"{call.message.text}\n\n{result}", chat_id, call.message.message_id)
+            logger.info("Пользователь %s отметил воду: %s мл", chat_id, ml)
+
+        @self.bot.callback_query_handler(func=lambda call: call.data.startswith("snooze:"))
+        def handle_snooze(call):
+            if call.message is None:
+                self.bot.answer_callback_query(call.id)
+                return
+            try:
+                minutes = max(1, min(int(call.data.split(":", 1)[1]), 24 * 60))
+            except ValueError:
+                self.bot.answer_callback_query(call.id)
+                return
+            chat_id = call.message.chat.id
+            response = self.scheduler.snooze(chat_id, minutes)
+            self.bot.answer_callback_query(call.id, response)
+            if call.message.text:
+                self.bot.edit_message_text(f"{call.message.text}\n\n⏰ {response}", chat_id, call.message.message_id)
+            logger.info("Пользователь %s отложил напоминание на %s мин", chat_id, minutes)
+
+        @self.bot.message_handler(commands=['timezone'])
+        def set_timezone(message):
+            args = message.text.split()[1:]
+            if not args:
+                user_schedule = self.scheduler.user_reminders.get(message.chat.id)
+                current = user_schedule[0] if user_schedule else "время сервера"
+                response = (
+                    f"Ваш часовой пояс: {current}\n"
+                    "Пример: /timezone Asia/Vladivostok"
+                )
+                self.bot.reply_to(message, response)
+                return
+
+            try:
+                tz_name, minutes = self.scheduler.user_reminders.update(message.chat.id, tz_name=args[0])
+            except ValueError as e:
+                self.bot.reply_to(message, f"Не удалось изменить часовой пояс: {e}")
+                return
+            times = ", ".join(format_minute(m) for m in minutes)
+            self.bot.reply_to(message, f"Часовой пояс {tz_name} сохранен. Напоминания в {times}")
+            logger.info("Пользователь %s выбрал часовой пояс %s", message.chat.id, tz_name)
+
+        @self.bot.message_handler(commands=['times'])
+        def set_times(message):
+            args = message.text.replace(",", " ").split()[1:]
+            if not args:
+                response = (
+                    "Укажите время напоминаний.\n"
+                    "Пример: /times 08:00 12:30 20:00 или /times default"
+                )
+                self.bot.reply_to(message, response)
+                return
+
+            if args[0] == "default":
+                self.scheduler.user_reminders.reset(message.chat.id)
+                self.bot.reply_to(message, "Вернули стандартное расписание напоминаний.")
+                return
+
+            try:
+                tz_name, minutes = self.scheduler.user_reminders.update(message.chat.id, times=args)
+            except ValueError as e:
+                self.bot.reply_to(message, f"Не удалось разобрать время: {e}")
+                return
+            times = ", ".join(format_minute(m) for m in minutes)
+            self.bot.reply_to(message, f"Напоминания будут приходить в {times} ({tz_name})")
+            logger.info("Пользователь %s задал время напоминаний: %s", message.chat.id, times)
+
+        @self.bot.message_handler(commands=['metrics'])
+        def show_metrics(message):
+            self.bot.reply_to(message, metrics.summary()[:4000])
+
+        @self.bot.message_handler(commands=['reload'])
+        def reload_reminders(message):
+            try:
+                changes = self.scheduler.reload_config()
+            except ValueError as e:
+                self.bot.reply_to(message, f"Настройки не перезагружены: {e}")
+                return
+            self.bot.reply_to(message, f"Настройки напоминаний перезагружены: {changes}")
+            logger.info("Пользователь %s перезагрузил настройки напоминаний", message.from_user.id)
+
         @self.bot.message_handler(func=lambda message: True)
         def echo_all(message):
             response = (
@@ -0,0 +1,183 @@
+import atexit
+import os
+import struct
+import time
+from datetime import datetime, timezone
+
+from bot.batching import BatchWriter
+from bot.user_schedule import get_zone
+from utils.logger import logger
+
+DAY = 86400
+# Запись журнала: chat_id, время (unix, секунды), мл - 14 байт без выравнивания
+RECORD = struct.Struct("<qIh")
+RECORD_DTYPE = [("chat_id", "<i8"), ("ts", "<u4"), ("ml", "<i2")]
+# Число файлов-корзин; менять только вместе с переносом данных
+BUCKETS = 256
+DEFAULT_GLASS_ML = 250
+
+# callback_data кнопок под напоминанием: water:<мл>, 0 - пропустил
+CALLBACK_PREFIX = "water:"
+
+
+class IntakeStats:
+    """Итоги по одному чату; week - мл по дням за 7 дней, последний - сегодня"""
+
+    def __init__(self, today_day=0, week=None, streak=0, best_streak=0, total=0, days=0, skipped=0):
+        self.today_day = today_day
+        self.week = week or [0] * 7
+        self.streak = streak
+        self.best_streak = best_streak
+        self.total = total
+        self.days = days
+        self.skipped = skipped
+
+    @property
+    def today(self):
+        return self.week[-1]
+
+    @property
+    def week_total(self):
+        return sum(self.week)
+
+
+def compute_stats(ts, ml, utc_offset=0, now=None):
+    """Дневные суммы, неделя и серии дней по массивам numpy ts и ml одного чата.
+
+    Все считается операциями над массивами: день записи - целочисленное
+    деление, суммы по дням - bincount, серии - по границам участков из
+    дней с водой. Сегодняшний день может быть еще не отмечен, поэтому
+    текущая серия считается до сегодня или до вчера."""
+    import numpy as np
+
+    now = time.time() if now is None else now
+    today = int(now + utc_offset) // DAY
+    days = (ts.astype(np.int64) + utc_offset) // DAY
+    past = days <= today
+    days, ml = days[past], ml[past].astype(np.int64)
+    if not days.size:
+        return IntakeStats(today)
+
+    first = int(days.min())
+    totals = np.bincount(days - first, weights=ml, minlength=today - first + 1).astype(np.int64)
+    drank = totals > 0
+
+    week = totals[-7:].tolist()
+    week = [0] * (7 - len(week)) + week
+
+    end = len(drank) if drank[-1] else len(drank) - 1
+    misses = np.flatnonzero(~drank[:end])
+    streak = end - (int(misses[-1]) + 1 if misses.size else 0)
+
+    edges = np.diff(np.concatenate(([0], drank.astype(np.int8), [0])))
+    runs = np.flatnonzero(edges == -1) - np.flatnonzero(edges == 1)
+    best_streak = int(runs.max()) if runs.size else 0
+
+    skipped = int(np.count_nonzero((ml == 0) & (days > today - 7)))
+    return IntakeStats(today, week, streak, best_streak, int(ml.sum()), int(drank.sum()), skipped)
+
+
+def utc_offset(tz_name=None):
+    """Сдвиг границы дня: пояс пользователя из /timezone или время сервера,
+    по которому приходят общие напоминания"""
+    if tz_name:
+        return int(datetime.now(get_zone(tz_name)).utcoffset().total_seconds())
+    return time.localtime().tm_gmtoff
+
+
+def format_intake_stats(stats):
+    if not stats.days and not stats.skipped:
+        return "Пока нет отметок. Нажимайте «Выпил» под напоминаниями, и здесь появится статистика."
+    lines = [
+        "📊 Статистика воды:\n",
+        f"Сегодня: {stats.today} мл",
+        f"За 7 дней: {stats.week_total} мл (в среднем {stats.week_total // 7} мл в день)",
+        f"Серия: {stats.streak} дн. подряд, рекорд {stats.best_streak}",
+        f"Пропущено напоминаний за неделю: {stats.skipped}",
+        f"Всего: {stats.total} мл за {stats.days} дн.\n",
+    ]
+    for offset, ml in enumerate(stats.week):
+        day = datetime.fromtimestamp((stats.today_day - 6 + offset) * DAY, timezone.utc)
+        lines.append(f"• {day:%d.%m} - {ml} мл")
+    return "\n".join(lines)
+
+
+class IntakeLog:
+    """Журнал выпитой воды: (chat_id, время, мл) в файлах с записями
+    фиксированной длины.
+
+    Записи чата дописываются в конец файла корзины chat_id % buckets,
+    файлы никогда не переписываются. append() только кладет запись в
+    очередь, на диск пачки пишет фоновый поток. Для /stats файл корзины
+    отображается в память (numpy.memmap), строки чата отбираются маской,
+    поэтому чтение не зависит от числа записей остальных корзин."""
+
+    def __init__(self, directory, buckets=BUCKETS, batch_size=1000, flush_interval=0.2):
+        self.directory = directory
+        self.buckets = buckets
+        os.makedirs(directory, exist_ok=True)
+        self._truncate_partial()
+
+        self.writer = BatchWriter(self._write_batch, "intake-writer", batch_size, flush_interval)
+        atexit.register(self.close)
+
+    def _path(self, bucket):
+        return os.path.join(self.directory, f"intake-{bucket:03d}.bin")
+
+    def _truncate_partial(self):
+        """Обрезает недописанную при падении запись, иначе следующие
+        записи корзины сдвинулись бы относительно границ"""
+        for bucket in range(self.buckets):
+            path = self._path(bucket)
+            if not os.path.exists(path):
+                continue
+            size = os.path.getsize(path)
+            if size % RECORD.size:
+                logger.warning("Журнал воды %s: обрезана недописанная запись", path)
+                os.truncate(path, size - size % RECORD.size)
+
+    def append(self, chat_id, ml, ts=None):
+        ts = int(time.time()) if ts is None else int(ts)
+        self.writer.put((chat_id % self.buckets, RECORD.pack(chat_id, ts, ml)))
+
+    def _write_batch(self, batch):
+        by_bucket = {}
+        for bucket, record in batch:
+            by_bucket.setdefault(bucket, []).append(record)
+        for bucket, records in by_bucket.items():
+            try:
+                with open(self._path(bucket), "ab") as f:
+                    f.write(b"".join(records))
+            except OSError as e:
+                logger.error("Ошибка записи журнала воды в %s: %s", self._path(bucket), e)
+
+    def records(self, chat_id):
+        """Массивы ts и ml всех записей чата"""
+        import numpy as np
+
+        self.flush()
+        path = self._path(chat_id % self.buckets)
+        count = os.path.getsize(path) // RECORD.size if os.path.exists(path) else 0
+        if not count:
+            return np.empty(0, np.uint32), np.empty(0, np.int16)
+        data = np.memmap(path, dtype=np.dtype(RECORD_DTYPE), mode="r", shape=(count,))
+        rows = data[data["chat_id"] == chat_id]
+        return rows["ts"], rows["ml"]
+
+    def stats(self, chat_id, utc_offset=0, now=None):
+        ts, ml = self.records(chat_id)
+        return compute_stats(ts, ml, utc_offset, now)
+
+    def flush(self):
+        """Ждет записи того, что добавлено до вызова; новые записи не ждет"""
+        self.writer.flush()
+
+    def close(self):
+        self.flush()
+
+
+def create_intake_log(directory):
+    """Без каталога журнал выключен: кнопки под напоминаниями не показываются"""
+    if not directory:
+        return None
+    return IntakeLog(directory)
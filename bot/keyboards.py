@@ -0,0 +1,64 @@
+import functools
+
+
+# telebot.types импортируется при первой сборке клавиатуры, а не при импорте модуля
+def make_main_keyboard():
+    from telebot import types
+
+    keyboard = types.ReplyKeyboardMarkup(resize_keyboard=True)
+    keyboard.row("/about", "/sum")
+    keyboard.row("/hide", "/show")
+    keyboard.row("/help", "/ping")
+    return keyboard
+
+
+def make_confirm_keyboard():
+    from telebot import types
+
+    keyboard = types.InlineKeyboardMarkup()
+    keyboard.add(
+        types.InlineKeyboardButton("Да", callback_data="confirm:yes"),
+        types.InlineKeyboardButton("Нет", callback_data="confirm:no"),
+        types.InlineKeyboardButton("Позже", callback_data="confirm:later"),
+        types.InlineKeyboardButton("Не уверен", callback_data="confirm:unsure")
+    )
+    return keyboard
+
+
+def make_intake_keyboard(glass_ml, snooze_minutes=None):
+    from telebot import types
+
+    keyboard = types.InlineKeyboardMarkup()
+    keyboard.add(
+        types.InlineKeyboardButton(f"💧 Выпил {glass_ml} мл", callback_data=f"water:{glass_ml}"),
+        types.InlineKeyboardButton("Пропустил", callback_data="water:0"),
+    )
+    if snooze_minutes:
+        keyboard.add(
+            types.InlineKeyboardButton(f"⏰ Через {snooze_minutes} мин", callback_data=f"snooze:{snooze_minutes}")
+        )
+    return keyboard
+
+
+@functools.lru_cache(maxsize=None)
+def main_keyboard_json():
+    """Разметка клавиатур не меняется, поэтому JSON строится один раз;
+    TeleBot передает строку в reply_markup как есть"""
+    return make_main_keyboard().to_json()
+
+
+@functools.lru_cache(maxsize=None)
+def confirm_keyboard_json():
+    return make_confirm_keyboard().to_json()
+
+
+@functools.lru_cache(maxsize=None)
+def intake_keyboard_json(glass_ml, snooze_minutes=None):
+    return make_intake_keyboard(glass_ml, snooze_minutes).to_json()
+
+
+@functools.lru_cache(maxsize=None)
+def remove_keyboard_json():
+    from telebot import types
+
+    return types.ReplyKeyboardRemove().to_json()
@@ -0,0 +1,177 @@
+import collections
+import threading
+import time
+from concurrent.futures import Future
+
+from bot.broadcast import RATE_LIMITED, TokenBucket, classify_error, get_retry_after
+from utils.logger import logger
+from utils.metrics import metrics
+
+# Полосы в порядке приоритета
+INTERACTIVE = "interactive"
+CONTROL = "control"
+BULK = "bulk"
+LANES = (INTERACTIVE, CONTROL, BULK)
+
+# Методы бота, которые идут через очередь; None - полоса самого QueuedBot
+QUEUED_METHODS = {
+    "send_message": None,
+    "reply_to": None,
+    "edit_message_text": CONTROL,
+    "answer_callback_query": CONTROL,
+}
+
+
+class OutboundRequest:
+    def __init__(self, func, args, kwargs):
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.future = Future()
+        self.enqueued = time.monotonic()
+
+
+class Lane:
+    def __init__(self, name, rate, max_workers):
+        self.name = name
+        self.queue = collections.deque()
+        self.budget = TokenBucket(rate)
+        self.max_workers = max_workers
+        self.busy = 0
+
+
+class Outbox:
+    """Общая очередь исходящих запросов к Bot API с полосами приоритета.
+
+    Свободный поток берет запрос из первой непустой полосы, у которой есть
+    бюджет: ответы на команды, затем правки сообщений и ответы на кнопки,
+    затем массовые рассылки. У каждой полосы свой лимит скорости, поверх -
+    общий лимит rate на токен. Рассылке достается не больше workers - reserved
+    потоков, поэтому ответ пользователю не ждет, пока разойдется вся рассылка.
+
+    bulk_rate - лимит полосы рассылки; передается BROADCAST_RATE, чтобы
+    лимит BroadcastEngine и полосы совпадали. Полоса не быстрее
+    rate * bulk_share: остаток общего лимита токена держится для ответов
+    пользователям, иначе они ждут токен вместе с рассылкой. Поэтому рассылка
+    через Outbox идет не быстрее min(bulk_rate, rate * bulk_share)."""
+
+    def __init__(self, workers=10, rate=30, bulk_share=0.8, reserved=2, bulk_rate=None):
+        self.bucket = TokenBucket(rate)
+        self.bulk_rate = rate * bulk_share
+        if bulk_rate and bulk_rate > self.bulk_rate:
+            logger.warning(
+                "Лимит рассылки %s/с выше доли полосы рассылки в Outbox, рассылка пойдет со скоростью %s/с",
+                bulk_rate, self.bulk_rate,
+            )
+        elif bulk_rate:
+            self.bulk_rate = bulk_rate
+        self.lanes = {
+            INTERACTIVE: Lane(INTERACTIVE, rate, workers),
+            CONTROL: Lane(CONTROL, rate, workers),
+            BULK: Lane(BULK, self.bulk_rate, max(1, workers - reserved)),
+        }
+        self.condition = threading.Condition()
+        for name, lane in self.lanes.items():
+            metrics.gauge("bot_outbox_queue_depth", lambda lane=lane: len(lane.queue), lane=name)
+        for i in range(workers):
+            threading.Thread(target=self._worker, name=f"outbox-{i}", daemon=True).start()
+
+    def submit(self, lane, func, *args, **kwargs):
+        """Ставит вызов func(*args, **kwargs) в полосу lane, возвращает Future"""
+        request = OutboundRequest(func, args, kwargs)
+        with self.condition:
+            self.lanes[lane].queue.append(request)
+            self.condition.notify()
+        return request.future
+
+    def call(self, lane, func, *args, **kwargs):
+        """Как submit, но ждет ответа и возвращает результат вызова"""
+        return self.submit(lane, func, *args, **kwargs).result()
+
+    def depth(self, lane):
+        return len(self.lanes[lane].queue)
+
+    def _take(self):
+        with self.condition:
+            while True:
+                wait = None
+                for lane in self.lanes.values():
+                    if not lane.queue or lane.busy >= lane.max_workers:
+                        continue
+                    delay = lane.budget.try_acquire()
+                    if delay:
+                        wait = delay if wait is None else min(wait, delay)
+                        continue
+                    lane.busy += 1
+                    return lane, lane.queue.popleft()
+                self.condition.wait(wait)
+
+    def _worker(self):
+        while True:
+            lane, request = self._take()
+            try:
+                self._run(lane, request)
+            finally:
+                with self.condition:
+                    lane.busy -= 1
+                    self.condition.notify()
+
+    def _run(self, lane, request):
+        self.bucket.acquire()
+        started = time.monotonic()
+        metrics.observe("bot_outbox_wait_seconds", started - request.enqueued, lane=lane.name)
+        try:
+            result = request.func(*request.args, **request.kwargs)
+        except Exception as e:
+            if classify_error(e) == RATE_LIMITED:
+                # 429 относится ко всему токену, поэтому ждут все полосы
+                retry_after = get_retry_after(e)
+                logger.warning("Превышен лимит Telegram, очередь отправки на паузе %s с", retry_after)
+                self.bucket.pause(retry_after)
+            metrics.inc("bot_outbox_requests_total", lane=lane.name, status="error")
+            request.future.set_exception(e)
+        else:
+            metrics.inc("bot_outbox_requests_total", lane=lane.name, status="ok")
+            request.future.set_result(result)
+        finally:
+            metrics.observe("bot_outbox_latency_seconds", time.monotonic() - request.enqueued, lane=lane.name)
+
+
+class QueuedBot:
+    """Обертка над TeleBot: send_message, reply_to, edit_message_text и
+    answer_callback_query идут через Outbox в свою полосу, остальные
+    атрибуты (регистрация обработчиков, polling, get_me) - напрямую в бот."""
+
+    def __init__(self, bot, outbox, lane=INTERACTIVE):
+        object.__setattr__(self, "bot", bot)
+        object.__setattr__(self, "outbox", outbox)
+        object.__setattr__(self, "default_lane", lane)
+
+    def lane(self, lane):
+        """Та же обертка, но отправки по умолчанию идут в полосу lane"""
+        return QueuedBot(self.bot, self.outbox, lane)
+
+    def __getattr__(self, name):
+        attr = getattr(self.bot, name)
+        if name not in QUEUED_METHODS:
+            return attr
+        lane = QUEUED_METHODS[name] or self.default_lane
+        if self.default_lane == BULK:
+            lane = BULK
+
+        def queued_call(*args, **kwargs):
+            return self.outbox.call(lane, attr, *args, **kwargs)
+        return queued_call
+
+    def __setattr__(self, name, value):
+        setattr(self.bot, name, value)
+
+
+def queued(bot, workers=10, rate=30, bulk_rate=None):
+    """QueuedBot поверх bot; все обертки одного бота делят один Outbox"""
+    if isinstance(bot, QueuedBot):
+        return bot.lane(INTERACTIVE)
+    outbox = getattr(bot, "outbox", None)
+    if outbox is None:
+        outbox = bot.outbox = Outbox(workers=workers, rate=rate, bulk_rate=bulk_rate)
+    return QueuedBot(bot, outbox)
@@ -0,0 +1,26 @@
+class HandlerRegistry:
+    """Обработчики, объявленные до создания бота.
+
+    Декораторы message_handler и callback_query_handler только запоминают
+    регистрацию, install(bot) переносит все в бот в порядке объявления.
+    Модуль с обработчиками можно импортировать без токена и без TeleBot."""
+
+    def __init__(self):
+        self.entries = []
+
+    def _remember(self, method, kwargs):
+        def decorator(handler):
+            self.entries.append((method, kwargs, handler))
+            return handler
+        return decorator
+
+    def message_handler(self, **kwargs):
+        return self._remember("message_handler", kwargs)
+
+    def callback_query_handler(self, **kwargs):
+        return self._remember("callback_query_handler", kwargs)
+
+    def install(self, bot):
+        for method, kwargs, handler in self.entries:
+            getattr(bot, method)(**kwargs)(handler)
+        return bot
@@ -0,0 +1,91 @@
+import json
+import os
+
+from bot.user_schedule import format_minute, parse_times
+
+
+class ReminderConfig:
+    """Настраиваемая часть напоминаний: время по умолчанию и текст.
+
+    Объект не меняется после создания: перезагрузка собирает новый и
+    подменяет ссылку целиком, поэтому читатели без блокировок видят либо
+    старые, либо новые время и текст, но не их смесь."""
+
+    def __init__(self, times, message):
+        if not isinstance(times, (list, tuple)) or not all(isinstance(t, str) for t in times):
+            raise ValueError("время напоминаний - список строк HH:MM")
+        self.minutes = parse_times(times)
+        self.times = tuple(format_minute(m) for m in self.minutes)
+        if not isinstance(message, str) or not message.strip():
+            raise ValueError("текст напоминания пуст")
+        self.message = message
+
+    def __eq__(self, other):
+        return isinstance(other, ReminderConfig) and (self.times, self.message) == (other.times, other.message)
+
+    def __repr__(self):
+        return f"ReminderConfig({', '.join(self.times)})"
+
+
+def load_reminder_config(path, default):
+    """Читает JSON вида {"times": ["09:00", ...], "message": "..."};
+    отсутствующие ключи берутся из default. Ошибки - ValueError."""
+    try:
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+    except OSError as e:
+        raise ValueError(f"не удалось прочитать {path}: {e}")
+    except json.JSONDecodeError as e:
+        raise ValueError(f"{path}: неверный JSON: {e}")
+    if not isinstance(data, dict):
+        raise ValueError(f"{path}: ожидается объект JSON")
+    times = data.get("times", default.times)
+    if isinstance(times, str):
+        times = times.replace(",", " ").split()
+    if not isinstance(times, (list, tuple)) or not all(isinstance(t, str) for t in times):
+        raise ValueError(f'{path}: "times" - список строк HH:MM или строка "09:00, 13:00"')
+    message = data.get("message", default.message)
+    if not isinstance(message, str):
+        raise ValueError(f'{path}: "message" должен быть строкой')
+    return ReminderConfig(times, message)
+
+
+class ConfigFile:
+    """Слежение за файлом настроек по os.stat: проверка не читает файл
+    и не зависит от числа подписчиков"""
+
+    def __init__(self, path):
+        self.path = path
+        self.signature = self._signature()
+
+    def _signature(self):
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    @property
+    def exists(self):
+        return self.signature is not None
+
+    def changed(self):
+        signature = self._signature()
+        if signature == self.signature:
+            return False
+        self.signature = signature
+        return signature is not None
+
+
+def describe_changes(old, new):
+    """Короткий отчет для /reload и лога"""
+    added = sorted(set(new.times) - set(old.times))
+    removed = sorted(set(old.times) - set(new.times))
+    parts = []
+    if added:
+        parts.append(f"добавлено {', '.join(added)}")
+    if removed:
+        parts.append(f"убрано {', '.join(removed)}")
+    if new.message != old.message:
+        parts.append("изменен текст")
+    return "; ".join(parts) or "без изменений"
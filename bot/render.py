@@ -0,0 +1,77 @@
+import threading
+import time
+
+
+class RenderCache:
+    """Готовые тексты ответов. Значение хранится вместе с ключом, из которого
+    построено (расписание, число подписчиков), и строится заново, только
+    когда ключ изменился."""
+
+    def __init__(self):
+        self.entries = {}
+
+    def get(self, name, key, build):
+        entry = self.entries.get(name)
+        if entry is None or entry[0] != key:
+            entry = self.entries[name] = (key, build())
+        return entry[1]
+
+
+class ApproximateCount:
+    """len(source), пересчитываемый не чаще раза в ttl секунд. Число
+    подписчиков в тексте /schedule справочное, а от него зависит ключ кэша:
+    точное значение сбрасывало бы кэш на каждой подписке."""
+
+    def __init__(self, source, ttl=60.0):
+        self.source = source
+        self.ttl = ttl
+        self.value = None
+        self.expires = 0.0
+        self.lock = threading.Lock()
+
+    def get(self):
+        now = time.monotonic()
+        if now >= self.expires:
+            with self.lock:
+                if now >= self.expires:
+                    self.value = len(self.source)
+                    self.expires = now + self.ttl
+        return self.value
+
+
+def render_schedule(times, subscriber_count, regular_hours=None, title="Расписание напоминаний:"):
+    """Текст /schedule; при заданных regular_hours остальные слоты помечаются тестовыми"""
+    lines = [title + "\n"]
+    for time_str in times:
+        if regular_hours is None or time_str[:3] in regular_hours:
+            lines.append(f"• {time_str}")
+        else:
+            lines.append(f"• {time_str} (тестовое)")
+    lines.append(f"\nВсего подписанных пользователей: {subscriber_count}")
+    return "\n".join(lines)
+
+
+def render_time_list(times):
+    """«09:00, 13:00 и 17:00»"""
+    times = list(times)
+    if len(times) < 2:
+        return "".join(times)
+    return f"{', '.join(times[:-1])} и {times[-1]}"
+
+
+def part_of_day(time_str):
+    hour = int(time_str[:2])
+    if 5 <= hour < 12:
+        return "Утро"
+    if 12 <= hour < 14:
+        return "Обед"
+    if 14 <= hour < 17:
+        return "День"
+    if 17 <= hour < 22:
+        return "Вечер"
+    return "Ночь"
+
+
+def render_day_parts(times):
+    """Строки «• 09:00 - Утро» для приветствия"""
+    return "\n".join(f"• {t} - {part_of_day(t)}" for t in times)
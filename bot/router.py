@@ -0,0 +1,73 @@
+import functools
+import time
+
+from telebot import util
+
+from utils.metrics import metrics
+
+# Время разбора команды и поиска обработчика - микросекунды
+DISPATCH_BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.005)
+
+
+class CommandRouter:
+    """Таблица команд вместо цепочки фильтров TeleBot.
+
+    Обработчики, зарегистрированные только с commands=[...], попадают в словарь
+    команда -> обработчик. В TeleBot регистрируется один обработчик-маршрутизатор
+    раньше всех остальных: он один раз разбирает команду и находит обработчик
+    поиском в словаре. Сообщения без команды и неизвестные команды идут дальше
+    по обычной цепочке фильтров (echo_all, документы и т.п.)."""
+
+    def __init__(self):
+        self.handlers = {}
+
+    def add(self, commands, handler):
+        for command in commands:
+            # Как и в TeleBot, срабатывает обработчик, зарегистрированный первым
+            self.handlers.setdefault(command, handler)
+
+    def resolve(self, message):
+        """Фильтр маршрутизатора: находит обработчик и запоминает его в сообщении"""
+        start = time.perf_counter()
+        handler = None
+        command = None
+        if message.content_type == "text":
+            command = util.extract_command(message.text)
+            if command:
+                handler = self.handlers.get(command)
+        if handler is None:
+            return False
+        message.routed_handler = handler
+        metrics.observe(
+            "bot_dispatch_seconds", time.perf_counter() - start, buckets=DISPATCH_BUCKETS, command=command
+        )
+        return True
+
+    @staticmethod
+    def dispatch(message):
+        return message.routed_handler(message)
+
+
+def route_commands(bot):
+    """Подменяет декоратор message_handler бота: обработчики только с commands
+    уходят в CommandRouter, остальные регистрируются в TeleBot как обычно.
+    Вызывать до регистрации обработчиков и до instrument_bot."""
+    if getattr(bot, "command_router", None) is not None:
+        return bot
+
+    router = CommandRouter()
+    register = bot.message_handler
+    register(func=router.resolve)(router.dispatch)
+
+    @functools.wraps(register)
+    def message_handler(commands=None, **kwargs):
+        if commands and not kwargs:
+            def decorator(handler):
+                router.add(commands, handler)
+                return handler
+            return decorator
+        return register(commands=commands, **kwargs)
+
+    bot.message_handler = message_handler
+    bot.command_router = router
+    return bot
@@ -1,67 +1,273 @@
-import time
-import schedule
 import threading
-from datetime import datetime
+from datetime import datetime, timedelta
 
-from config import WATER_REMINDER_TIMES, WATER_REMINDER_MESSAGE, subscribed_users
+from config import (
+    WATER_REMINDER_TIMES, WATER_REMINDER_MESSAGE,
+    BROADCAST_WORKERS, BROADCAST_RATE, BROADCAST_RESUME_GRACE, DEFAULT_TIMEZONE,
+    OUTBOX_WORKERS, OUTBOX_RATE,
+    SUBSCRIBERS_DB, SHARD_WORKERS, SHARD_COUNT, SHARD_DB, SHARD_LEASE_SECONDS,
+    INTAKE_GLASS_ML, SNOOZE_MINUTES, SNOOZE_TTL, SNOOZE_MAX_PENDING, SNOOZE_CHECK_INTERVAL,
+    REMINDERS_FILE, RELOAD_CHECK_INTERVAL,
+)
+from bot.broadcast import BroadcastEngine
+from bot.checkpoints import create_journal, reminder_slot_id
+from bot.keyboards import intake_keyboard_json
+from bot.outbox import BULK, queued
+from bot.reminder_config import ConfigFile, ReminderConfig, describe_changes, load_reminder_config
+from bot.sharding import ShardCoordinator, shard_rate
+from bot.snooze import create_snooze_queue
+from bot.timer import ReminderTimer
+from bot.user_schedule import UserReminders, CompiledSchedule, NextReminderReply, get_zone
 from utils.logger import logger
+from utils.metrics import metrics
 
 
 class WaterReminderScheduler:
-    def __init__(self, bot):
-        self.bot = bot
+    """subscribers - хранилище из create_store, intake - журнал воды
+    из create_intake_log или None; их создает вызывающий код.
+    default - настройки, если REMINDERS_FILE нет (по умолчанию из config.py),
+    extra_times - тестовые слоты: не из файла настроек и при перезагрузке
+    сохраняются."""
+
+    def __init__(self, bot, subscribers, intake=None, default=None, extra_times=()):
+        self.bot = queued(bot, OUTBOX_WORKERS, OUTBOX_RATE, BROADCAST_RATE)
+        self.subscribers = subscribers
+        self.intake = intake
+        self.default = default or default_config()
+        self.extra_times = tuple(extra_times)
+        self.config_file = ConfigFile(REMINDERS_FILE) if REMINDERS_FILE else None
+        self.config = initial_config(self.config_file, self.default)
+        self.daily_jobs = {}
+        self.reload_lock = threading.Lock()
+        # Лимит движка равен лимиту полосы рассылки: min(BROADCAST_RATE, доля OUTBOX_RATE);
+        # при шардах процессу бота достается та же доля, что и каждому воркеру
+        rate = self.bot.outbox.bulk_rate
+        if SHARD_WORKERS:
+            rate = min(rate, shard_rate(BROADCAST_RATE, SHARD_WORKERS))
+        self.engine = BroadcastEngine(self.bot.lane(BULK), workers=BROADCAST_WORKERS, rate=rate)
+        self.timer = ReminderTimer()
+        self.journal = create_journal(SUBSCRIBERS_DB)
+        self.snoozes = create_snooze_queue(SUBSCRIBERS_DB, SNOOZE_TTL, SNOOZE_MAX_PENDING)
+        self.active = set()
+        self.active_lock = threading.Lock()
+        self.coordinator = None
+        if SHARD_WORKERS:
+            # Рассылают воркеры python -m bot.sharding, бот только планирует шарды
+            self.coordinator = ShardCoordinator(SHARD_DB, SHARD_COUNT, SHARD_LEASE_SECONDS)
+        self.next_reply = NextReminderReply(CompiledSchedule(self.reminder_times(self.config)))
+        # Под напоминанием кнопки «Выпил» / «Пропустил», если журнал воды включен
+        self.send_kwargs = {"reply_markup": intake_keyboard_json(INTAKE_GLASS_ML, SNOOZE_MINUTES)} if intake else {}
         self.setup_schedule()
 
+    def reminder_times(self, config):
+        return config.times + tuple(t for t in self.extra_times if t not in config.times)
+
     def setup_schedule(self):
-        for reminder_time in WATER_REMINDER_TIMES:
-            schedule.every().day.at(reminder_time).do(self.send_water_reminder)
-            logger.info(f"Напоминание настроено на {reminder_time}")
+        times = self.reminder_times(self.config)
+        self.sync_daily_jobs(times)
+
+        self.user_reminders = UserReminders(
+            self.subscribers, self.timer, self.send_user_reminders,
+            times, DEFAULT_TIMEZONE,
+        )
+        self.timer.add_job(
+            self.send_snoozed_reminders, datetime.now(), timedelta(seconds=SNOOZE_CHECK_INTERVAL), name="snooze"
+        )
+        if self.config_file and RELOAD_CHECK_INTERVAL:
+            interval = timedelta(seconds=RELOAD_CHECK_INTERVAL)
+            self.timer.add_job(self.check_config_file, datetime.now() + interval, interval, name="reload")
+
+    def sync_daily_jobs(self, times):
+        """Приводит задания таймера к times: убранные слоты отменяются,
+        новые добавляются, остальные задания не трогаются"""
+        for reminder_time in self.daily_jobs.keys() - set(times):
+            self.timer.cancel(self.daily_jobs.pop(reminder_time))
+            logger.info("Напоминание в %s убрано", reminder_time)
+        for reminder_time in times:
+            if reminder_time not in self.daily_jobs:
+                self.daily_jobs[reminder_time] = self.timer.add_daily(reminder_time, self.send_water_reminder)
+                logger.info("Напоминание настроено на %s", reminder_time)
+
+    def apply_config(self, config):
+        """Подменяет время и текст напоминаний без перезапуска. Идущие рассылки
+        досылают текст, с которым начались; стоимость не зависит от числа
+        подписчиков. Возвращает описание изменений."""
+        with self.reload_lock:
+            old = self.config
+            times = self.reminder_times(config)
+            if times != self.reminder_times(old):
+                self.sync_daily_jobs(times)
+                self.next_reply = NextReminderReply(CompiledSchedule(times))
+                self.user_reminders.set_default_times(times)
+            self.config = config
+        changes = describe_changes(old, config)
+        metrics.inc("bot_config_reloads_total")
+        logger.info("Настройки напоминаний перезагружены: %s", changes)
+        return changes
 
-    def send_water_reminder(self):
-        if not subscribed_users:
+    def reload_config(self):
+        """Перечитывает REMINDERS_FILE; ValueError, если файл не прочитать"""
+        if not self.config_file:
+            raise ValueError("REMINDERS_FILE не задан")
+        self.config_file.changed()
+        return self.apply_config(load_reminder_config(self.config_file.path, self.default))
+
+    def check_config_file(self):
+        """Задание таймера: дешевая проверка os.stat, перечитывание при изменении"""
+        if not self.config_file.changed():
+            return
+        try:
+            self.apply_config(load_reminder_config(self.config_file.path, self.default))
+        except ValueError as e:
+            metrics.inc("bot_config_reload_errors_total")
+            logger.error("Настройки напоминаний не применены: %s", e)
+
+    def send_water_reminder(self, test=False):
+        """test - ручная рассылка /test: у нее свой id в журнале и шардах,
+        чтобы она не занимала id слота расписания той же минуты"""
+        if not self.subscribers:
             logger.info("Нет подписанных пользователей для отправки напоминания")
             return
 
         current_time = datetime.now().strftime("%H:%M")
-        user_count = len(subscribed_users)
-        logger.info(f"Отправка напоминаний в {current_time} для {user_count} пользователей")
+        user_count = len(self.subscribers)
+        logger.info("Отправка напоминаний в %s для %s пользователей", current_time, user_count)
 
-        for chat_id in subscribed_users.copy():
-            try:
-                self.bot.send_message(chat_id, WATER_REMINDER_MESSAGE)
-                logger.info(f"Напоминание отправлено пользователю {chat_id}")
-            except Exception as e:
-                logger.error(f"Ошибка отправки пользователю {chat_id}: {e}")
-                subscribed_users.discard(chat_id)
+        slot = reminder_slot_id(test)
+        if self.coordinator:
+            return self.plan_shards(slot)
+        if self.journal is None:
+            return self.engine.start_broadcast(
+                self.default_recipients(), self.config.message, on_dead=self.prune_dead_chats,
+                **self.send_kwargs,
+            )
+        record = self.journal.begin(slot, self.config.message)
+        if record is None:
+            logger.info("Рассылка %s уже завершена, повтор пропущен", slot)
+            return None
+        return self.start_journaled(record)
 
-    def get_next_reminder_time(self):
-        current_time = datetime.now()
+    def start_journaled(self, record):
+        """Рассылка с сохранением курсора в журнал; одна запись - один поток"""
+        with self.active_lock:
+            if record.broadcast_id in self.active:
+                logger.info("Рассылка %s уже идет", record.broadcast_id)
+                return None
+            self.active.add(record.broadcast_id)
+        thread = threading.Thread(
+            target=self.run_journaled, args=(record,), name=f"broadcast-{record.broadcast_id}", daemon=True
+        )
+        thread.start()
+        return thread
+
+    def run_journaled(self, record):
+        try:
+            stats = self.engine.broadcast(
+                self.default_recipients(after=record.cursor),
+                record.text,
+                on_dead=self.prune_dead_chats,
+                on_progress=lambda cursor, stats: self.journal.checkpoint(
+                    record, cursor, stats.sent, stats.failed
+                ),
+                **self.send_kwargs,
+            )
+            self.journal.finish(record, stats.sent, stats.failed)
+        finally:
+            with self.active_lock:
+                self.active.discard(record.broadcast_id)
 
-        for time_str in WATER_REMINDER_TIMES:
-            reminder_time = datetime.strptime(time_str, "%H:%M").replace(
-                year=current_time.year,
-                month=current_time.month,
-                day=current_time.day
+    def resume_broadcasts(self):
+        """Продолжает рассылки, прерванные падением процесса"""
+        if self.journal is None:
+            return
+        for record in self.journal.resumable(BROADCAST_RESUME_GRACE):
+            logger.warning(
+                "Продолжение рассылки %s после chat_id %s (уже отправлено %s)",
+                record.broadcast_id, record.cursor, record.sent,
             )
+            self.start_journaled(record)
+
+    def plan_shards(self, slot):
+        """Отдает рассылку воркерам python -m bot.sharding"""
+        bounds = self.subscribers.shard_bounds(SHARD_COUNT)
+        if not self.coordinator.plan(slot, self.config.message, bounds):
+            logger.info("Рассылка %s уже запланирована, повтор пропущен", slot)
+            return None
+        logger.info("Рассылка %s разбита на %s шардов", slot, SHARD_COUNT)
+        # Воркеры отписывают недоступные чаты в своих процессах
+        return self.coordinator.watch(slot, on_done=lambda progress: self.subscribers.refresh_count())
+
+    def prune_dead_chats(self, chat_ids):
+        """Отписывает чаты, которые заблокировали бота или удалены"""
+        removed = self.subscribers.discard_many(chat_ids)
+        logger.info("Отписано недоступных чатов: %s", removed)
 
-            if reminder_time > current_time:
-                return reminder_time
+    def default_recipients(self, after=None):
+        """Подписчики без персонального расписания по возрастанию chat_id;
+        after - продолжить после указанного chat_id"""
+        for chunk in self.subscribers.iter_chunks(after=after):
+            for chat_id in chunk:
+                if chat_id not in self.user_reminders:
+                    yield chat_id
 
-        return datetime.strptime(WATER_REMINDER_TIMES[0], "%H:%M").replace(
-            year=current_time.year,
-            month=current_time.month,
-            day=current_time.day + 1
+    def send_user_reminders(self, chat_ids):
+        return self.engine.start_broadcast(
+            chat_ids, self.config.message, on_dead=self.prune_dead_chats, **self.send_kwargs
         )
 
+    def send_snoozed_reminders(self):
+        """Наступившие «Позже» уходят одной пачкой тем же путем, что и напоминания"""
+        # Отписавшиеся после «Позже» напоминание уже не получают
+        chat_ids = [chat_id for chat_id in self.snoozes.pop_due() if chat_id in self.subscribers]
+        if not chat_ids:
+            return None
+        logger.info("Отложенные напоминания: %s чатов", len(chat_ids))
+        return self.send_user_reminders(chat_ids)
+
+    def snooze(self, chat_id, minutes):
+        """Откладывает напоминание чата, возвращает текст ответа"""
+        due = self.snoozes.snooze(chat_id, minutes * 60)
+        if due is None:
+            return "Сейчас не получается отложить напоминание, попробуйте позже."
+        user_schedule = self.user_reminders.get(chat_id)
+        zone = get_zone(user_schedule[0]) if user_schedule else None
+        return f"Хорошо, напомню в {datetime.fromtimestamp(due, zone):%H:%M}."
+
+    def get_next_reminder_time(self):
+        """Возвращает время следующего напоминания"""
+        return self.next_reply.get()[0]
+
+    def get_next_reminder_reply(self):
+        return self.next_reply.get()[1]
+
     def run(self):
         logger.info("Планировщик напоминаний запущен")
-        while True:
-            schedule.run_pending()
-            time.sleep(60)
+        self.timer.run()
+
+    def start(self):
+        """Продолжает прерванные рассылки и запускает таймер в отдельном потоке"""
+        self.resume_broadcasts()
+        thread = threading.Thread(target=self.run, name="reminder-timer", daemon=True)
+        thread.start()
+        return thread
+
+
+def default_config():
+    return ReminderConfig(WATER_REMINDER_TIMES, WATER_REMINDER_MESSAGE)
+
+
+def initial_config(config_file, default):
+    """Настройки из REMINDERS_FILE, если он есть, иначе default"""
+    if config_file is None or not config_file.exists:
+        return default
+    try:
+        return load_reminder_config(config_file.path, default)
+    except ValueError as e:
+        logger.error("Настройки напоминаний не загружены, используются стандартные: %s", e)
+        return default
 
 
-def start_scheduler(bot):
-    scheduler = WaterReminderScheduler(bot)
-    scheduler_thread = threading.Thread(target=scheduler.run, daemon=True)
-    scheduler_thread.start()
+def start_scheduler(bot, subscribers, intake=None):
+    scheduler = WaterReminderScheduler(bot, subscribers, intake)
+    scheduler.start()
     return scheduler
@@ -0,0 +1,335 @@
+"""Рассылка напоминаний несколькими процессами.
+
+Процесс бота в каждый слот расписания только создает шарды рассылки в
+SQLite (ShardCoordinator.plan). Шард - диапазон chat_id примерно с равным
+числом подписчиков (границы из SubscriberStore.shard_bounds), поэтому
+воркер читает свой диапазон по первичному ключу, а не всю таблицу.
+Воркеры забирают шарды в аренду, рассылают их со своей долей лимита
+скорости и по ходу рассылки сохраняют прогресс. Если воркер упал,
+аренда истекает, и шард дорассылает другой воркер начиная с сохраненного
+chat_id. Повторный plan того же слота ничего не создает, поэтому слот
+рассылается один раз даже после перезапуска бота.
+
+Запуск воркеров: python -m bot.sharding --workers 4
+"""
+import argparse
+import contextlib
+import multiprocessing
+import os
+import socket
+import threading
+import time
+
+from bot.broadcast import BroadcastEngine
+from bot.db import ThreadLocalConnection
+from utils.logger import logger, setup_logger
+from utils.metrics import metrics
+
+PENDING = "pending"
+DONE = "done"
+
+# Шарды старше этого срока воркеры уже не берут: напоминание опоздало бы
+SHARD_MAX_AGE = 3600
+# Завершенные слоты хранятся неделю, потом удаляются при планировании
+SHARD_RETENTION = 7 * 24 * 3600
+
+
+class Shard:
+    """Диапазон chat_id (cursor, high]; cursor сдвигается по ходу рассылки,
+    high=None - до конца таблицы"""
+
+    def __init__(self, slot, index, shards, text, cursor=None, sent=0, failed=0, high=None):
+        self.slot = slot
+        self.index = index
+        self.shards = shards
+        self.text = text
+        self.cursor = cursor
+        self.high = high
+        self.sent = sent
+        self.failed = failed
+
+    def __repr__(self):
+        return f"Shard({self.slot}, {self.index}/{self.shards})"
+
+
+class ShardCoordinator:
+    """Таблица шардов с арендой. Захват шарда идет в транзакции
+    BEGIN IMMEDIATE, поэтому два процесса не получат один шард."""
+
+    def __init__(self, path, shards=16, lease_seconds=60.0, max_age=SHARD_MAX_AGE):
+        self.path = path
+        self.shards = shards
+        self.lease_seconds = lease_seconds
+        self.max_age = max_age
+        self._connection = ThreadLocalConnection(path, timeout=30, isolation_level=None)
+
+        with self._transaction() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS broadcast_shards ("
+                "slot TEXT NOT NULL, shard INTEGER NOT NULL, shards INTEGER NOT NULL, "
+                "text TEXT NOT NULL, state TEXT NOT NULL, owner TEXT, "
+                "lease_until REAL NOT NULL DEFAULT 0, cursor INTEGER, "
+                "sent INTEGER NOT NULL DEFAULT 0, failed INTEGER NOT NULL DEFAULT 0, "
+                "attempts INTEGER NOT NULL DEFAULT 0, created_at REAL NOT NULL, finished_at REAL, "
+                "high INTEGER, PRIMARY KEY (slot, shard))"
+            )
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(broadcast_shards)")}
+            if "high" not in columns:
+                conn.execute("ALTER TABLE broadcast_shards ADD COLUMN high INTEGER")
+
+    @contextlib.contextmanager
+    def _transaction(self):
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def plan(self, slot, text, bounds=()):
+        """Создает шарды слота по границам bounds (см. SubscriberStore.shard_bounds):
+        шард i - chat_id в (bounds[i-1], bounds[i]]. False если слот уже был запланирован"""
+        now = time.time()
+        lows = [None, *bounds]
+        highs = [*bounds, None]
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM broadcast_shards WHERE created_at < ?", (now - SHARD_RETENTION,))
+            cursor = conn.executemany(
+                "INSERT OR IGNORE INTO broadcast_shards (slot, shard, shards, text, state, created_at, cursor, high) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [(slot, i, len(lows), text, PENDING, now, lows[i], highs[i]) for i in range(len(lows))],
+            )
+        return cursor.rowcount > 0
+
+    def claim(self, owner):
+        """Берет в аренду свободный шард или шард с истекшей арендой"""
+        now = time.time()
+        with self._transaction() as conn:
+            row = conn.execute(
+                "SELECT slot, shard, shards, text, cursor, sent, failed, attempts, high FROM broadcast_shards "
+                "WHERE state = ? AND lease_until < ? AND created_at > ? "
+                "ORDER BY created_at, shard LIMIT 1",
+                (PENDING, now, now - self.max_age),
+            ).fetchone()
+            if row is None:
+                return None
+            slot, index, shards, text, cursor, sent, failed, attempts, high = row
+            conn.execute(
+                "UPDATE broadcast_shards SET owner = ?, lease_until = ?, attempts = attempts + 1 "
+                "WHERE slot = ? AND shard = ?",
+                (owner, now + self.lease_seconds, slot, index),
+            )
+        if attempts:
+            logger.warning("Шард %s/%s слота %s перехвачен после истекшей аренды", index, shards, slot)
+        return Shard(slot, index, shards, text, cursor, sent, failed, high)
+
+    def _update_owned(self, shard, owner, sql, params):
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                f"UPDATE broadcast_shards SET {sql} "
+                "WHERE slot = ? AND shard = ? AND owner = ? AND state = ?",
+                (*params, shard.slot, shard.index, owner, PENDING),
+            )
+        return cursor.rowcount == 1
+
+    def renew(self, shard, owner):
+        """Продлевает аренду; False если шард уже забрал другой воркер"""
+        return self._update_owned(shard, owner, "lease_until = ?", (time.time() + self.lease_seconds,))
+
+    def checkpoint(self, shard, owner):
+        """Сохраняет прогресс шарда и заодно продлевает аренду"""
+        return self._update_owned(
+            shard, owner, "cursor = ?, sent = ?, failed = ?, lease_until = ?",
+            (shard.cursor, shard.sent, shard.failed, time.time() + self.lease_seconds),
+        )
+
+    def complete(self, shard, owner):
+        return self._update_owned(
+            shard, owner, "state = ?, cursor = ?, sent = ?, failed = ?, finished_at = ?",
+            (DONE, shard.cursor, shard.sent, shard.failed, time.time()),
+        )
+
+    def progress(self, slot):
+        row = self._connection().execute(
+            "SELECT COUNT(*), COALESCE(SUM(state = ?), 0), COALESCE(SUM(sent), 0), "
+            "COALESCE(SUM(failed), 0) FROM broadcast_shards WHERE slot = ?",
+            (DONE, slot),
+        ).fetchone()
+        shards, done, sent, failed = row
+        return {"shards": shards, "done": done, "sent": sent, "failed": failed}
+
+    def wait(self, slot, poll_interval=5.0, timeout=None):
+        """Ждет завершения всех шардов слота и пишет итог в лог"""
+        deadline = time.monotonic() + (timeout if timeout is not None else self.max_age)
+        while True:
+            progress = self.progress(slot)
+            metrics.set("bot_shards_pending", progress["shards"] - progress["done"])
+            if progress["done"] == progress["shards"] or time.monotonic() > deadline:
+                break
+            time.sleep(poll_interval)
+        if progress["done"] == progress["shards"]:
+            logger.info(
+                "Шардированная рассылка %s завершена: %s успешно, %s с ошибками, шардов %s",
+                slot, progress["sent"], progress["failed"], progress["shards"],
+            )
+        else:
+            logger.error("Шардированная рассылка %s не завершена: %s", slot, progress)
+        return progress
+
+    def watch(self, slot, on_done=None):
+        """Запускает wait в отдельном потоке, не блокируя планировщик;
+        on_done(progress) вызывается после ожидания"""
+        def run():
+            progress = self.wait(slot)
+            if on_done is not None:
+                on_done(progress)
+
+        thread = threading.Thread(target=run, name=f"shards-{slot}", daemon=True)
+        thread.start()
+        return thread
+
+
+def shard_rate(rate, workers):
+    """Доля лимита рассылки на процесс. Лимит Telegram общий на токен, а
+    кроме воркеров рассылает и процесс бота (персональные и отложенные
+    напоминания), поэтому лимит делится на workers + 1 долю."""
+    return rate / (workers + 1)
+
+
+class ShardWorker:
+    """Забирает шарды у координатора и рассылает их через BroadcastEngine"""
+
+    def __init__(self, coordinator, store, engine, owner=None, chunk_size=1000, poll_interval=1.0,
+                 reply_markup=None, checkpoint_interval=1.0):
+        self.coordinator = coordinator
+        self.store = store
+        self.engine = engine
+        self.owner = owner or f"{socket.gethostname()}:{os.getpid()}"
+        self.chunk_size = chunk_size
+        self.poll_interval = poll_interval
+        self.checkpoint_interval = checkpoint_interval
+        self.reply_markup = reply_markup
+        self.stopped = threading.Event()
+
+    def run(self):
+        logger.info("Воркер рассылки %s запущен", self.owner)
+        while not self.stopped.is_set():
+            shard = self.coordinator.claim(self.owner)
+            if shard is None:
+                self.stopped.wait(self.poll_interval)
+                continue
+            try:
+                self.deliver(shard)
+            except Exception as e:
+                # Шард останется в аренде и после ее истечения уйдет другому воркеру
+                logger.error("Ошибка рассылки шарда %s: %s", shard, e)
+
+    def stop(self):
+        self.stopped.set()
+
+    def recipients(self, shard, lost):
+        """Чаты диапазона шарда без персонального расписания (они получают
+        напоминания отдельно); останавливается при потере аренды"""
+        chunks = self.store.iter_chunks(self.chunk_size, shard.cursor, shard.high, skip_personal=True)
+        for chunk in chunks:
+            if lost.is_set():
+                return
+            yield from chunk
+
+    def deliver(self, shard):
+        """Одна рассылка движка на шард; прогресс сохраняется из on_progress
+        не чаще раза в checkpoint_interval секунд"""
+        lost = threading.Event()
+        heartbeat = threading.Thread(target=self._heartbeat, args=(shard, lost), daemon=True)
+        heartbeat.start()
+        base_sent, base_failed = shard.sent, shard.failed
+        next_checkpoint = time.monotonic() + self.checkpoint_interval
+
+        def on_progress(cursor, stats):
+            nonlocal next_checkpoint
+            shard.cursor = cursor
+            shard.sent = base_sent + stats.sent
+            shard.failed = base_failed + stats.failed
+            if time.monotonic() < next_checkpoint or lost.is_set():
+                return
+            next_checkpoint = time.monotonic() + self.checkpoint_interval
+            if not self.coordinator.checkpoint(shard, self.owner):
+                lost.set()
+
+        try:
+            self.engine.broadcast(
+                self.recipients(shard, lost), shard.text, on_dead=self.prune_dead_chats,
+                on_progress=on_progress, reply_markup=self.reply_markup,
+            )
+            if not lost.is_set() and self.coordinator.complete(shard, self.owner):
+                logger.info("Шард %s разослан: %s успешно, %s с ошибками", shard, shard.sent, shard.failed)
+                metrics.inc("bot_shards_completed_total")
+                return
+            logger.warning("Аренда шарда %s потеряна, рассылку продолжит другой воркер", shard)
+        finally:
+            lost.set()
+            heartbeat.join()
+
+    def _heartbeat(self, shard, lost):
+        while not lost.wait(self.coordinator.lease_seconds / 3):
+            if not self.coordinator.renew(shard, self.owner):
+                lost.set()
+
+    def prune_dead_chats(self, chat_ids):
+        removed = self.store.discard_many(chat_ids)
+        logger.info("Отписано недоступных чатов: %s", removed)
+
+
+def run_worker(workers):
+    # Настройки и лог настраиваются уже в дочернем процессе
+    setup_logger()
+    import telebot
+    from bot.keyboards import intake_keyboard_json
+    from bot.storage import create_store
+    from bot.transport import Transport
+    from config import (
+        BOT_TOKEN, BROADCAST_WORKERS, BROADCAST_RATE, SHARD_COUNT, SHARD_DB, SHARD_LEASE_SECONDS,
+        HTTP_POOL_SIZE, HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT, HTTP2,
+        SUBSCRIBERS_DB, INTAKE_DIR, INTAKE_GLASS_ML, SNOOZE_MINUTES,
+    )
+
+    if not BOT_TOKEN:
+        raise RuntimeError("BOT_TOKEN не найден в .env файле")
+    Transport(HTTP_POOL_SIZE, HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT, http2=HTTP2).install()
+    subscribers = create_store(SUBSCRIBERS_DB)
+    bot = telebot.TeleBot(BOT_TOKEN, threaded=False)
+    engine = BroadcastEngine(bot, workers=BROADCAST_WORKERS, rate=shard_rate(BROADCAST_RATE, workers))
+    coordinator = ShardCoordinator(SHARD_DB, SHARD_COUNT, SHARD_LEASE_SECONDS)
+    reply_markup = intake_keyboard_json(INTAKE_GLASS_ML, SNOOZE_MINUTES) if INTAKE_DIR else None
+    ShardWorker(coordinator, subscribers, engine, reply_markup=reply_markup).run()
+
+
+def main():
+    from config import SHARD_WORKERS, SUBSCRIBERS_DB
+
+    setup_logger()
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, default=SHARD_WORKERS or 1)
+    args = parser.parse_args()
+    if not SUBSCRIBERS_DB or SUBSCRIBERS_DB == ":memory:":
+        raise RuntimeError("Для шардированной рассылки нужна база подписчиков на диске (SUBSCRIBERS_DB)")
+
+    context = multiprocessing.get_context("spawn")
+    processes = [
+        context.Process(target=run_worker, args=(args.workers,), name=f"shard-worker-{i}")
+        for i in range(args.workers)
+    ]
+    for process in processes:
+        process.start()
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        for process in processes:
+            process.terminate()
+
+
+if __name__ == "__main__":
+    main()
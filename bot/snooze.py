@@ -0,0 +1,170 @@
+import atexit
+import heapq
+import sqlite3
+import threading
+import time
+
+from bot.db import ThreadLocalConnection
+from utils.logger import logger
+from utils.metrics import metrics
+
+# Ключ кучи - одно целое: время срабатывания в старших битах, chat_id
+# (со сдвигом, чтобы отрицательные id групп стали неотрицательными) в младших.
+# Так запись кучи занимает одно число вместо кортежа из трех объектов.
+CHAT_BITS = 64
+CHAT_OFFSET = 1 << 63
+CHAT_MASK = (1 << CHAT_BITS) - 1
+
+
+def _key(due, chat_id):
+    return (due << CHAT_BITS) | (chat_id + CHAT_OFFSET)
+
+
+def _unpack(key):
+    return key >> CHAT_BITS, (key & CHAT_MASK) - CHAT_OFFSET
+
+
+class SnoozeQueue:
+    """Отложенные напоминания «Позже»: куча по времени срабатывания.
+
+    У чата не больше одного отложенного напоминания: повторное нажатие
+    переносит его, а старый ключ остается в куче и пропускается при снятии
+    (ленивое удаление), куча перестраивается, когда таких ключей становится
+    больше живых. Вставка и снятие - O(log n). Напоминания, опоздавшие
+    больше чем на ttl секунд (бот был выключен), выбрасываются. При path
+    очередь хранится в SQLite: изменения копятся в памяти и пишутся фоновым
+    потоком раз в flush_interval, при запуске очередь читается из базы."""
+
+    def __init__(self, path=None, ttl=6 * 3600, max_pending=500_000, flush_interval=1.0):
+        self.path = path
+        self.ttl = ttl
+        self.max_pending = max_pending
+        self.flush_interval = flush_interval
+        self.lock = threading.Lock()
+        self.due = {}
+        self.heap = []
+        self.changes = {}
+        metrics.gauge("bot_snooze_pending", lambda: len(self.due))
+
+        if path:
+            self._connection = ThreadLocalConnection(path)
+            self.stopped = threading.Event()
+            self._load()
+            self.writer = threading.Thread(target=self._write_loop, name="snooze-writer", daemon=True)
+            self.writer.start()
+            atexit.register(self.close)
+
+    def _load(self):
+        stale_before = int(time.time() - self.ttl)
+        with self._connection() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS snoozes (chat_id INTEGER PRIMARY KEY, due INTEGER NOT NULL)"
+            )
+            expired = conn.execute("DELETE FROM snoozes WHERE due < ?", (stale_before,)).rowcount
+            rows = conn.execute("SELECT chat_id, due FROM snoozes").fetchall()
+        self.due = dict(rows)
+        self.heap = [_key(due, chat_id) for chat_id, due in rows]
+        heapq.heapify(self.heap)
+        logger.info("Отложенных напоминаний: %s, просрочено и удалено: %s", len(self.due), expired)
+
+    def __len__(self):
+        return len(self.due)
+
+    def __contains__(self, chat_id):
+        return chat_id in self.due
+
+    def due_at(self, chat_id):
+        """Время срабатывания (unix, секунды) или None"""
+        return self.due.get(chat_id)
+
+    def snooze(self, chat_id, delay, now=None):
+        """Откладывает напоминание чата на delay секунд, возвращает время
+        срабатывания или None, если очередь заполнена"""
+        due = int((time.time() if now is None else now) + delay)
+        with self.lock:
+            if chat_id not in self.due and len(self.due) >= self.max_pending:
+                metrics.inc("bot_snooze_rejected_total")
+                return None
+            self.due[chat_id] = due
+            self._changed(chat_id, due)
+            heapq.heappush(self.heap, _key(due, chat_id))
+            self._compact()
+        return due
+
+    def cancel(self, chat_id):
+        with self.lock:
+            if self.due.pop(chat_id, None) is None:
+                return False
+            self._changed(chat_id, None)
+            self._compact()
+            return True
+
+    def _changed(self, chat_id, due):
+        # Без базы изменения копить незачем
+        if self.path:
+            self.changes[chat_id] = due
+
+    def _compact(self):
+        if len(self.heap) > 2 * len(self.due) + 1024:
+            self.heap = [_key(due, chat_id) for chat_id, due in self.due.items()]
+            heapq.heapify(self.heap)
+
+    def pop_due(self, now=None, limit=None):
+        """Снимает наступившие напоминания; возвращает chat_id, просроченные
+        больше чем на ttl отбрасываются"""
+        now = int(time.time() if now is None else now)
+        ready = []
+        expired = 0
+        with self.lock:
+            while self.heap and self.heap[0] >> CHAT_BITS <= now:
+                if limit is not None and len(ready) >= limit:
+                    break
+                due, chat_id = _unpack(heapq.heappop(self.heap))
+                if self.due.get(chat_id) != due:
+                    continue
+                del self.due[chat_id]
+                self._changed(chat_id, None)
+                if now - due > self.ttl:
+                    expired += 1
+                else:
+                    ready.append(chat_id)
+        if expired:
+            metrics.inc("bot_snooze_expired_total", expired)
+            logger.warning("Отложенных напоминаний просрочено: %s", expired)
+        return ready
+
+    def _write_loop(self):
+        while not self.stopped.wait(self.flush_interval):
+            self.flush()
+
+    def flush(self):
+        if not self.path:
+            return
+        with self.lock:
+            changes, self.changes = self.changes, {}
+        if not changes:
+            return
+        try:
+            with self._connection() as conn:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO snoozes (chat_id, due) VALUES (?, ?)",
+                    [(chat_id, due) for chat_id, due in changes.items() if due is not None],
+                )
+                conn.executemany(
+                    "DELETE FROM snoozes WHERE chat_id = ?",
+                    [(chat_id,) for chat_id, due in changes.items() if due is None],
+                )
+        except sqlite3.Error as e:
+            logger.error("Ошибка записи отложенных напоминаний в %s: %s", self.path, e)
+
+    def close(self):
+        if self.path:
+            self.stopped.set()
+            self.flush()
+
+
+def create_snooze_queue(path, ttl, max_pending):
+    """В памяти, если подписчики не хранятся на диске"""
+    if not path or path == ":memory:":
+        path = None
+    return SnoozeQueue(path, ttl, max_pending)
@@ -0,0 +1,360 @@
+import abc
+import atexit
+import bisect
+import sqlite3
+import threading
+import time
+
+from bot.batching import BatchWriter
+from bot.db import ThreadLocalConnection
+from utils.logger import logger
+
+# Пачка записей повторяется с паузой 0.1, 0.2 с; после последней неудачи
+# ее изменения откатываются в памяти
+WRITE_ATTEMPTS = 3
+WRITE_RETRY_DELAY = 0.1
+
+
+class SubscriberStore(abc.ABC):
+    """Хранилище подписчиков: add/discard, проверка `in`, len и потоковый обход"""
+
+    @abc.abstractmethod
+    def add(self, chat_id):
+        """Подписывает чат, возвращает False если он уже был подписан"""
+
+    @abc.abstractmethod
+    def discard(self, chat_id):
+        """Отписывает чат, возвращает False если он не был подписан"""
+
+    def discard_many(self, chat_ids):
+        """Отписывает пачку чатов, возвращает число действительно отписанных"""
+        return sum(1 for chat_id in chat_ids if self.discard(chat_id))
+
+    @abc.abstractmethod
+    def __contains__(self, chat_id):
+        """Подписан ли чат"""
+
+    @abc.abstractmethod
+    def __len__(self):
+        """Число подписчиков"""
+
+    @abc.abstractmethod
+    def iter_chunks(self, size=1000, after=None, until=None, skip_personal=False):
+        """Возвращает подписчиков порциями по size, отсортированными по chat_id;
+        after - продолжить с первого chat_id больше указанного, until - не
+        дальше этого chat_id включительно, skip_personal - без чатов
+        с персональным расписанием"""
+
+    def shard_bounds(self, shards):
+        """Границы диапазонов chat_id для shards примерно равных шардов:
+        шард i - chat_id в (bounds[i-1], bounds[i]]. Границ меньше
+        shards - 1, если подписчиков меньше, чем шардов."""
+        step = -(-len(self) // shards) if len(self) else 0
+        bounds = []
+        for n, chat_id in enumerate(self, 1):
+            if step and n % step == 0:
+                bounds.append(chat_id)
+        return bounds[:shards - 1]
+
+    def __iter__(self):
+        for chunk in self.iter_chunks():
+            yield from chunk
+
+    @abc.abstractmethod
+    def get_schedule(self, chat_id):
+        """Персональное расписание: (часовой пояс, "HH:MM,HH:MM" или None) либо None"""
+
+    @abc.abstractmethod
+    def set_schedule(self, chat_id, tz_name, times):
+        """Сохраняет персональное расписание чата"""
+
+    @abc.abstractmethod
+    def delete_schedule(self, chat_id):
+        """Удаляет персональное расписание чата"""
+
+    @abc.abstractmethod
+    def iter_schedules(self):
+        """Все персональные расписания в виде (chat_id, часовой пояс, times)"""
+
+    def flush(self):
+        pass
+
+    def refresh_count(self):
+        """Перечитывает число подписчиков, если базу меняли другие процессы"""
+
+    def close(self):
+        pass
+
+
+class MemorySubscriberStore(SubscriberStore):
+    def __init__(self):
+        self.chat_ids = set()
+        self.schedules = {}
+        self.lock = threading.Lock()
+
+    def add(self, chat_id):
+        with self.lock:
+            if chat_id in self.chat_ids:
+                return False
+            self.chat_ids.add(chat_id)
+            return True
+
+    def discard(self, chat_id):
+        with self.lock:
+            if chat_id not in self.chat_ids:
+                return False
+            self.chat_ids.discard(chat_id)
+            return True
+
+    def __contains__(self, chat_id):
+        return chat_id in self.chat_ids
+
+    def __len__(self):
+        return len(self.chat_ids)
+
+    def iter_chunks(self, size=1000, after=None, until=None, skip_personal=False):
+        with self.lock:
+            chat_ids = sorted(self.chat_ids)
+        start = bisect.bisect_right(chat_ids, after) if after is not None else 0
+        end = bisect.bisect_right(chat_ids, until) if until is not None else len(chat_ids)
+        for i in range(start, end, size):
+            chunk = chat_ids[i:min(i + size, end)]
+            if skip_personal:
+                chunk = [chat_id for chat_id in chunk if chat_id not in self.schedules]
+            if chunk:
+                yield chunk
+
+    def get_schedule(self, chat_id):
+        return self.schedules.get(chat_id)
+
+    def set_schedule(self, chat_id, tz_name, times):
+        self.schedules[chat_id] = (tz_name, times)
+
+    def delete_schedule(self, chat_id):
+        self.schedules.pop(chat_id, None)
+
+    def iter_schedules(self):
+        for chat_id, (tz_name, times) in list(self.schedules.items()):
+            yield chat_id, tz_name, times
+
+
+class SQLiteSubscriberStore(SubscriberStore):
+    """SQLite в режиме WAL; записи копятся в очереди и коммитятся пачками
+    в отдельном потоке, поэтому /subscribe и /unsubscribe не ждут диска.
+    Пока пачка не записана, её состояние видно через self.pending."""
+
+    def __init__(self, path, batch_size=500, flush_interval=0.2):
+        self.path = path
+        self._connection = ThreadLocalConnection(path)
+        self.lock = threading.Lock()
+        self.pending = {}
+
+        conn = self._connection()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS subscribers ("
+            "chat_id INTEGER PRIMARY KEY, subscribed_at REAL NOT NULL)"
+        )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS user_schedules ("
+            "chat_id INTEGER PRIMARY KEY, timezone TEXT NOT NULL, times TEXT)"
+        )
+        conn.commit()
+        self.count = conn.execute("SELECT COUNT(*) FROM subscribers").fetchone()[0]
+        logger.info("Хранилище подписчиков %s: %s подписчиков", path, self.count)
+
+        self.writer = BatchWriter(self._write_batch, "subscriber-writer", batch_size, flush_interval)
+        atexit.register(self.close)
+
+    def _stored(self, chat_id):
+        row = self._connection().execute(
+            "SELECT 1 FROM subscribers WHERE chat_id = ?", (chat_id,)
+        ).fetchone()
+        return row is not None
+
+    def _is_subscribed(self, chat_id):
+        entry = self.pending.get(chat_id)
+        if entry is not None:
+            return entry[0]
+        return self._stored(chat_id)
+
+    def _set(self, chat_id, value):
+        with self.lock:
+            if self._is_subscribed(chat_id) == value:
+                return False
+            entry = self.pending.get(chat_id)
+            self.pending[chat_id] = [value, (entry[1] if entry else 0) + 1]
+            self.count += 1 if value else -1
+        self.writer.put((chat_id, value))
+        return True
+
+    def add(self, chat_id):
+        return self._set(chat_id, True)
+
+    def discard(self, chat_id):
+        return self._set(chat_id, False)
+
+    def discard_many(self, chat_ids):
+        """Чаты без незаписанных изменений удаляются одним executemany под
+        self.lock, остальные - через очередь, чтобы не обогнать их запись"""
+        chat_ids = set(chat_ids)
+        with self.lock:
+            queued = [chat_id for chat_id in chat_ids if chat_id in self.pending]
+            direct = [(chat_id,) for chat_id in chat_ids if chat_id not in self.pending]
+            removed = 0
+            if direct:
+                try:
+                    with self._connection() as conn:
+                        removed = conn.executemany("DELETE FROM subscribers WHERE chat_id = ?", direct).rowcount
+                except sqlite3.Error as e:
+                    logger.error("Ошибка отписки пачки в %s: %s", self.path, e)
+                    queued.extend(chat_id for chat_id, in direct)
+                self.count -= removed
+        return removed + sum(1 for chat_id in queued if self.discard(chat_id))
+
+    def __contains__(self, chat_id):
+        with self.lock:
+            return self._is_subscribed(chat_id)
+
+    def __len__(self):
+        return self.count
+
+    def iter_chunks(self, size=1000, after=None, until=None, skip_personal=False):
+        """Keyset-обход по первичному ключу: каждая порция - поиск по индексу,
+        а не сканирование таблицы"""
+        self.flush()
+        conn = self._connection()
+        conditions = []
+        params = []
+        if until is not None:
+            conditions.append("chat_id <= ?")
+            params.append(until)
+        if skip_personal:
+            conditions.append(
+                "NOT EXISTS (SELECT 1 FROM user_schedules WHERE user_schedules.chat_id = subscribers.chat_id)"
+            )
+        last = after
+        while True:
+            where = list(conditions)
+            args = list(params)
+            if last is not None:
+                where.append("chat_id > ?")
+                args.append(last)
+            where = f"WHERE {' AND '.join(where)} " if where else ""
+            rows = conn.execute(
+                f"SELECT chat_id FROM subscribers {where}ORDER BY chat_id LIMIT ?", (*args, size)
+            ).fetchall()
+            if not rows:
+                return
+            chunk = [row[0] for row in rows]
+            last = chunk[-1]
+            yield chunk
+
+    def shard_bounds(self, shards):
+        """Один проход по индексу: каждый step-й chat_id по возрастанию"""
+        self.flush()
+        count = self._connection().execute("SELECT COUNT(*) FROM subscribers").fetchone()[0]
+        if not count:
+            return []
+        step = -(-count // shards)
+        rows = self._connection().execute(
+            "SELECT chat_id FROM (SELECT chat_id, ROW_NUMBER() OVER (ORDER BY chat_id) AS n FROM subscribers) "
+            "WHERE n % ? = 0 ORDER BY chat_id LIMIT ?",
+            (step, shards - 1),
+        ).fetchall()
+        return [row[0] for row in rows]
+
+    def get_schedule(self, chat_id):
+        row = self._connection().execute(
+            "SELECT timezone, times FROM user_schedules WHERE chat_id = ?", (chat_id,)
+        ).fetchone()
+        return tuple(row) if row else None
+
+    def set_schedule(self, chat_id, tz_name, times):
+        with self._connection() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO user_schedules (chat_id, timezone, times) VALUES (?, ?, ?)",
+                (chat_id, tz_name, times),
+            )
+
+    def delete_schedule(self, chat_id):
+        with self._connection() as conn:
+            conn.execute("DELETE FROM user_schedules WHERE chat_id = ?", (chat_id,))
+
+    def iter_schedules(self):
+        cursor = self._connection().execute("SELECT chat_id, timezone, times FROM user_schedules")
+        for chat_id, tz_name, times in cursor:
+            yield chat_id, tz_name, times
+
+    def _write_batch(self, batch):
+        for attempt in range(WRITE_ATTEMPTS):
+            try:
+                self._insert_batch(batch)
+                break
+            except sqlite3.Error as e:
+                logger.error("Ошибка записи подписчиков в %s (попытка %s): %s", self.path, attempt + 1, e)
+                if attempt + 1 < WRITE_ATTEMPTS:
+                    time.sleep(WRITE_RETRY_DELAY * 2 ** attempt)
+        else:
+            self._rollback(batch)
+            return
+        self._release(batch)
+
+    def _insert_batch(self, batch):
+        conn = self._connection()
+        now = time.time()
+        with conn:
+            for chat_id, value in batch:
+                if value:
+                    conn.execute(
+                        "INSERT OR IGNORE INTO subscribers (chat_id, subscribed_at) VALUES (?, ?)",
+                        (chat_id, now),
+                    )
+                else:
+                    conn.execute("DELETE FROM subscribers WHERE chat_id = ?", (chat_id,))
+
+    def _release(self, batch):
+        """Записанные изменения больше не нужно держать в pending"""
+        with self.lock:
+            for chat_id, _ in batch:
+                entry = self.pending.get(chat_id)
+                if entry is not None:
+                    entry[1] -= 1
+                    if entry[1] <= 0:
+                        del self.pending[chat_id]
+
+    def _rollback(self, batch):
+        """Пачка не записалась: ее изменения убираются из pending, а count
+        пересчитывается по базе и оставшимся pending, чтобы память не
+        расходилась с тем, что видят рассылки и шарды"""
+        logger.error("Изменения подписок потеряны: %s", len(batch))
+        self._release(batch)
+        self.refresh_count()
+
+    def refresh_count(self):
+        """count по базе и еще не записанным изменениям: после отката пачки
+        и после рассылки воркерами bot.sharding, которые отписывают
+        недоступные чаты в своих процессах"""
+        with self.lock:
+            try:
+                conn = self._connection()
+                count = conn.execute("SELECT COUNT(*) FROM subscribers").fetchone()[0]
+                for chat_id, (value, _) in self.pending.items():
+                    if value != self._stored(chat_id):
+                        count += 1 if value else -1
+            except sqlite3.Error as e:
+                logger.error("Не удалось пересчитать подписчиков в %s: %s", self.path, e)
+                return
+            self.count = count
+
+    def flush(self):
+        """Ждет записи изменений, сделанных до вызова; новые не ждет"""
+        self.writer.flush()
+
+    def close(self):
+        self.flush()
+
+
+def create_store(path):
+    if not path or path == ":memory:":
+        return MemorySubscriberStore()
+    return SQLiteSubscriberStore(path)
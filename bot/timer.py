@@ -0,0 +1,119 @@
+import heapq
+import itertools
+import threading
+from datetime import datetime, timedelta
+
+from utils.logger import logger
+
+# Верхняя граница сна: после перевода системных часов таймер
+# пересчитает задержку не позже чем через это время.
+MAX_SLEEP = 3600
+
+
+class TimerJob:
+    def __init__(self, callback, fire_at, interval=None, name=None):
+        self.callback = callback
+        self.fire_at = fire_at
+        self.interval = interval
+        self.name = name or getattr(callback, "__name__", "job")
+        self.cancelled = False
+
+    def __repr__(self):
+        return f"TimerJob({self.name}, {self.fire_at:%Y-%m-%d %H:%M:%S})"
+
+
+def next_daily_run(time_str, now=None):
+    """Ближайший момент времени HH:MM строго после now"""
+    now = now or datetime.now()
+    at = datetime.strptime(time_str, "%H:%M").time()
+    candidate = datetime.combine(now.date(), at)
+    if candidate <= now:
+        candidate += timedelta(days=1)
+    return candidate
+
+
+class ReminderTimer:
+    """Планировщик на куче: поток спит ровно до ближайшего задания
+    и просыпается раньше, если расписание изменилось."""
+
+    def __init__(self):
+        self.heap = []
+        self.counter = itertools.count()
+        self.condition = threading.Condition()
+        self.running = False
+
+    def add_job(self, callback, fire_at, interval=None, name=None):
+        job = TimerJob(callback, fire_at, interval, name)
+        with self.condition:
+            heapq.heappush(self.heap, (job.fire_at, next(self.counter), job))
+            self._notify()
+        return job
+
+    def add_daily(self, time_str, callback):
+        return self.add_job(callback, next_daily_run(time_str), timedelta(days=1), name=time_str)
+
+    def cancel(self, job):
+        with self.condition:
+            job.cancelled = True
+            self._notify()
+
+    def clear(self):
+        with self.condition:
+            for _, _, job in self.heap:
+                job.cancelled = True
+            self.heap.clear()
+            self._notify()
+
+    def _peek(self):
+        while self.heap and self.heap[0][2].cancelled:
+            heapq.heappop(self.heap)
+        return self.heap[0][2] if self.heap else None
+
+    def next_fire_time(self):
+        with self.condition:
+            job = self._peek()
+            return job.fire_at if job else None
+
+    def _notify(self):
+        self.condition.notify()
+
+    def wake(self):
+        with self.condition:
+            self._notify()
+
+    def _run_job(self, job):
+        try:
+            job.callback()
+        except Exception as e:
+            logger.error("Ошибка задания %s: %s", job.name, e)
+
+    def _pop_due(self):
+        """Снимает наступившее задание; иначе возвращает (None, сколько спать)"""
+        job = self._peek()
+        if job is None:
+            return None, MAX_SLEEP
+        delay = (job.fire_at - datetime.now()).total_seconds()
+        if delay > 0:
+            return None, min(delay, MAX_SLEEP)
+        heapq.heappop(self.heap)
+        if job.interval:
+            now = datetime.now()
+            while job.fire_at <= now:
+                job.fire_at += job.interval
+            heapq.heappush(self.heap, (job.fire_at, next(self.counter), job))
+        return job, 0
+
+    def run(self):
+        self.running = True
+        while self.running:
+            with self.condition:
+                job, delay = self._pop_due()
+                if job is None:
+                    self.condition.wait(delay)
+                    continue
+            self._run_job(job)
+
+    def stop(self):
+        with self.condition:
+            self.running = False
+            self._notify()
@@ -0,0 +1,99 @@
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from telebot import apihelper
+
+from utils.logger import logger
+from utils.metrics import metrics
+
+
+class Transport:
+    """Один пул keep-alive соединений к Bot API на весь процесс.
+
+    По умолчанию pyTelegramBotAPI заводит по сессии requests на каждый поток,
+    поэтому поллер, обработчики и потоки рассылки держат каждый свое
+    TLS-соединение и заново устанавливают его после простоя. Transport
+    подключается через apihelper.CUSTOM_REQUEST_SENDER, и все вызовы идут
+    через общий пул из pool_size соединений. Если все соединения заняты,
+    запрос ждет свободное, это время попадает в метрики.
+    http2=True использует httpx (pip install httpx[http2])."""
+
+    def __init__(self, pool_size=16, connect_timeout=5.0, read_timeout=30.0, http2=False):
+        self.pool_size = pool_size
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.http2 = http2
+        self.slots = threading.BoundedSemaphore(pool_size)
+        self.in_use = 0
+        self.lock = threading.Lock()
+        self.client = self._make_httpx_client() if http2 else self._make_session()
+        metrics.gauge("bot_http_connections_in_use", lambda: self.in_use)
+
+    def _make_session(self):
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size, pool_block=True)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+
+    def _make_httpx_client(self):
+        try:
+            import httpx
+        except ImportError:
+            raise RuntimeError("Для HTTP/2 нужен httpx: pip install httpx[http2]")
+        limits = httpx.Limits(max_connections=self.pool_size, max_keepalive_connections=self.pool_size)
+        return httpx.Client(http2=True, limits=limits)
+
+    def request(self, method, url, params=None, files=None, timeout=None, proxies=None):
+        if not self.slots.acquire(blocking=False):
+            metrics.inc("bot_http_pool_exhausted_total")
+            start = time.perf_counter()
+            self.slots.acquire()
+            metrics.observe("bot_http_pool_wait_seconds", time.perf_counter() - start)
+        with self.lock:
+            self.in_use += 1
+        api_method = url.rsplit("/", 1)[-1]
+        start = time.perf_counter()
+        try:
+            # apihelper передает (connect, read), для long polling read уже увеличен
+            connect, read = timeout or (self.connect_timeout, self.read_timeout)
+            if self.http2:
+                return self._httpx_request(method, url, params, files, connect, read)
+            return self.client.request(
+                method, url, params=params, files=files, timeout=(connect, read), proxies=proxies
+            )
+        except Exception as e:
+            metrics.inc("bot_http_errors_total", method=api_method, error=type(e).__name__)
+            raise
+        finally:
+            metrics.observe("bot_http_request_seconds", time.perf_counter() - start, method=api_method)
+            with self.lock:
+                self.in_use -= 1
+            self.slots.release()
+
+    def _httpx_request(self, method, url, params, files, connect, read):
+        import httpx
+
+        timeout = httpx.Timeout(read, connect=connect)
+        response = self.client.request(method, url, params=params, files=files, timeout=timeout)
+        # telebot читает reason при ошибках HTTP, у httpx это reason_phrase
+        response.reason = response.reason_phrase
+        return response
+
+    def install(self):
+        """Делает пул транспортом всех вызовов apihelper"""
+        apihelper.CUSTOM_REQUEST_SENDER = self.request
+        apihelper.CONNECT_TIMEOUT = self.connect_timeout
+        apihelper.READ_TIMEOUT = self.read_timeout
+        logger.info(
+            "HTTP-пул Bot API: %s соединений, таймауты %s/%s с%s",
+            self.pool_size, self.connect_timeout, self.read_timeout, ", HTTP/2" if self.http2 else "",
+        )
+        return self
+
+    def close(self):
+        if apihelper.CUSTOM_REQUEST_SENDER == self.request:
+            apihelper.CUSTOM_REQUEST_SENDER = None
+        self.client.close()
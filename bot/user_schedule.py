@@ -0,0 +1,291 @@
+import bisect
+import threading
+from datetime import datetime, time as dtime, timedelta, timezone
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from utils.logger import logger
+
+
+def parse_times(tokens):
+    """Разбирает ["08:00", "12:30"] в отсортированный список минут от начала суток"""
+    minutes = set()
+    for token in tokens:
+        parsed = datetime.strptime(token.strip(), "%H:%M")
+        minutes.add(parsed.hour * 60 + parsed.minute)
+    if not minutes:
+        raise ValueError("не указано ни одного времени")
+    return sorted(minutes)
+
+
+def format_minute(minute):
+    return f"{minute // 60:02d}:{minute % 60:02d}"
+
+
+def get_zone(name):
+    try:
+        return ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        raise ValueError(f"неизвестный часовой пояс: {name}")
+
+
+class ReminderIndex:
+    """Индекс персональных напоминаний: часовой пояс -> минута суток -> чаты.
+
+    Для минуты UTC каждый используемый пояс переводится в локальное
+    время и берется одна корзина, поэтому тик стоит O(поясов + due),
+    а не O(подписчиков), и корректно переживает переход на летнее время.
+    Чаты без своего времени (minutes=None) хранятся отдельно по поясам и
+    используют общие default_minutes, поэтому смена расписания по
+    умолчанию не трогает записи чатов."""
+
+    def __init__(self, default_minutes=()):
+        self.buckets = {}
+        self.defaults = {}
+        self.default_minutes = tuple(default_minutes)
+        self.default_set = frozenset(self.default_minutes)
+        self.sorted_minutes = {}
+        self.slots = {}
+
+    def __contains__(self, chat_id):
+        return chat_id in self.slots
+
+    def __len__(self):
+        return len(self.slots)
+
+    def get(self, chat_id):
+        slot = self.slots.get(chat_id)
+        if slot is None or slot[1] is not None:
+            return slot
+        return slot[0], self.default_minutes
+
+    def set(self, chat_id, tz_name, minutes=None):
+        self.remove(chat_id)
+        self.sorted_minutes.pop(tz_name, None)
+        if minutes is None:
+            self.defaults.setdefault(tz_name, set()).add(chat_id)
+            self.slots[chat_id] = (tz_name, None)
+            return
+        zone_buckets = self.buckets.setdefault(tz_name, {})
+        for minute in minutes:
+            zone_buckets.setdefault(minute, set()).add(chat_id)
+        self.slots[chat_id] = (tz_name, tuple(minutes))
+
+    def set_default_minutes(self, minutes):
+        """O(поясов): записи чатов не меняются"""
+        self.default_minutes = tuple(minutes)
+        self.default_set = frozenset(self.default_minutes)
+        self.sorted_minutes.clear()
+
+    def remove(self, chat_id):
+        slot = self.slots.pop(chat_id, None)
+        if slot is None:
+            return
+        tz_name, minutes = slot
+        self.sorted_minutes.pop(tz_name, None)
+        if minutes is None:
+            chats = self.defaults[tz_name]
+            chats.discard(chat_id)
+            if not chats:
+                del self.defaults[tz_name]
+            return
+        zone_buckets = self.buckets[tz_name]
+        for minute in minutes:
+            bucket = zone_buckets.get(minute)
+            if bucket is not None:
+                bucket.discard(chat_id)
+                if not bucket:
+                    del zone_buckets[minute]
+        if not zone_buckets:
+            del self.buckets[tz_name]
+
+    def _zones(self):
+        return self.buckets.keys() | self.defaults.keys()
+
+    def _minutes(self, tz_name):
+        minutes = self.sorted_minutes.get(tz_name)
+        if minutes is None:
+            minutes = set(self.buckets.get(tz_name, ()))
+            if tz_name in self.defaults:
+                minutes.update(self.default_minutes)
+            minutes = self.sorted_minutes[tz_name] = sorted(minutes)
+        return minutes
+
+    def due(self, utc_minute):
+        """Чаты, у которых на минуту utc_minute (aware datetime) назначено напоминание"""
+        result = []
+        for tz_name in self._zones():
+            local = utc_minute.astimezone(get_zone(tz_name))
+            minute = local.hour * 60 + local.minute
+            bucket = self.buckets.get(tz_name, {}).get(minute)
+            if bucket:
+                result.extend(bucket)
+            if minute in self.default_set:
+                result.extend(self.defaults.get(tz_name, ()))
+        return result
+
+    def next_due(self, now_utc):
+        """Ближайшая минута UTC строго после now_utc, на которую есть напоминания"""
+        best = None
+        for tz_name in self._zones():
+            candidate = next_local_slot(get_zone(tz_name), self._minutes(tz_name), now_utc)
+            if best is None or candidate < best:
+                best = candidate
+        return best
+
+
+def next_slot(minutes, now):
+    """Ближайшее время из minutes (отсортированные минуты суток) строго после now.
+    Переход на следующие сутки через timedelta, поэтому конец месяца и года не ломает расчет."""
+    i = bisect.bisect_right(minutes, now.hour * 60 + now.minute)
+    day = now.date()
+    if i == len(minutes):
+        i = 0
+        day += timedelta(days=1)
+    minute = minutes[i]
+    return datetime.combine(day, dtime(minute // 60, minute % 60), tzinfo=now.tzinfo)
+
+
+def next_local_slot(zone, minutes, now_utc):
+    """Следующее время из minutes (минуты локальных суток в поясе zone) после now_utc"""
+    return next_slot(minutes, now_utc.astimezone(zone)).astimezone(timezone.utc)
+
+
+def format_next_reminder(next_time, seconds_until):
+    hours = int(seconds_until // 3600)
+    minutes = int((seconds_until % 3600) // 60)
+    return (
+        f"Следующее напоминание через {hours}ч {minutes}м "
+        f"в {next_time.strftime('%H:%M')}"
+    )
+
+
+class CompiledSchedule:
+    """Расписание HH:MM, один раз разобранное в отсортированные минуты суток"""
+
+    def __init__(self, times):
+        self.minutes = parse_times(times)
+
+    def next_after(self, now):
+        return next_slot(self.minutes, now)
+
+
+class NextReminderReply:
+    """Готовый ответ на /next. Внутри одной минуты и следующий слот, и текст
+    "через Xч Yм" не меняются, поэтому пересчет нужен не чаще раза в минуту."""
+
+    def __init__(self, schedule):
+        self.schedule = schedule
+        self.cached = None
+
+    def get(self, now=None):
+        """Возвращает (время следующего напоминания, текст ответа)"""
+        now = now or datetime.now()
+        cached = self.cached
+        if cached is not None and cached[0] <= now < cached[1]:
+            return cached[2], cached[3]
+
+        next_time = self.schedule.next_after(now)
+        text = format_next_reminder(next_time, (next_time - now).total_seconds())
+        valid_from = now.replace(second=0, microsecond=0)
+        self.cached = (valid_from, valid_from + timedelta(minutes=1), next_time, text)
+        return next_time, text
+
+
+class UserReminders:
+    """Персональные расписания подписчиков поверх ReminderTimer.
+
+    В таймере всегда стоит одно задание на ближайшую минуту, в которую
+    кому-то пора напомнить; после срабатывания оно переставляется."""
+
+    def __init__(self, store, timer, deliver, default_times, default_timezone):
+        self.store = store
+        self.timer = timer
+        self.deliver = deliver
+        self.default_timezone = default_timezone
+        self.index = ReminderIndex(parse_times(default_times))
+        self.lock = threading.RLock()
+        self.job = None
+
+        for chat_id, tz_name, times in store.iter_schedules():
+            self.index.set(chat_id, tz_name, self._minutes(times))
+        logger.info("Загружено персональных расписаний: %s", len(self.index))
+        self.reschedule()
+
+    def __contains__(self, chat_id):
+        return chat_id in self.index
+
+    def get(self, chat_id):
+        """Возвращает (часовой пояс, минуты) или None для расписания по умолчанию"""
+        with self.lock:
+            return self.index.get(chat_id)
+
+    def _minutes(self, times):
+        """None - расписание по умолчанию, оно подставляется в индексе"""
+        return parse_times(times.split(",")) if times else None
+
+    def set_default_times(self, times):
+        """Новое расписание по умолчанию для чатов без своего времени;
+        стоит O(поясов), а не O(подписчиков)"""
+        minutes = parse_times(times)
+        with self.lock:
+            self.index.set_default_minutes(minutes)
+            self.reschedule()
+
+    def update(self, chat_id, tz_name=None, times=None):
+        """Меняет пояс и/или время пользователя; None оставляет текущее значение"""
+        if tz_name is not None:
+            get_zone(tz_name)
+        if times is not None:
+            times = ",".join(format_minute(m) for m in parse_times(times))
+        with self.lock:
+            saved_tz, saved_times = self.store.get_schedule(chat_id) or (self.default_timezone, None)
+            tz_name = tz_name or saved_tz
+            times = times or saved_times
+            self.store.set_schedule(chat_id, tz_name, times)
+            self.index.set(chat_id, tz_name, self._minutes(times))
+            self.reschedule()
+            return self.index.get(chat_id)
+
+    def reset(self, chat_id):
+        with self.lock:
+            self.store.delete_schedule(chat_id)
+            self.index.remove(chat_id)
+            self.reschedule()
+
+    def next_reminder(self, chat_id, now_utc=None):
+        """Следующее напоминание пользователя во времени его пояса"""
+        with self.lock:
+            slot = self.index.get(chat_id)
+        if slot is None:
+            return None
+        tz_name, minutes = slot
+        zone = get_zone(tz_name)
+        now_utc = now_utc or datetime.now(timezone.utc)
+        return next_local_slot(zone, minutes, now_utc).astimezone(zone)
+
+    def reschedule(self):
+        with self.lock:
+            if self.job is not None:
+                self.timer.cancel(self.job)
+                self.job = None
+            due = self.index.next_due(datetime.now(timezone.utc))
+            if due is None:
+                return
+            fire_at = due.astimezone().replace(tzinfo=None)
+            self.job = self.timer.add_job(lambda: self.fire(due), fire_at, name="user-reminders")
+
+    def due_chats(self, due):
+        """Подписанные чаты слота due; проверка подписки идет в базу,
+        поэтому выполняется вне блокировки индекса"""
+        with self.lock:
+            chat_ids = list(self.index.due(due))
+        return [chat_id for chat_id in chat_ids if chat_id in self.store]
+
+    def fire(self, due):
+        self.deliver_due(due, self.due_chats(due))
+
+    def deliver_due(self, due, chat_ids):
+        if chat_ids:
+            logger.info("Персональные напоминания в %s UTC для %s пользователей", f"{due:%H:%M}", len(chat_ids))
+            self.deliver(chat_ids)
+        self.reschedule()
@@ -0,0 +1,181 @@
+import hmac
+import json
+import queue
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from telebot import types
+
+from utils.logger import logger
+from utils.metrics import metrics
+
+# Обновление Telegram - единицы килобайт; больше не читаем
+MAX_BODY_SIZE = 1024 * 1024
+
+
+def update_chat_id(update):
+    """chat_id, по которому сохраняется порядок обработки обновлений"""
+    for message in (update.message, update.edited_message, update.channel_post):
+        if message is not None:
+            return message.chat.id
+    if update.callback_query is not None:
+        if update.callback_query.message is not None:
+            return update.callback_query.message.chat.id
+        return update.callback_query.from_user.id
+    return update.update_id
+
+
+class UpdateDispatcher:
+    """Пул обработчиков обновлений. Обновления одного чата всегда попадают
+    в одну очередь и обрабатываются по порядку, разные чаты — параллельно."""
+
+    def __init__(self, bot, workers=8, queue_size=10000):
+        self.bot = bot
+        self.queues = [queue.Queue(maxsize=queue_size) for _ in range(workers)]
+        self.submit_lock = threading.Lock()
+        self.threads = []
+        for i, worker_queue in enumerate(self.queues):
+            thread = threading.Thread(
+                target=self._worker, args=(worker_queue,), name=f"updates-{i}", daemon=True
+            )
+            thread.start()
+            self.threads.append(thread)
+        metrics.gauge("bot_update_queue_depth", self.queue_depth)
+
+    def _queue(self, update):
+        return self.queues[hash(update_chat_id(update)) % len(self.queues)]
+
+    def submit(self, update, block=False):
+        """Ставит обновление в очередь; False если очередь его чата переполнена"""
+        try:
+            self._queue(update).put(update, block=block)
+        except queue.Full:
+            return False
+        return True
+
+    def submit_many(self, updates):
+        """Ставит в очереди все обновления или ни одного: False, если
+        хотя бы одной очереди не хватает места. Места в очередях между
+        проверкой и постановкой может только прибавиться - разбирают их
+        воркеры, а ставят только под submit_lock."""
+        targets = [(self._queue(update), update) for update in updates]
+        needed = {}
+        for worker_queue, _ in targets:
+            needed[id(worker_queue)] = needed.get(id(worker_queue), 0) + 1
+        with self.submit_lock:
+            for worker_queue in self.queues:
+                count = needed.get(id(worker_queue), 0)
+                if count and worker_queue.maxsize - worker_queue.qsize() < count:
+                    return False
+            for worker_queue, update in targets:
+                worker_queue.put_nowait(update)
+        return True
+
+    def queue_depth(self):
+        return sum(q.qsize() for q in self.queues)
+
+    def join(self):
+        for worker_queue in self.queues:
+            worker_queue.join()
+
+    def _worker(self, worker_queue):
+        while True:
+            update = worker_queue.get()
+            try:
+                self.bot.process_new_updates([update])
+            except Exception as e:
+                logger.error("Ошибка обработки обновления %s: %s", update.update_id, e)
+            finally:
+                worker_queue.task_done()
+
+
+class WebhookServer:
+    """HTTP-сервер для вебхука: принимает одно обновление или JSON-массив
+    обновлений, кладет их в UpdateDispatcher и сразу отвечает 200.
+    Пачка принимается целиком или не принимается: при нехватке места в
+    очередях ответ 503, и Telegram повторит весь запрос без дублей."""
+
+    def __init__(self, dispatcher, host="0.0.0.0", port=8443, path="/webhook", secret_token=None,
+                 max_body_size=MAX_BODY_SIZE):
+        self.dispatcher = dispatcher
+        self.path = path
+        self.secret_token = secret_token
+        self.max_body_size = max_body_size
+        self.server = ThreadingHTTPServer((host, port), self._make_handler())
+        self.server.daemon_threads = True
+
+    @property
+    def port(self):
+        return self.server.server_address[1]
+
+    def _make_handler(self):
+        webhook = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                if self.path != webhook.path:
+                    self.reply(404)
+                    return
+                if webhook.secret_token and not webhook.check_secret(
+                    self.headers.get("X-Telegram-Bot-Api-Secret-Token")
+                ):
+                    self.reply(403)
+                    return
+                try:
+                    length = int(self.headers.get("Content-Length") or 0)
+                except ValueError:
+                    length = -1
+                if length < 0:
+                    self.reply(400)
+                    return
+                if length > webhook.max_body_size:
+                    # Тело не читаем, соединение после ответа закрывается
+                    self.close_connection = True
+                    self.reply(413)
+                    return
+                try:
+                    payload = json.loads(self.rfile.read(length))
+                except ValueError:
+                    self.reply(400)
+                    return
+                self.reply(webhook.accept(payload))
+
+            def reply(self, status):
+                self.send_response(status)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def check_secret(self, secret):
+        """Сравнение за постоянное время, чтобы токен нельзя было подобрать по задержке ответа"""
+        return hmac.compare_digest((secret or "").encode(), self.secret_token.encode())
+
+    def accept(self, payload):
+        raw_updates = payload if isinstance(payload, list) else [payload]
+        # Пачка принимается целиком: одно неверное обновление - 400 для всей
+        if not all(isinstance(raw, dict) for raw in raw_updates):
+            logger.warning("Вебхук: обновление не объект JSON")
+            return 400
+        try:
+            updates = [types.Update.de_json(raw) for raw in raw_updates]
+        except (KeyError, ValueError, TypeError) as e:
+            logger.warning("Вебхук: неверное обновление: %r", e)
+            return 400
+        if not self.dispatcher.submit_many(updates):
+            logger.warning("Очередь обновлений переполнена, отклонено обновлений: %s", len(updates))
+            return 503
+        return 200
+
+    def serve_forever(self):
+        logger.info("Вебхук слушает порт %s, путь %s", self.port, self.path)
+        self.server.serve_forever()
+
+    def shutdown(self):
+        self.server.shutdown()
+        self.server.server_close()
@@ -1,14 +1,85 @@
+"""Настройки бота из окружения и .env.
+
+Импорт только читает переменные: база, журнал воды и HTTP-пул создаются
+в create_app (main.py), run_worker (bot/sharding.py) и main() bot.async_app.
+Наличие BOT_TOKEN проверяется там же.
+"""
 import os
 from dotenv import load_dotenv
 
 load_dotenv()
 
 BOT_TOKEN = os.getenv("BOT_TOKEN")
-if not BOT_TOKEN:
-    raise RuntimeError("BOT_TOKEN не найден в .env файле")
 
 WATER_REMINDER_TIMES = ["09:00", "13:00", "15:00", "17:00", "23:00"]
 
 WATER_REMINDER_MESSAGE = "Время пить воду! Не забудьте выпить стакан воды для поддержания водного баланса! Иначе будут камни в почках :)"
 
-subscribed_users = set()
\ No newline at end of file
+BROADCAST_WORKERS = int(os.getenv("BROADCAST_WORKERS", "8"))
+BROADCAST_RATE = float(os.getenv("BROADCAST_RATE", "30"))
+
+# Общая очередь исходящих запросов: потоки и общий лимит запросов в секунду.
+# Полоса рассылки получает лимит BROADCAST_RATE, но не больше 0.8 * OUTBOX_RATE
+# (остальное - запас для ответов на команды): рассылка идет не быстрее
+# min(BROADCAST_RATE, 0.8 * OUTBOX_RATE), при превышении пишется предупреждение
+OUTBOX_WORKERS = int(os.getenv("OUTBOX_WORKERS", "10"))
+OUTBOX_RATE = float(os.getenv("OUTBOX_RATE", "30"))
+
+# Общий пул соединений к Bot API для поллера, обработчиков и рассылки
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "16"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "30"))
+HTTP2 = os.getenv("HTTP2", "0") == "1"
+
+DEFAULT_TIMEZONE = os.getenv("DEFAULT_TIMEZONE", "Europe/Moscow")
+# Журнал выпитой воды (кнопки под напоминаниями и /stats); пусто - выключен
+INTAKE_DIR = os.getenv("INTAKE_DIR", "intake")
+INTAKE_GLASS_ML = int(os.getenv("INTAKE_GLASS_ML", "250"))
+# «Напомнить позже»: через сколько минут, сколько ждать опоздавшие
+# после простоя бота (с), предел очереди и период проверки (с)
+SNOOZE_MINUTES = int(os.getenv("SNOOZE_MINUTES", "30"))
+SNOOZE_TTL = float(os.getenv("SNOOZE_TTL", "21600"))
+SNOOZE_MAX_PENDING = int(os.getenv("SNOOZE_MAX_PENDING", "500000"))
+SNOOZE_CHECK_INTERVAL = float(os.getenv("SNOOZE_CHECK_INTERVAL", "15"))
+# Время и текст напоминаний можно поменять без перезапуска: файл
+# {"times": [...], "message": "..."} перечитывается при изменении
+# (проверка раз в RELOAD_CHECK_INTERVAL с, 0 - только /reload)
+REMINDERS_FILE = os.getenv("REMINDERS_FILE", "reminders.json")
+RELOAD_CHECK_INTERVAL = float(os.getenv("RELOAD_CHECK_INTERVAL", "5"))
+
+ADMIN_IDS = {int(x) for x in os.getenv("ADMIN_IDS", "").replace(",", " ").split()}
+# Ограничение входящих обновлений: на чат (в секунду и запас) и общее на бота
+FLOOD_CHAT_RATE = float(os.getenv("FLOOD_CHAT_RATE", "1"))
+FLOOD_CHAT_BURST = int(os.getenv("FLOOD_CHAT_BURST", "5"))
+FLOOD_GLOBAL_RATE = float(os.getenv("FLOOD_GLOBAL_RATE", "200"))
+FLOOD_MAX_CHATS = int(os.getenv("FLOOD_MAX_CHATS", "100000"))
+# Команды только для ADMIN_IDS (проверяет FloodControl до обработчиков):
+# /test рассылает напоминание всем подписчикам, /metrics показывает метрики,
+# /reload перечитывает REMINDERS_FILE
+ADMIN_ONLY_COMMANDS = {"test", "metrics", "reload"}
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9108"))
+
+SUBSCRIBERS_DB = os.getenv("SUBSCRIBERS_DB", "subscribers.db")
+# Как часто обновляется число подписчиков в тексте /schedule
+SUBSCRIBER_COUNT_TTL = float(os.getenv("SUBSCRIBER_COUNT_TTL", "60"))
+
+# Прерванная рассылка продолжается после перезапуска, если с ее начала
+# прошло не больше стольких секунд
+BROADCAST_RESUME_GRACE = float(os.getenv("BROADCAST_RESUME_GRACE", "1800"))
+
+# Шардированная рассылка: 0 - рассылает сам процесс бота,
+# иначе столько процессов python -m bot.sharding делят между собой шарды.
+# BROADCAST_RATE делится на SHARD_WORKERS + 1 долю: воркерам и процессу бота
+SHARD_WORKERS = int(os.getenv("SHARD_WORKERS", "0"))
+SHARD_COUNT = int(os.getenv("SHARD_COUNT", "16"))
+SHARD_DB = os.getenv("SHARD_DB", "shards.db")
+SHARD_LEASE_SECONDS = float(os.getenv("SHARD_LEASE_SECONDS", "60"))
+
+BOT_MODE = os.getenv("BOT_MODE", "polling")
+WEBHOOK_URL = os.getenv("WEBHOOK_URL")
+WEBHOOK_HOST = os.getenv("WEBHOOK_HOST", "0.0.0.0")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8443"))
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/webhook")
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET")
+WEBHOOK_WORKERS = int(os.getenv("WEBHOOK_WORKERS", "8"))
@@ -1,186 +1,113 @@
-import os
 import time
+
+IMPORT_STARTED = time.perf_counter()
+
+import argparse
+import logging
 import threading
-import schedule
 from datetime import datetime, timedelta
-from dotenv import load_dotenv
-import telebot
-from telebot import types
-import logging
 
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler("bot.log", encoding="utf-8"),
-        logging.StreamHandler()
-    ]
+from config import (
+    BOT_TOKEN, WATER_REMINDER_TIMES, SUBSCRIBERS_DB, SUBSCRIBER_COUNT_TTL,
+    OUTBOX_WORKERS, OUTBOX_RATE, BROADCAST_RATE,
+    HTTP_POOL_SIZE, HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT, HTTP2, INTAKE_DIR, SNOOZE_MINUTES,
+    BOT_MODE, WEBHOOK_URL, WEBHOOK_HOST, WEBHOOK_PORT, WEBHOOK_PATH, WEBHOOK_SECRET, WEBHOOK_WORKERS,
+    ADMIN_IDS, FLOOD_CHAT_RATE, FLOOD_CHAT_BURST, FLOOD_GLOBAL_RATE, FLOOD_MAX_CHATS, ADMIN_ONLY_COMMANDS,
+    METRICS_HOST, METRICS_PORT,
 )
+from bot.intake import CALLBACK_PREFIX, create_intake_log, format_intake_stats, utc_offset
+from bot.outbox import Outbox, QueuedBot
+from bot.registry import HandlerRegistry
+from bot.reminder_config import ReminderConfig
+from bot.scheduler import WaterReminderScheduler
+from bot.storage import create_store
+from bot.user_schedule import format_minute, format_next_reminder
+from bot.keyboards import main_keyboard_json, confirm_keyboard_json, remove_keyboard_json
+from bot.render import ApproximateCount, RenderCache, render_day_parts, render_schedule, render_time_list
+from utils.logger import setup_logger
+from utils.metrics import MetricsServer, instrument_bot, metrics
+from utils.parsing import int_stats, numbers_reply
+from utils.startup import StartupProfile
+
+# telebot, requests и вебхук-сервер импортируются в create_app и run_webhook:
+# импорт main ничего не настраивает, не открывает базу и не ходит в сеть
 logger = logging.getLogger(__name__)
 
-load_dotenv()
-
-TOKEN = os.getenv("BOT_TOKEN")
-if not TOKEN:
-    raise RuntimeError("BOT_TOKEN не найден в .env файле")
-
-subscribed_users = set()
-
-test_time = (datetime.now() + timedelta(minutes=2)).strftime("%H:%M")
-WATER_REMINDER_TIMES = ["09:00", "13:00", "15:00", "17:00", "23:00", test_time]
+# Своя формулировка напоминания для main.py; время по умолчанию - из config
 WATER_REMINDER_MESSAGE = "💧 Время пить воду! Не забудьте выпить стакан воды для поддержания водного баланса."
 
+NUMBER_DOCUMENT_TYPES = ("text/plain", "text/csv")
+# Больше 20 МБ бот все равно не может скачать через Bot API
+MAX_NUMBER_DOCUMENT_SIZE = 20 * 1024 * 1024
+
 BOT_VERSION = "1.0.0"
 BOT_AUTHOR = "ALINASUSHCHENKO"
 BOT_PURPOSE = "Напоминать о питье воды в течение дня"
 
-bot = telebot.TeleBot(TOKEN)
-logger.info("Бот инициализирован")
-
-
-class WaterReminderScheduler:
-    def __init__(self, bot_instance):
-        self.bot = bot_instance
-        self.setup_schedule()
-
-    def setup_schedule(self):
-
-        for reminder_time in WATER_REMINDER_TIMES:
-            schedule.every().day.at(reminder_time).do(self.send_water_reminder)
-            logger.info(f"Напоминание настроено на {reminder_time}")
-
-    def send_water_reminder(self):
-        if not subscribed_users:
-            logger.info("Нет подписанных пользователей для отправки напоминания")
-            return
-
-        current_time = datetime.now().strftime("%H:%M")
-        user_count = len(subscribed_users)
-        logger.info(f"Отправка напоминаний в {current_time} для {user_count} пользователей")
-
-        success_count = 0
-        error_count = 0
-
-        for chat_id in subscribed_users.copy():
-            try:
-                self.bot.send_message(chat_id, WATER_REMINDER_MESSAGE)
-                success_count += 1
-                logger.info(f"Напоминание отправлено пользователю {chat_id}")
-            except Exception as e:
-                error_count += 1
-                logger.error(f"Ошибка отправки пользователю {chat_id}: {e}")
-
-        logger.info(f"Напоминания отправлены: {success_count} успешно, {error_count} с ошибками")
-
-    def get_next_reminder_time(self):
-        """Возвращает время следующего напоминания"""
-        current_time = datetime.now()
-
-        for time_str in WATER_REMINDER_TIMES:
-            reminder_time = datetime.strptime(time_str, "%H:%M").replace(
-                year=current_time.year,
-                month=current_time.month,
-                day=current_time.day
-            )
-
-            if reminder_time > current_time:
-                return reminder_time
-
-        return datetime.strptime(WATER_REMINDER_TIMES[0], "%H:%M").replace(
-            year=current_time.year,
-            month=current_time.month,
-            day=current_time.day + 1
-        )
-
-    def run(self):
-        logger.info("Планировщик напоминаний запущен")
-        print("🕐 Планировщик запущен. Ожидайте напоминаний...")
-        while True:
-            schedule.run_pending()
-            time.sleep(30)
-
-
-def parse_ints_from_text(text: str) -> list[int]:
-    text = text.replace(",", " ")
-
-    tokens = [t for t in text.split() if not t.startswith("/")]
-
-    result = []
-    for t in tokens:
-        cleaned_token = t.strip().lstrip("-")
-        if cleaned_token.isdigit():
-            result.append(int(t))
-    return result
-
-
-def make_main_keyboard():
-    keyboard = types.ReplyKeyboardMarkup(resize_keyboard=True)
-    keyboard.row("/about", "/sum")
-    keyboard.row("/hide", "/show")
-    keyboard.row("/help", "/ping")
-    return keyboard
-
+# Постоянные тексты собираются один раз при запуске; часть /help со временем
+# напоминаний собирается render_welcome и меняется вместе с расписанием
+COMMANDS_TEXT = (
+    "📋 Список команд:\n"
+    "/start, /help - начать работу\n"
+    "/about - информация о боте\n"
+    "/ping - проверка работы\n"
+    "/subscribe - подписаться на напоминания\n"
+    "/unsubscribe - отписаться\n"
+    "/status - статус подписки\n"
+    "/next - следующее напоминание\n"
+    "/schedule - расписание\n"
+    "/stats - статистика выпитой воды\n"
+    "/timezone - часовой пояс\n"
+    "/times - свое время напоминаний\n"
+    "/sum - сумма чисел\n"
+    "/max - максимум чисел\n"
+    "/confirm - подтверждение действия\n"
+    "/test - тестовое напоминание\n"
+    "/hide - скрыть клавиатуру\n"
+    "/show - показать клавиатуру"
+)
 
-def make_confirm_keyboard():
-    keyboard = types.InlineKeyboardMarkup()
-    keyboard.add(
-        types.InlineKeyboardButton("Да", callback_data="confirm:yes"),
-        types.InlineKeyboardButton("Нет", callback_data="confirm:no"),
-        types.InlineKeyboardButton("Позже", callback_data="confirm:later"),
-        types.InlineKeyboardButton("Не уверен", callback_data="confirm:unsure")
-    )
-    return keyboard
+ABOUT_TEXT = (
+    "Информация о боте:\n\n"
+    f"Автор: {BOT_AUTHOR}\n"
+    f"Версия: {BOT_VERSION}\n"
+    f"Назначение: {BOT_PURPOSE}\n"
+    f"Репозиторий: github.com/ALINASUSHCHENKO/tbotsimple\n\n"
+    "Этот бот помогает поддерживать водный баланс, "
+    "напоминая пить воду в течение дня."
+)
 
+# Заполняются в create_app
+subscribers = None
+intake = None
+TEST_REMINDER_TIMES = []
+transport = None
+outbox = None
+flood = None
+bot = None
+scheduler = None
+render_cache = RenderCache()
+subscriber_count = None
 
-scheduler = WaterReminderScheduler(bot)
-scheduler_thread = threading.Thread(target=scheduler.run, daemon=True)
-scheduler_thread.start()
+handlers = HandlerRegistry()
 
 
-@bot.message_handler(commands=['start', 'help'])
+@handlers.message_handler(commands=['start', 'help'])
 def send_welcome(message):
-    welcome_text = (
-        "💧 Water Reminder Bot 💧\n\n"
-        "Я буду напоминать вам пить воду в оптимальное время:\n"
-        "• 09:00 - Утро\n• 13:00 - Обед\n• 15:00 - День\n"
-        "• 17:00 - Вечер\n• 23:00 - Ночь\n\n"
-        "📋 Список команд:\n"
-        "/start, /help - начать работу\n"
-        "/about - информация о боте\n"
-        "/ping - проверка работы\n"
-        "/subscribe - подписаться на напоминания\n"
-        "/unsubscribe - отписаться\n"
-        "/status - статус подписки\n"
-        "/next - следующее напоминание\n"
-        "/schedule - расписание\n"
-        "/sum - сумма чисел\n"
-        "/max - максимум чисел\n"
-        "/confirm - подтверждение действия\n"
-        "/test - тестовое напоминание\n"
-        "/hide - скрыть клавиатуру\n"
-        "/show - показать клавиатуру"
-    )
-    bot.reply_to(message, welcome_text, reply_markup=make_main_keyboard())
-    logger.info(f"Пользователь {message.from_user.id} вызвал /start")
+    times = scheduler.config.times
+    welcome_text = render_cache.get("welcome", times, lambda: render_welcome(times))
+    bot.reply_to(message, welcome_text, reply_markup=main_keyboard_json())
+    logger.info("Пользователь %s вызвал /start", message.from_user.id)
 
 
-@bot.message_handler(commands=['about'])
+@handlers.message_handler(commands=['about'])
 def about_bot(message):
     """Информация о боте"""
-    about_text = (
-        "Информация о боте:\n\n"
-        f"Автор: {BOT_AUTHOR}\n"
-        f"Версия: {BOT_VERSION}\n"
-        f"Назначение: {BOT_PURPOSE}\n"
-        f"Репозиторий: github.com/ALINASUSHCHENKO/tbotsimple\n\n"
-        "Этот бот помогает поддерживать водный баланс, "
-        "напоминая пить воду в течение дня."
-    )
-    bot.reply_to(message, about_text)
-    logger.info(f"Пользователь {message.from_user.id} запросил /about")
+    bot.reply_to(message, ABOUT_TEXT)
+    logger.info("Пользователь %s запросил /about", message.from_user.id)
 
 
-@bot.message_handler(commands=['ping'])
+@handlers.message_handler(commands=['ping'])
 def ping_bot(message):
     try:
         start_time = time.time()
@@ -218,7 +145,7 @@ def ping_bot(message):
             sent_msg.message_id
         )
 
-        logger.info(f"Ping от {message.from_user.id}: {round_trip_time} мс (API: {api_ping} мс)")
+        logger.info("Ping от %s: %s мс (API: %s мс)", message.from_user.id, round_trip_time, api_ping)
 
     except Exception as e:
         error_msg = f"Ошибка измерения пинга: {e}"
@@ -226,56 +153,79 @@ def ping_bot(message):
             bot.edit_message_text(error_msg, message.chat.id, sent_msg.message_id)
         else:
             bot.reply_to(message, error_msg)
-        logger.error(f"Ошибка пинга от {message.from_user.id}: {e}")
+        logger.error("Ошибка пинга от %s: %s", message.from_user.id, e)
 
 
-@bot.message_handler(commands=['sum'])
+@handlers.message_handler(commands=['sum'])
 def sum_numbers(message):
-    numbers = parse_ints_from_text(message.text)
+    stats = int_stats(message.text)
 
-    if not numbers:
+    if not stats.count:
         bot.reply_to(message, "Не найдено чисел для сложения.\nПример: /sum 2 3 10 или /sum 2, 3, -5")
         return
 
-    total = sum(numbers)
-    bot.reply_to(message, f"Сумма чисел {numbers} = {total}")
-    logger.info(f"Пользователь {message.from_user.id} вычислил сумму: {numbers} = {total}")
+    bot.reply_to(message, numbers_reply("sum", stats))
+    logger.info("Пользователь %s вычислил сумму %s чисел = %s", message.from_user.id, stats.count, stats.total)
 
 
-@bot.message_handler(commands=['max'])
+@handlers.message_handler(commands=['max'])
 def max_number(message):
-    numbers = parse_ints_from_text(message.text)
+    stats = int_stats(message.text)
 
-    if not numbers:
+    if not stats.count:
         bot.reply_to(message, "Не найдено чисел для поиска максимума.\nПример: /max 2 3 10 или /max 2, 3, -5")
         return
 
-    maximum = max(numbers)
-    bot.reply_to(message, f"Максимум чисел {numbers} = {maximum}")
-    logger.info(f"Пользователь {message.from_user.id} нашел максимум: {numbers} = {maximum}")
+    bot.reply_to(message, numbers_reply("max", stats))
+    logger.info("Пользователь %s нашел максимум %s чисел = %s", message.from_user.id, stats.count, stats.maximum)
 
 
-@bot.message_handler(commands=['confirm'])
+@handlers.message_handler(content_types=['document'])
+def numbers_from_document(message):
+    """Числа из текстового или CSV-файла; подпись /sum или /max выбирает ответ"""
+    document = message.document
+    name = (document.file_name or "").lower()
+    if document.mime_type not in NUMBER_DOCUMENT_TYPES and not name.endswith((".txt", ".csv")):
+        bot.reply_to(message, "Пришлите текстовый или CSV-файл с числами.")
+        return
+    if document.file_size and document.file_size > MAX_NUMBER_DOCUMENT_SIZE:
+        bot.reply_to(message, f"Файл слишком большой, максимум {MAX_NUMBER_DOCUMENT_SIZE // 1024 // 1024} МБ.")
+        return
+
+    data = bot.download_file(bot.get_file(document.file_id).file_path)
+    stats = int_stats(data)
+    if not stats.count:
+        bot.reply_to(message, "В файле не найдено чисел.")
+        return
+
+    caption = (message.caption or "").split()
+    command = caption[0].lstrip("/").split("@")[0] if caption and caption[0].startswith("/") else None
+    bot.reply_to(message, numbers_reply(command, stats))
+    logger.info("Пользователь %s прислал файл с %s числами (%s байт)", message.from_user.id, stats.count, len(data))
+
+
+@handlers.message_handler(commands=['confirm'])
 def confirm_action(message):
     confirm_text = "Подтвердите ваше действие:"
     bot.send_message(
         message.chat.id,
         confirm_text,
-        reply_markup=make_confirm_keyboard()
+        reply_markup=confirm_keyboard_json()
     )
-    logger.info(f"Пользователь {message.from_user.id} запросил подтверждение")
+    logger.info("Пользователь %s запросил подтверждение", message.from_user.id)
 
 
-@bot.callback_query_handler(func=lambda call: call.data.startswith('confirm:'))
+@handlers.callback_query_handler(func=lambda call: call.data.startswith('confirm:'))
 def handle_confirmation(call):
     choice = call.data.split(':', 1)[1]
 
     responses = {
         'yes': 'Действие подтверждено!',
         'no': 'Действие отменено.',
-        'later': 'Хорошо, напомню позже.',
         'unsure': 'Вернемся к этому позже.'
     }
+    if choice == 'later':
+        responses['later'] = scheduler.snooze(call.message.chat.id, SNOOZE_MINUTES)
 
     bot.answer_callback_query(call.id, "Принято!")
 
@@ -284,122 +234,380 @@ def handle_confirmation(call):
         call.message.chat.id,
         call.message.message_id
     )
-    logger.info(f"Пользователь {call.from_user.id} выбрал: {choice}")
+    logger.info("Пользователь %s выбрал: %s", call.from_user.id, choice)
+
+
+@handlers.callback_query_handler(func=lambda call: call.data.startswith(CALLBACK_PREFIX))
+def handle_intake(call):
+    """Ответ на кнопки под напоминанием: water:<мл>, water:0 - пропустил"""
+    if intake is None or call.message is None:
+        bot.answer_callback_query(call.id, "Журнал воды выключен.")
+        return
+    try:
+        ml = int(call.data[len(CALLBACK_PREFIX):])
+    except ValueError:
+        bot.answer_callback_query(call.id)
+        return
+    # callback_data приходит от клиента, объем ограничивается разумным стаканом
+    ml = max(0, min(ml, 2000))
+    chat_id = call.message.chat.id
+    intake.append(chat_id, ml)
+
+    result = f"✅ Выпито {ml} мл" if ml else "Напоминание пропущено"
+    bot.answer_callback_query(call.id, "Записано!")
+    # Старые сообщения Telegram отдает без текста, их кнопки не убрать
+    if call.message.text:
+        bot.edit_message_text(f"{call.message.text}\n\n{result}", chat_id, call.message.message_id)
+    logger.info("Пользователь %s отметил воду: %s мл", chat_id, ml)
+
+
+@handlers.callback_query_handler(func=lambda call: call.data.startswith("snooze:"))
+def handle_snooze(call):
+    """Кнопка «Через N мин» под напоминанием"""
+    if call.message is None:
+        bot.answer_callback_query(call.id)
+        return
+    try:
+        minutes = max(1, min(int(call.data.split(":", 1)[1]), 24 * 60))
+    except ValueError:
+        bot.answer_callback_query(call.id)
+        return
+    chat_id = call.message.chat.id
+    response = scheduler.snooze(chat_id, minutes)
+    bot.answer_callback_query(call.id, response)
+    if call.message.text:
+        bot.edit_message_text(f"{call.message.text}\n\n⏰ {response}", chat_id, call.message.message_id)
+    logger.info("Пользователь %s отложил напоминание на %s мин", chat_id, minutes)
+
+
+@handlers.message_handler(commands=['stats'])
+def show_stats(message):
+    if intake is None:
+        bot.reply_to(message, "Статистика недоступна: журнал воды выключен.")
+        return
+    user_schedule = scheduler.user_reminders.get(message.chat.id)
+    stats = intake.stats(message.chat.id, utc_offset(user_schedule[0] if user_schedule else None))
+    bot.reply_to(message, format_intake_stats(stats))
 
 
-@bot.message_handler(commands=['subscribe'])
+@handlers.message_handler(commands=['subscribe'])
 def subscribe_user(message):
     chat_id = message.chat.id
-    if chat_id in subscribed_users:
+    if not subscribers.add(chat_id):
         bot.reply_to(message, "Вы уже подписаны на напоминания о воде!")
     else:
-        subscribed_users.add(chat_id)
-        bot.reply_to(message, "Вы успешно подписались на напоминания о воде! Я буду напоминать вам в 9, 13, 15, 17 и 23 часа.")
-        logger.info(f"Пользователь {chat_id} подписался на напоминания")
+        times = render_time_list(scheduler.config.times)
+        bot.reply_to(message, f"Вы успешно подписались на напоминания о воде! Я буду напоминать вам в {times}.")
+        logger.info("Пользователь %s подписался на напоминания", chat_id)
 
 
-@bot.message_handler(commands=['unsubscribe'])
+@handlers.message_handler(commands=['unsubscribe'])
 def unsubscribe_user(message):
     chat_id = message.chat.id
-    if chat_id in subscribed_users:
-        subscribed_users.remove(chat_id)
+    if subscribers.discard(chat_id):
         bot.reply_to(message, "Вы отписались от напоминаний..")
-        logger.info(f"Пользователь {chat_id} отписался от напоминаний")
+        logger.info("Пользователь %s отписался от напоминаний", chat_id)
     else:
         bot.reply_to(message, "Вы не были подписаны на напоминания.")
 
 
-@bot.message_handler(commands=['status'])
+@handlers.message_handler(commands=['status'])
 def check_status(message):
     chat_id = message.chat.id
-    if chat_id in subscribed_users:
+    if chat_id in subscribers:
         bot.reply_to(message, "Вы подписаны на напоминания.")
     else:
         bot.reply_to(message, "Вы не подписаны на напоминания. Используйте /subscribe для подписки.")
 
 
-@bot.message_handler(commands=['next'])
+@handlers.message_handler(commands=['next'])
 def next_reminder(message):
-    next_time = scheduler.get_next_reminder_time()
-    current_time = datetime.now()
-    time_until = next_time - current_time
-
-    hours = int(time_until.total_seconds() // 3600)
-    minutes = int((time_until.total_seconds() % 3600) // 60)
-
-    response = f"Следующее напоминание через {hours}ч {minutes}м в {next_time.strftime('%H:%M')}"
+    user_next = scheduler.user_reminders.next_reminder(message.chat.id)
+    if user_next:
+        time_until = user_next - datetime.now(user_next.tzinfo)
+        response = format_next_reminder(user_next, time_until.total_seconds())
+    else:
+        response = scheduler.get_next_reminder_reply()
     bot.reply_to(message, response)
 
 
-@bot.message_handler(commands=['schedule'])
+@handlers.message_handler(commands=['schedule'])
 def show_schedule(message):
-    schedule_text = "Расписание напоминаний:\n\n"
-    for time_str in WATER_REMINDER_TIMES:
-        if any(time_str.startswith(x) for x in ["09:", "13:", "15:", "17:", "23:"]):
-            schedule_text += f"• {time_str}\n"
-        else:
-            schedule_text += f"• {time_str} (тестовое)\n"
+    user_schedule = scheduler.user_reminders.get(message.chat.id)
+    if user_schedule:
+        tz_name, minutes = user_schedule
+        schedule_text = f"Ваше расписание ({tz_name}):\n\n"
+        schedule_text += "".join(f"• {format_minute(m)}\n" for m in minutes)
+        bot.reply_to(message, schedule_text)
+        return
 
-    schedule_text += f"\nВсего подписанных пользователей: {len(subscribed_users)}"
+    config = scheduler.config
+    times = scheduler.reminder_times(config)
+    count = subscriber_count.get()
+    # Слоты из настроек - основные, остальные помечаются тестовыми
+    regular_hours = {t[:3] for t in config.times}
+    schedule_text = render_cache.get(
+        "schedule", (times, count), lambda: render_schedule(times, count, regular_hours)
+    )
     bot.reply_to(message, schedule_text)
 
 
-@bot.message_handler(commands=['test'])
+@handlers.message_handler(commands=['timezone'])
+def set_timezone(message):
+    args = message.text.split()[1:]
+    if not args:
+        user_schedule = scheduler.user_reminders.get(message.chat.id)
+        current = user_schedule[0] if user_schedule else "время сервера"
+        bot.reply_to(message, f"Ваш часовой пояс: {current}\nПример: /timezone Asia/Vladivostok")
+        return
+
+    try:
+        tz_name, minutes = scheduler.user_reminders.update(message.chat.id, tz_name=args[0])
+    except ValueError as e:
+        bot.reply_to(message, f"Не удалось изменить часовой пояс: {e}")
+        return
+    times = ", ".join(format_minute(m) for m in minutes)
+    bot.reply_to(message, f"Часовой пояс {tz_name} сохранен. Напоминания в {times}")
+    logger.info("Пользователь %s выбрал часовой пояс %s", message.chat.id, tz_name)
+
+
+@handlers.message_handler(commands=['times'])
+def set_times(message):
+    args = message.text.replace(",", " ").split()[1:]
+    if not args:
+        bot.reply_to(message, "Укажите время напоминаний.\nПример: /times 08:00 12:30 20:00 или /times default")
+        return
+
+    if args[0] == "default":
+        scheduler.user_reminders.reset(message.chat.id)
+        bot.reply_to(message, "Вернули стандартное расписание напоминаний.")
+        return
+
+    try:
+        tz_name, minutes = scheduler.user_reminders.update(message.chat.id, times=args)
+    except ValueError as e:
+        bot.reply_to(message, f"Не удалось разобрать время: {e}")
+        return
+    times = ", ".join(format_minute(m) for m in minutes)
+    bot.reply_to(message, f"Напоминания будут приходить в {times} ({tz_name})")
+    logger.info("Пользователь %s задал время напоминаний: %s", message.chat.id, times)
+
+
+@handlers.message_handler(commands=['metrics'])
+def show_metrics(message):
+    bot.reply_to(message, metrics.summary()[:4000])
+
+
+@handlers.message_handler(commands=['reload'])
+def reload_reminders(message):
+    try:
+        changes = scheduler.reload_config()
+    except ValueError as e:
+        bot.reply_to(message, f"Настройки не перезагружены: {e}")
+        return
+    bot.reply_to(message, f"Настройки напоминаний перезагружены: {changes}")
+    logger.info("Пользователь %s перезагрузил настройки напоминаний", message.from_user.id)
+
+
+@handlers.message_handler(commands=['test'])
 def test_reminder(message):
-    scheduler.send_water_reminder()
+    scheduler.send_water_reminder(test=True)
     bot.reply_to(message, "Тестовое напоминание отправлено всем подписанным пользователям!")
 
 
-@bot.message_handler(commands=['hide'])
+@handlers.message_handler(commands=['hide'])
 def hide_keyboard(message):
-    remove_keyboard = types.ReplyKeyboardRemove()
     bot.send_message(
         message.chat.id,
         "Клавиатура скрыта. Используйте /show чтобы вернуть.",
-        reply_markup=remove_keyboard
+        reply_markup=remove_keyboard_json()
     )
 
 
-@bot.message_handler(commands=['show'])
+@handlers.message_handler(commands=['show'])
 def show_keyboard(message):
     bot.send_message(
         message.chat.id,
         "Клавиатура активна:",
-        reply_markup=make_main_keyboard()
+        reply_markup=main_keyboard_json()
     )
 
 
-@bot.message_handler(func=lambda message: True)
+@handlers.message_handler(func=lambda message: True)
 def echo_all(message):
     bot.reply_to(message, "Не понимаю ваше сообщение. Используйте /help для просмотра доступных команд.")
 
 
-if __name__ == "__main__":
-    try:
-        logger.info("ЗАПУСК БОТА")
+def render_welcome(times):
+    return (
+        "💧 Water Reminder Bot 💧\n\n"
+        "Я буду напоминать вам пить воду в оптимальное время:\n"
+        f"{render_day_parts(times)}\n\n{COMMANDS_TEXT}"
+    )
+
+
+def default_config():
+    return ReminderConfig(WATER_REMINDER_TIMES, WATER_REMINDER_MESSAGE)
+
+
+def test_reminder_times():
+    """Тестовое напоминание через 2 минуты после запуска"""
+    return [(datetime.now() + timedelta(minutes=2)).strftime("%H:%M")]
+
+
+def create_app(profile=None):
+    """Собирает бота: лог, HTTP-пул, хранилище, обработчики и планировщик.
+    В Telegram ничего не отправляет и таймер не запускает - это делает run()."""
+    global subscribers, intake, TEST_REMINDER_TIMES, transport, outbox, flood, bot, scheduler, subscriber_count
+    profile = profile or StartupProfile()
 
+    with profile.stage("лог и настройки"):
+        setup_logger()
+        if not BOT_TOKEN:
+            raise RuntimeError("BOT_TOKEN не найден в .env файле")
+        TEST_REMINDER_TIMES = test_reminder_times()
+
+    with profile.stage("импорт telebot"):
+        import telebot
+        from bot.flood import FloodControl, limit_flood
+        from bot.router import route_commands
+        from bot.transport import Transport
+
+    with profile.stage("HTTP-пул"):
+        transport = Transport(HTTP_POOL_SIZE, HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT, http2=HTTP2).install()
+
+    with profile.stage("база подписчиков"):
+        subscribers = create_store(SUBSCRIBERS_DB)
+        subscriber_count = ApproximateCount(subscribers, SUBSCRIBER_COUNT_TTL)
+        intake = create_intake_log(INTAKE_DIR)
+
+    with profile.stage("бот и обработчики"):
+        # Все отправки идут через общую очередь с приоритетами: ответы на команды
+        # обгоняют правки и ответы на кнопки, а те - массовую рассылку
+        outbox = Outbox(workers=OUTBOX_WORKERS, rate=OUTBOX_RATE, bulk_rate=BROADCAST_RATE)
+        # Лишние обновления отбрасываются фильтром FloodControl до любого обработчика
+        flood = FloodControl(
+            FLOOD_CHAT_RATE, FLOOD_CHAT_BURST, FLOOD_GLOBAL_RATE,
+            admin_only=ADMIN_ONLY_COMMANDS, admin_ids=ADMIN_IDS, max_entries=FLOOD_MAX_CHATS,
+        )
+        queued_bot = QueuedBot(telebot.TeleBot(BOT_TOKEN), outbox)
+        bot = instrument_bot(route_commands(limit_flood(queued_bot, flood)))
+        handlers.install(bot)
+        metrics.gauge("bot_update_queue_depth", lambda: bot.worker_pool.tasks.qsize() if bot.threaded else 0)
+
+    with profile.stage("планировщик"):
+        # Рассылка идет мимо фильтров входящих обновлений, прямо в очередь отправки
+        scheduler = WaterReminderScheduler(queued_bot, subscribers, intake, default_config(), TEST_REMINDER_TIMES)
+
+    logger.info("Бот инициализирован за %.0f мс", (time.perf_counter() - profile.started) * 1000)
+    return bot
+
+
+def when_polling(callback):
+    """callback выполняется один раз в отдельном потоке после первого
+    успешного getUpdates, то есть когда поллер уже получает обновления"""
+    get_updates = bot.get_updates
+    started = threading.Event()
+
+    def get_updates_once(*args, **kwargs):
+        updates = get_updates(*args, **kwargs)
+        if not started.is_set():
+            started.set()
+            threading.Thread(target=callback, name="on-started", daemon=True).start()
+        return updates
+
+    bot.get_updates = get_updates_once
+
+
+def on_started():
+    """Запуск планировщика и get_me - после того как бот начал принимать
+    обновления, чтобы не задерживать старт"""
+    scheduler.start()
+    try:
         bot_info = bot.get_me()
-        logger.info(f"Бот: {bot_info.first_name} (@{bot_info.username})")
-
-        print("=" * 50)
-        print("БОТ ЗАПУЩЕН!")
-        print("=" * 50)
-        print(f"Бот: {bot_info.first_name} (@{bot_info.username})")
-        print(f"Версия: {BOT_VERSION}")
-        print("Новые команды:")
-        print("  /about - информация о боте")
-        print("  /ping - проверка работы")
-        print("  /max - найти максимум чисел")
-        print("  /confirm - подтверждение с кнопками")
-        print("Тестовое напоминание через 2 минуты")
-        print("Логи сохраняются в bot.log")
-        print("Ctrl+C для остановки")
-        print("=" * 50)
+    except Exception as e:
+        logger.warning("Не удалось получить данные бота: %s", e)
+        return
+    logger.info("Бот: %s (@%s)", bot_info.first_name, bot_info.username)
+    print(f"Бот: {bot_info.first_name} (@{bot_info.username})")
+
 
+def run_webhook():
+    if not WEBHOOK_URL:
+        raise RuntimeError("WEBHOOK_URL не задан для режима webhook")
+    from bot.webhook import UpdateDispatcher, WebhookServer
+
+    # Порядок внутри чата обеспечивает диспетчер, собственный пул TeleBot не нужен
+    bot.threaded = False
+    dispatcher = UpdateDispatcher(bot, workers=WEBHOOK_WORKERS)
+    server = WebhookServer(
+        dispatcher, WEBHOOK_HOST, WEBHOOK_PORT, WEBHOOK_PATH, secret_token=WEBHOOK_SECRET
+    )
+    bot.set_webhook(url=WEBHOOK_URL + WEBHOOK_PATH, secret_token=WEBHOOK_SECRET)
+    logger.info("Вебхук установлен: %s%s", WEBHOOK_URL, WEBHOOK_PATH)
+    threading.Thread(target=on_started, name="on-started", daemon=True).start()
+    try:
+        server.serve_forever()
+    finally:
+        server.shutdown()
+
+
+def run():
+    logger.info("ЗАПУСК БОТА")
+
+    if METRICS_PORT:
+        MetricsServer(metrics, METRICS_HOST, METRICS_PORT).start()
+
+    print("=" * 50)
+    print("БОТ ЗАПУЩЕН!")
+    print("=" * 50)
+    print(f"Версия: {BOT_VERSION}")
+    print("Новые команды:")
+    print("  /about - информация о боте")
+    print("  /ping - проверка работы")
+    print("  /max - найти максимум чисел")
+    print("  /confirm - подтверждение с кнопками")
+    print("Тестовое напоминание через 2 минуты")
+    print("Логи сохраняются в bot.log")
+    print(f"Режим: {BOT_MODE}")
+    print("Ctrl+C для остановки")
+    print("=" * 50)
+
+    if BOT_MODE == "webhook":
+        run_webhook()
+    else:
+        when_polling(on_started)
+        bot.remove_webhook()
         bot.infinity_polling(skip_pending=True, timeout=20)
 
-    except Exception as e:
-        logger.error(f"Ошибка при запуске бота: {e}")
-        print(f"Ошибка: {e}")
-        import traceback
-        traceback.print_exc()
\ No newline at end of file
+
+def profile_startup():
+    """Время импортов и этапов create_app без обращений к Telegram"""
+    profile = StartupProfile(IMPORT_STARTED)
+    profile.stages.append(("импорт main", time.perf_counter() - IMPORT_STARTED))
+    profile.trace_imports()
+    try:
+        create_app(profile)
+    finally:
+        profile.stop_tracing()
+    print(profile.report())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--profile-startup", action="store_true",
+        help="вывести время импортов и инициализации и выйти",
+    )
+    args = parser.parse_args()
+    if args.profile_startup:
+        profile_startup()
+    else:
+        try:
+            create_app()
+            run()
+        except Exception as e:
+            logger.error("Ошибка при запуске бота: %s", e)
+            print(f"Ошибка: {e}")
+            import traceback
+            traceback.print_exc()
@@ -0,0 +1,64 @@
+import threading
+import time
+
+from bot.batching import BatchWriter
+
+
+class GatedWriter:
+    """write_batch, который ждет разрешения на каждую пачку"""
+
+    def __init__(self):
+        self.gate = threading.Semaphore(0)
+        self.batches = []
+
+    def __call__(self, batch):
+        self.gate.acquire()
+        self.batches.append(list(batch))
+
+
+def test_batches_respect_size():
+    written = []
+    writer = BatchWriter(written.append, "test-writer", batch_size=3, flush_interval=0.05)
+    for item in range(7):
+        writer.put(item)
+    assert writer.flush(timeout=5)
+    assert [item for batch in written for item in batch] == list(range(7))
+    assert all(len(batch) <= 3 for batch in written)
+    assert len(writer) == 0
+
+
+def test_flush_waits_only_for_earlier_items():
+    write = GatedWriter()
+    writer = BatchWriter(write, "test-writer", batch_size=1, flush_interval=0)
+    writer.put("a")
+
+    def later():
+        time.sleep(0.1)
+        writer.put("b")
+        time.sleep(0.1)
+        write.gate.release()
+
+    threading.Thread(target=later).start()
+    # Записи "a" достаточно: "b" поставлен уже во время flush()
+    assert writer.flush(timeout=2)
+    assert write.batches == [["a"]]
+    assert len(writer) == 1
+    write.gate.release()
+    assert writer.flush(timeout=5)
+
+
+def test_flush_timeout_and_failed_batch():
+    write = GatedWriter()
+    writer = BatchWriter(write, "test-writer", batch_size=10, flush_interval=0)
+    writer.put(1)
+    assert not writer.flush(timeout=0.05)
+    write.gate.release()
+    assert writer.flush(timeout=5)
+
+    def broken(batch):
+        raise OSError("disk full")
+
+    failing = BatchWriter(broken, "test-writer", batch_size=10, flush_interval=0)
+    failing.put(1)
+    # Ошибка записи не вешает flush()
+    assert failing.flush(timeout=5)
@@ -0,0 +1,58 @@
+import asyncio
+
+import pytest
+import requests
+from telebot.apihelper import ApiHTTPException, ApiTelegramException
+
+from bot.broadcast import (
+    PERMANENT, RATE_LIMITED, REJECTED, TRANSIENT, BroadcastEngine, classify_error,
+)
+
+
+def telegram_error(code, description=""):
+    return ApiTelegramException("sendMessage", None, {"error_code": code, "description": description})
+
+
+def http_error(status):
+    response = requests.Response()
+    response.status_code = status
+    return ApiHTTPException("sendMessage", response)
+
+
+ERRORS = {
+    "429": (telegram_error(429, "Too Many Requests"), RATE_LIMITED),
+    "403": (telegram_error(403, "Forbidden: bot was blocked by the user"), PERMANENT),
+    "chat not found": (telegram_error(400, "Bad Request: chat not found"), PERMANENT),
+    "bad markup": (telegram_error(400, "Bad Request: can't parse entities"), REJECTED),
+    "api 502": (telegram_error(502, "Bad Gateway"), TRANSIENT),
+    "http 503": (http_error(503), TRANSIENT),
+    "http 404": (http_error(404), REJECTED),
+    "connection": (requests.ConnectionError("reset"), TRANSIENT),
+    "timeout": (requests.ReadTimeout("read timeout"), TRANSIENT),
+    "async timeout": (asyncio.TimeoutError(), TRANSIENT),
+    "type error": (TypeError("unexpected keyword argument"), REJECTED),
+    "attribute error": (AttributeError("'NoneType' object has no attribute 'id'"), REJECTED),
+}
+
+
+@pytest.mark.parametrize("error, kind", ERRORS.values(), ids=ERRORS.keys())
+def test_classify_error(error, kind):
+    assert classify_error(error) == kind
+
+
+class BrokenBot:
+    def __init__(self):
+        self.calls = 0
+
+    def send_message(self, chat_id, text, **kwargs):
+        self.calls += 1
+        raise TypeError("send_message() got an unexpected keyword argument")
+
+
+def test_programming_error_is_not_retried(caplog):
+    bot = BrokenBot()
+    engine = BroadcastEngine(bot, workers=1, rate=1000, per_chat_interval=0)
+    stats = engine.broadcast([1], "text")
+    assert bot.calls == 1
+    assert stats.errors == {(REJECTED, "TypeError"): 1}
+    assert any(record.exc_info for record in caplog.records)
@@ -0,0 +1,72 @@
+import sqlite3
+import time
+from datetime import datetime
+
+import pytest
+
+from bot import checkpoints
+from bot.checkpoints import BroadcastJournal, reminder_slot_id
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "journal.db")
+
+
+def open_journal(path):
+    # Фоновый поток не мешает: тест сбрасывает прогресс через flush()
+    return BroadcastJournal(path, flush_interval=60)
+
+
+def test_interrupted_broadcast_resumes_from_cursor(path):
+    journal = open_journal(path)
+    record = journal.begin("2026-06-10 09:00", "💧")
+    journal.checkpoint(record, 500, sent=480, failed=20)
+    journal.checkpoint(record, 900, sent=870, failed=30)
+    journal.flush()
+    # Процесс упал до finish(): новый журнал видит рассылку с курсором
+    restarted = open_journal(path)
+    [resumed] = restarted.resumable(grace=3600)
+    assert (resumed.broadcast_id, resumed.text, resumed.cursor) == ("2026-06-10 09:00", "💧", 900)
+    assert (resumed.sent, resumed.failed) == (870, 30)
+    # Повторный begin того же слота продолжает, а не начинает заново
+    assert restarted.begin("2026-06-10 09:00", "💧").cursor == 900
+
+    restarted.checkpoint(resumed, None, sent=100, failed=0)
+    restarted.finish(resumed, sent=130, failed=0)
+    assert restarted.resumable(grace=3600) == []
+    assert restarted.begin("2026-06-10 09:00", "💧") is None
+
+
+def test_unflushed_progress_is_lost_not_corrupted(path):
+    journal = open_journal(path)
+    record = journal.begin("slot", "text")
+    journal.checkpoint(record, 100, sent=100, failed=0)
+    [resumed] = open_journal(path).resumable(grace=3600)
+    assert resumed.cursor is None
+
+
+def test_old_running_broadcast_expires(path):
+    journal = open_journal(path)
+    journal.begin("slot", "text")
+    time.sleep(0.01)
+    assert journal.resumable(grace=0) == []
+    assert journal.begin("slot", "text") is None
+
+
+def test_finished_rows_are_pruned_after_retention(path, monkeypatch):
+    journal = open_journal(path)
+    journal.finish(journal.begin("old", "text"), sent=1, failed=0)
+    journal.begin("running", "text")
+    monkeypatch.setattr(checkpoints, "JOURNAL_RETENTION", -1)
+    journal.begin("new", "text")
+    conn = sqlite3.connect(path)
+    ids = sorted(row[0] for row in conn.execute("SELECT id FROM broadcasts"))
+    conn.close()
+    assert ids == ["new", "running"]
+
+
+def test_test_slot_does_not_collide_with_schedule():
+    now = datetime(2026, 6, 10, 9, 0, 15)
+    assert reminder_slot_id(now=now) == "2026-06-10 09:00"
+    assert reminder_slot_id(test=True, now=now) == "test 2026-06-10 09:00:15"
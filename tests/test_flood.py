@@ -0,0 +1,58 @@
+import pytest
+
+from bot import flood as flood_module
+from bot.flood import FloodControl
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(flood_module.time, "monotonic", lambda: now[0])
+    return now
+
+
+def make_flood(**kwargs):
+    options = dict(chat_rate=100, chat_burst=100, global_rate=1000, duplicate_window=2.0)
+    options.update(kwargs)
+    return FloodControl(**options)
+
+
+def test_duplicate_inside_window_is_dropped(clock):
+    flood = make_flood()
+    assert flood.check(1, 1, "привет") is None
+    clock[0] += 1
+    assert flood.check(1, 1, "привет") == "duplicate"
+    assert flood.check(1, 1, "другое") is None
+    assert flood.check(2, 2, "привет") is None
+
+
+def test_duplicate_does_not_extend_window(clock):
+    # Тот же текст каждые 1.5 с: каждый второй проходит, окно не скользит
+    flood = make_flood()
+    results = []
+    for _ in range(6):
+        results.append(flood.check(1, 1, "вода"))
+        clock[0] += 1.5
+    assert results == [None, "duplicate", None, "duplicate", None, "duplicate"]
+
+
+def test_rate_limited_message_is_not_remembered(clock):
+    flood = make_flood(chat_rate=1, chat_burst=1)
+    assert flood.check(1, 1, "/sum 1 2") is None
+    assert flood.check(1, 1, "/max 1 2") == "chat"
+    clock[0] += 1
+    # Повтор отклоненного по лимиту сообщения - не дубль
+    assert flood.check(1, 1, "/max 1 2") is None
+
+
+def test_callbacks_skip_duplicate_check(clock):
+    flood = make_flood()
+    assert flood.check(1, 1) is None
+    assert flood.check(1, 1) is None
+    assert not flood.last_texts
+
+
+def test_admin_only_commands(clock):
+    flood = make_flood(admin_only={"test"}, admin_ids={42})
+    assert flood.check(1, 1, "/test") == "admin_only"
+    assert flood.check(42, 42, "/test") is None
@@ -0,0 +1,28 @@
+import pytest
+
+from utils.parsing import int_stats, parse_ints_from_text
+
+DOCUMENTS = {
+    "spaces and commas": ("1 2, -3,4", [1, 2, -3, 4]),
+    "semicolon csv": ("a;b;c\n1;-2;3\n4;5;6\n", [1, -2, 3, 4, 5, 6]),
+    "quoted csv": ('"id","value"\n"5","-7"\n"10",\'3\'\n', [5, -7, 10, 3]),
+    "tsv with stray quotes": ('x\t"y"\n1\t"2\n-3"\t4\n', [1, 2, -3, 4]),
+    "pipe separated": ("| 1 | 2 |\n|-3|4|", [1, 2, -3, 4]),
+    "numbers inside words are skipped": ("abc1 2x 3.5 7", [7]),
+}
+
+
+@pytest.mark.parametrize("text, expected", DOCUMENTS.values(), ids=DOCUMENTS.keys())
+def test_parse_documents(text, expected):
+    assert parse_ints_from_text(text) == expected
+    stats = int_stats(text.encode())
+    assert stats.count == len(expected)
+    assert stats.total == sum(expected)
+
+
+def test_blocks_split_on_csv_separators():
+    # Документ больше куска разбора: числа не должны рваться на стыках
+    values = list(range(-5000, 5000))
+    text = "\n".join(";".join(f'"{v}"' for v in values[i:i + 10]) for i in range(0, len(values), 10))
+    stats = int_stats(text)
+    assert (stats.count, stats.total, stats.minimum, stats.maximum) == (10000, sum(values), -5000, 4999)
@@ -0,0 +1,58 @@
+import json
+
+import pytest
+
+from bot.reminder_config import ConfigFile, ReminderConfig, describe_changes, load_reminder_config
+
+DEFAULT = ReminderConfig(["09:00", "13:00"], "Пора пить воду")
+
+
+def write(tmp_path, content):
+    path = tmp_path / "reminders.json"
+    path.write_text(content if isinstance(content, str) else json.dumps(content), encoding="utf-8")
+    return str(path)
+
+
+def test_missing_keys_come_from_default(tmp_path):
+    config = load_reminder_config(write(tmp_path, {"times": "18:00, 08:30"}), DEFAULT)
+    assert config.times == ("08:30", "18:00")
+    assert config.message == DEFAULT.message
+    assert load_reminder_config(write(tmp_path, {}), DEFAULT) == DEFAULT
+
+
+INVALID = {
+    "not json": "{times: 09:00",
+    "not an object": ["09:00"],
+    "times is a number": {"times": 900},
+    "times with a number": {"times": ["09:00", 13]},
+    "bad time": {"times": ["25:00"]},
+    "no times": {"times": []},
+    "message is a list": {"message": ["вода"]},
+    "empty message": {"message": "  "},
+}
+
+
+@pytest.mark.parametrize("content", INVALID.values(), ids=INVALID.keys())
+def test_invalid_file_raises_value_error(tmp_path, content):
+    with pytest.raises(ValueError):
+        load_reminder_config(write(tmp_path, content), DEFAULT)
+
+
+def test_missing_file_raises_value_error(tmp_path):
+    with pytest.raises(ValueError):
+        load_reminder_config(str(tmp_path / "absent.json"), DEFAULT)
+
+
+def test_describe_changes():
+    new = ReminderConfig(["09:00", "20:00"], "Выпейте стакан воды")
+    assert describe_changes(DEFAULT, new) == "добавлено 20:00; убрано 13:00; изменен текст"
+    assert describe_changes(DEFAULT, DEFAULT) == "без изменений"
+
+
+def test_config_file_changed(tmp_path):
+    path = write(tmp_path, {"times": ["09:00"]})
+    watched = ConfigFile(path)
+    assert watched.exists and not watched.changed()
+    write(tmp_path, {"times": ["09:00", "21:00"]})
+    assert watched.changed()
+    assert not watched.changed()
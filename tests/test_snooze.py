@@ -0,0 +1,53 @@
+from bot.snooze import SnoozeQueue
+
+
+def test_pop_due_in_time_order():
+    queue = SnoozeQueue()
+    queue.snooze(3, 30, now=1000)
+    queue.snooze(-100500, 10, now=1000)
+    queue.snooze(7, 20, now=1000)
+    assert queue.pop_due(now=1015) == [-100500]
+    assert queue.pop_due(now=1100) == [7, 3]
+    assert len(queue) == 0
+
+
+def test_snooze_again_moves_reminder():
+    queue = SnoozeQueue()
+    queue.snooze(1, 10, now=1000)
+    queue.snooze(1, 60, now=1000)
+    # Старый ключ остается в куче, но пропускается
+    assert queue.pop_due(now=1030) == []
+    assert queue.due_at(1) == 1060
+    assert queue.pop_due(now=1060) == [1]
+
+
+def test_cancel_and_limit():
+    queue = SnoozeQueue()
+    for chat_id in range(5):
+        queue.snooze(chat_id, 10, now=1000)
+    assert queue.cancel(2) and not queue.cancel(2)
+    assert queue.pop_due(now=1010, limit=2) == [0, 1]
+    assert queue.pop_due(now=1010) == [3, 4]
+
+
+def test_expired_and_bounded():
+    queue = SnoozeQueue(ttl=60, max_pending=2)
+    assert queue.snooze(1, 10, now=1000) == 1010
+    assert queue.snooze(2, 10, now=1000) == 1010
+    assert queue.snooze(3, 10, now=1000) is None
+    # Перенос уже отложенного чата в предел не упирается
+    assert queue.snooze(2, 20, now=1000) == 1020
+    assert queue.pop_due(now=1075) == [2]
+
+
+def test_persisted_between_restarts(tmp_path):
+    path = str(tmp_path / "snooze.db")
+    queue = SnoozeQueue(path, flush_interval=60)
+    queue.snooze(1, 600)
+    queue.snooze(2, 600)
+    queue.cancel(2)
+    queue.close()
+
+    restored = SnoozeQueue(path, flush_interval=60)
+    assert 1 in restored and 2 not in restored
+    restored.close()
@@ -0,0 +1,97 @@
+import sqlite3
+
+import pytest
+
+from bot import storage
+from bot.storage import MemorySubscriberStore, SQLiteSubscriberStore, SubscriberStore
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, "WRITE_RETRY_DELAY", 0)
+    store = SQLiteSubscriberStore(str(tmp_path / "subscribers.db"), flush_interval=0.01)
+    yield store
+    store.close()
+
+
+def test_incomplete_store_fails_on_creation():
+    class Partial(SubscriberStore):
+        def add(self, chat_id):
+            return True
+
+    with pytest.raises(TypeError):
+        Partial()
+    MemorySubscriberStore()
+
+
+def test_writes_reach_sqlite(store):
+    assert store.add(1) and store.add(2) and store.add(3)
+    assert not store.add(2)
+    assert store.discard(3)
+    store.flush()
+    assert list(store) == [1, 2]
+    assert len(store) == 2
+    assert not store.pending
+
+
+def test_transient_error_is_retried(store, monkeypatch):
+    insert = store._insert_batch
+    failures = [sqlite3.OperationalError("database is locked")]
+
+    def flaky(batch):
+        if failures:
+            raise failures.pop()
+        insert(batch)
+
+    monkeypatch.setattr(store, "_insert_batch", flaky)
+    store.add(1)
+    store.flush()
+    assert list(store) == [1]
+    assert 1 in store and len(store) == 1
+
+
+def test_failed_batch_is_rolled_back(store, monkeypatch):
+    store.add(1)
+    store.flush()
+
+    def broken(batch):
+        raise sqlite3.OperationalError("disk I/O error")
+
+    monkeypatch.setattr(store, "_insert_batch", broken)
+    store.add(2)
+    store.discard(1)
+    store.flush()
+    # Память снова совпадает с базой, которую читают рассылки
+    assert not store.pending
+    assert 1 in store and 2 not in store
+    assert len(store) == 1
+    assert list(store) == [1]
+
+
+def test_refresh_count_sees_other_processes(store):
+    for chat_id in range(5):
+        store.add(chat_id)
+    store.flush()
+    # Воркер bot.sharding отписывает недоступные чаты через свое соединение
+    conn = sqlite3.connect(store.path)
+    with conn:
+        conn.execute("DELETE FROM subscribers WHERE chat_id < 2")
+    conn.close()
+    store.add(10)
+    store.refresh_count()
+    assert len(store) == 4
+    store.flush()
+    assert list(store) == [2, 3, 4, 10]
+
+
+def test_discard_many_in_one_statement(store):
+    for chat_id in range(6):
+        store.add(chat_id)
+    store.flush()
+    store.add(10)
+    store.discard(5)
+    # 10 еще в очереди записи, 5 уже отписан, 99 не был подписан
+    assert store.discard_many([0, 1, 1, 5, 10, 99]) == 3
+    assert len(store) == 3
+    store.flush()
+    assert list(store) == [2, 3, 4]
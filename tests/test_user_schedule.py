@@ -0,0 +1,55 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from bot.user_schedule import CompiledSchedule, NextReminderReply, get_zone, next_local_slot, parse_times
+
+TIMES = ["09:00", "13:00", "15:00", "17:00", "23:00"]
+
+BOUNDARIES = {
+    "same day": (datetime(2026, 6, 10, 13, 0), datetime(2026, 6, 10, 15, 0)),
+    "end of month": (datetime(2026, 1, 31, 23, 30), datetime(2026, 2, 1, 9, 0)),
+    "end of february": (datetime(2026, 2, 28, 23, 1), datetime(2026, 3, 1, 9, 0)),
+    "leap day": (datetime(2028, 2, 28, 23, 1), datetime(2028, 2, 29, 9, 0)),
+    "end of year": (datetime(2026, 12, 31, 23, 59), datetime(2027, 1, 1, 9, 0)),
+}
+
+
+@pytest.mark.parametrize("now, expected", BOUNDARIES.values(), ids=BOUNDARIES.keys())
+def test_next_slot_crosses_calendar_boundaries(now, expected):
+    assert CompiledSchedule(TIMES).next_after(now) == expected
+
+
+def utc(*args):
+    return datetime(*args, tzinfo=timezone.utc)
+
+
+def test_next_local_slot_follows_dst_offset():
+    berlin = get_zone("Europe/Berlin")
+    minutes = parse_times(["09:00"])
+    # 29.03.2026 Берлин переходит с UTC+1 на UTC+2: 09:00 местного - это 07:00 UTC
+    assert next_local_slot(berlin, minutes, utc(2026, 3, 28, 12, 0)) == utc(2026, 3, 29, 7, 0)
+    assert next_local_slot(berlin, minutes, utc(2026, 3, 27, 12, 0)) == utc(2026, 3, 28, 8, 0)
+    # 25.10.2026 обратно на UTC+1
+    assert next_local_slot(berlin, minutes, utc(2026, 10, 24, 12, 0)) == utc(2026, 10, 25, 8, 0)
+
+
+def test_next_local_slot_inside_dst_gap_and_overlap():
+    berlin = get_zone("Europe/Berlin")
+    minutes = parse_times(["02:30"])
+    # 02:30 29.03 не существует: напоминание приходит один раз, в 01:30 UTC (03:30 летнего)
+    spring = next_local_slot(berlin, minutes, utc(2026, 3, 28, 12, 0))
+    assert spring == utc(2026, 3, 29, 1, 30)
+    assert next_local_slot(berlin, minutes, spring) == utc(2026, 3, 30, 0, 30)
+    # 02:30 25.10 бывает дважды: напоминание одно, по первому (летнему) времени
+    autumn = next_local_slot(berlin, minutes, utc(2026, 10, 24, 12, 0))
+    assert autumn == utc(2026, 10, 25, 0, 30)
+    assert next_local_slot(berlin, minutes, autumn) == utc(2026, 10, 26, 1, 30)
+
+
+def test_next_reply_is_cached_within_minute():
+    reply = NextReminderReply(CompiledSchedule(TIMES))
+    first = reply.get(datetime(2026, 6, 10, 12, 0, 5))
+    assert first == reply.get(datetime(2026, 6, 10, 12, 0, 59))
+    assert first[0] == datetime(2026, 6, 10, 13, 0)
+    assert reply.get(datetime(2026, 6, 10, 12, 1, 30))[1].startswith("Следующее напоминание через 0ч 58м")
@@ -0,0 +1,80 @@
+import http.client
+import json
+import threading
+
+import pytest
+
+from bot.webhook import UpdateDispatcher, WebhookServer
+
+
+class BlockedBot:
+    """Бот, который держит обработку, пока тест не отпустит event"""
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.processed = []
+
+    def process_new_updates(self, updates):
+        self.release.wait(5)
+        self.processed.extend(update.update_id for update in updates)
+
+
+def message(update_id, chat_id):
+    return {"update_id": update_id, "message": {
+        "message_id": update_id, "date": 0, "text": "hi",
+        "chat": {"id": chat_id, "type": "private"},
+        "from": {"id": chat_id, "is_bot": False, "first_name": "User"},
+    }}
+
+
+@pytest.fixture
+def server():
+    bot = BlockedBot()
+    dispatcher = UpdateDispatcher(bot, workers=1, queue_size=3)
+    webhook = WebhookServer(dispatcher, "127.0.0.1", 0, "/hook", secret_token="s3cret", max_body_size=4096)
+    thread = threading.Thread(target=webhook.serve_forever, daemon=True)
+    thread.start()
+    yield webhook, dispatcher, bot
+    bot.release.set()
+    webhook.shutdown()
+
+
+def post(webhook, body, secret="s3cret"):
+    conn = http.client.HTTPConnection("127.0.0.1", webhook.port, timeout=5)
+    headers = {"X-Telegram-Bot-Api-Secret-Token": secret} if secret else {}
+    conn.request("POST", "/hook", body=body, headers=headers)
+    status = conn.getresponse().status
+    conn.close()
+    return status
+
+
+@pytest.mark.parametrize("body", [
+    b"{}", b"[1]", b'"x"', b"null", b"not json",
+    json.dumps([message(1, 1), "x"]).encode(),
+    json.dumps({"update_id": 1, "message": {"message_id": 1, "chat": {"id": 1, "type": "private"}}}).encode(),
+])
+def test_bad_updates_get_400(server, body):
+    webhook, dispatcher, _ = server
+    assert post(webhook, body) == 400
+    assert dispatcher.queue_depth() == 0
+
+
+def test_secret_and_body_size(server):
+    webhook, _, _ = server
+    assert post(webhook, json.dumps(message(1, 1)).encode(), secret="wrong") == 403
+    assert post(webhook, json.dumps(message(1, 1)).encode(), secret=None) == 403
+    assert post(webhook, b" " * 5000) == 413
+
+
+def test_batch_is_accepted_whole_or_not_at_all(server):
+    webhook, dispatcher, bot = server
+    # Воркер держит первое обновление, в очереди остается место на 3
+    assert post(webhook, json.dumps(message(1, 1)).encode()) == 200
+    assert post(webhook, json.dumps([message(2, 1), message(3, 1)]).encode()) == 200
+    depth = dispatcher.queue_depth()
+    assert post(webhook, json.dumps([message(4, 1), message(5, 1), message(6, 1)]).encode()) == 503
+    assert dispatcher.queue_depth() == depth
+
+    bot.release.set()
+    dispatcher.join()
+    assert bot.processed == [1, 2, 3]
@@ -0,0 +1,214 @@
+import functools
+import inspect
+import threading
+import time
+
+from utils.logger import logger
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+
+def _labels_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(key, extra=None):
+    items = list(key) + (list(extra.items()) if extra else [])
+    if not items:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in items) + "}"
+
+
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+
+
+class Metrics:
+    """Счетчики, гистограммы и gauge в формате Prometheus"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+        self.gauges = {}
+        self.gauge_callbacks = {}
+
+    def inc(self, name, value=1, **labels):
+        key = (name, _labels_key(labels))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, value, buckets=LATENCY_BUCKETS, **labels):
+        key = (name, _labels_key(labels))
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    def set(self, name, value, **labels):
+        with self.lock:
+            self.gauges[(name, _labels_key(labels))] = value
+
+    def gauge(self, name, callback, **labels):
+        """Gauge, значение которого считается при каждом чтении метрик"""
+        self.gauge_callbacks[(name, _labels_key(labels))] = callback
+
+    def _gauge_values(self):
+        values = dict(self.gauges)
+        for (name, key), callback in list(self.gauge_callbacks.items()):
+            try:
+                values[(name, key)] = callback()
+            except Exception as e:
+                logger.error("Ошибка чтения метрики %s: %s", name, e)
+        return values
+
+    def render(self):
+        """Текстовый формат Prometheus для /metrics"""
+        lines = []
+        with self.lock:
+            counters = sorted(self.counters.items())
+            histograms = sorted(self.histograms.items(), key=lambda item: item[0])
+            gauges = sorted(self._gauge_values().items())
+            for (name, key), histogram in histograms:
+                cumulative = 0
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{_format_labels(key, {'le': bound})} {cumulative}")
+                lines.append(f"{name}_bucket{_format_labels(key, {'le': '+Inf'})} {histogram.count}")
+                lines.append(f"{name}_sum{_format_labels(key)} {histogram.sum:.6f}")
+                lines.append(f"{name}_count{_format_labels(key)} {histogram.count}")
+        for (name, key), value in counters:
+            lines.append(f"{name}{_format_labels(key)} {value}")
+        for (name, key), value in gauges:
+            lines.append(f"{name}{_format_labels(key)} {value}")
+        return "\n".join(lines) + "\n"
+
+    def summary(self):
+        """Короткая сводка для админской команды"""
+        lines = []
+        with self.lock:
+            histograms = sorted(self.histograms.items(), key=lambda item: item[0])
+            counters = sorted(self.counters.items())
+            gauges = sorted(self._gauge_values().items())
+            for (name, key), histogram in histograms:
+                avg = histogram.sum / histogram.count * 1000 if histogram.count else 0.0
+                lines.append(
+                    f"{name}{_format_labels(key)}: n={histogram.count}, "
+                    f"avg={avg:.1f} мс, max={histogram.max * 1000:.1f} мс"
+                )
+        for (name, key), value in counters + gauges:
+            lines.append(f"{name}{_format_labels(key)} = {value}")
+        return "\n".join(lines) or "Метрик пока нет"
+
+
+metrics = Metrics()
+
+
+def _timed(handler, label, registry):
+    if inspect.iscoroutinefunction(handler):
+        @functools.wraps(handler)
+        async def timed_async(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await handler(*args, **kwargs)
+            except Exception as e:
+                registry.inc("bot_handler_errors_total", command=label, error=type(e).__name__)
+                raise
+            finally:
+                registry.observe("bot_handler_latency_seconds", time.perf_counter() - start, command=label)
+        return timed_async
+
+    @functools.wraps(handler)
+    def timed(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return handler(*args, **kwargs)
+        except Exception as e:
+            registry.inc("bot_handler_errors_total", command=label, error=type(e).__name__)
+            raise
+        finally:
+            registry.observe("bot_handler_latency_seconds", time.perf_counter() - start, command=label)
+    return timed
+
+
+def instrument_bot(bot, registry=metrics):
+    """Оборачивает декораторы message_handler и callback_query_handler бота,
+    чтобы каждый зарегистрированный обработчик замерялся по своей команде.
+    Вызывать до регистрации обработчиков."""
+    if getattr(bot, "metrics_instrumented", False):
+        return bot
+
+    def wrap(register):
+        @functools.wraps(register)
+        def decorator_factory(*args, **kwargs):
+            decorator = register(*args, **kwargs)
+            commands = kwargs.get("commands")
+
+            def wrapper(handler):
+                label = commands[0] if commands else handler.__name__
+                decorator(_timed(handler, label, registry))
+                return handler
+            return wrapper
+        return decorator_factory
+
+    bot.message_handler = wrap(bot.message_handler)
+    bot.callback_query_handler = wrap(bot.callback_query_handler)
+    bot.metrics_instrumented = True
+    return bot
+
+
+class MetricsServer:
+    """Локальный HTTP-эндпоинт GET /metrics"""
+
+    def __init__(self, registry=metrics, host="127.0.0.1", port=9108):
+        # http.server нужен только при включенных метриках
+        from http.server import ThreadingHTTPServer
+
+        self.registry = registry
+        self.server = ThreadingHTTPServer((host, port), self._make_handler())
+        self.server.daemon_threads = True
+
+    def _make_handler(self):
+        from http.server import BaseHTTPRequestHandler
+
+        registry = self.registry
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path != "/metrics":
+                    self.send_response(404)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                body = registry.render().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        thread = threading.Thread(target=self.server.serve_forever, name="metrics", daemon=True)
+        thread.start()
+        logger.info("Метрики доступны на порту %s", self.server.server_address[1])
+        return self
@@ -0,0 +1,130 @@
+import re
+
+# Целое число отдельным токеном с необязательным минусом. Разделители - пробелы
+# и обычные для CSV/TSV символы: запятая, точка с запятой, табуляция, "|" и
+# кавычки вокруг полей ("5", '5'). Длина ограничена, чтобы int() не упирался
+# в лимит длины строки Python
+SEPARATORS = " \t\r\n,;|\"'"
+INT_PATTERN = r"(?<![^\s,;|\"'])-?\d{1,1000}(?![^\s,;|\"'])"
+INT_RE = re.compile(INT_PATTERN)
+INT_RE_BYTES = re.compile(INT_PATTERN.encode())
+
+# Сколько чисел показывать в ответе целиком; больше - только итоги
+ECHO_LIMIT = 20
+TELEGRAM_TEXT_LIMIT = 4096
+# Размер куска, который int_stats разбирает за раз
+PARSE_BLOCK = 16 * 1024
+
+
+class IntStats:
+    """Итоги по потоку чисел за один проход"""
+
+    def __init__(self, count=0, total=0, minimum=None, maximum=None, head=()):
+        self.count = count
+        self.total = total
+        self.minimum = minimum
+        self.maximum = maximum
+        self.head = list(head)
+
+    @property
+    def mean(self):
+        if not self.count:
+            return None
+        try:
+            return self.total / self.count
+        except OverflowError:
+            return self.total // self.count
+
+    @property
+    def complete(self):
+        """Все числа поместились в head и их можно перечислить в ответе"""
+        return self.count <= len(self.head)
+
+
+def iter_ints(data):
+    """Целые числа из str или bytes по мере нахождения, без промежуточных списков.
+    bytes, bytearray и mmap разбираются без копирования в строку."""
+    regex = INT_RE if isinstance(data, str) else INT_RE_BYTES
+    for match in regex.finditer(data):
+        yield int(match.group())
+
+
+def _blocks(data, size=PARSE_BLOCK):
+    """Границы (pos, endpos) кусков data примерно по size, разрезанных по разделителю,
+    чтобы число не попало на стык"""
+    separators = tuple(SEPARATORS) if isinstance(data, str) else tuple(sep.encode() for sep in SEPARATORS)
+    length = len(data)
+    pos = 0
+    while pos < length:
+        end = pos + size
+        if end >= length:
+            yield pos, length
+            return
+        cut = max(data.rfind(sep, pos, end) for sep in separators)
+        if cut <= pos:
+            found = [i for i in (data.find(sep, end) for sep in separators) if i >= 0]
+            cut = min(found) if found else length
+        yield pos, cut
+        pos = cut
+
+
+def int_stats(data, keep=ECHO_LIMIT):
+    """Количество, сумма, минимум и максимум чисел в data за один проход;
+    первые keep чисел сохраняются для ответа.
+
+    Регулярное выражение идет по исходному буферу через pos/endpos без копий,
+    список чисел существует только для одного куска, а сумма и экстремумы
+    считаются встроенными функциями."""
+    regex = INT_RE if isinstance(data, str) else INT_RE_BYTES
+    count = total = 0
+    minimum = maximum = None
+    head = []
+    for pos, endpos in _blocks(data):
+        values = list(map(int, regex.findall(data, pos, endpos)))
+        if not values:
+            continue
+        if len(head) < keep:
+            head.extend(values[:keep - len(head)])
+        low, high = min(values), max(values)
+        if count:
+            minimum, maximum = min(minimum, low), max(maximum, high)
+        else:
+            minimum, maximum = low, high
+        count += len(values)
+        total += sum(values)
+    return IntStats(count, total, minimum, maximum, head)
+
+
+def parse_ints_from_text(text: str) -> list[int]:
+    return list(iter_ints(text))
+
+
+def format_stats(stats):
+    mean = stats.mean
+    mean_text = f"{mean:.4g}" if isinstance(mean, float) else str(mean)
+    return (
+        f"Чисел: {stats.count}\n"
+        f"Сумма: {stats.total}\n"
+        f"Минимум: {stats.minimum}\n"
+        f"Максимум: {stats.maximum}\n"
+        f"Среднее: {mean_text}"
+    )
+
+
+def numbers_reply(command, stats):
+    """Ответ на /sum или /max; длинный ввод не перечисляется, а сводится к итогам"""
+    text = None
+    if command == "sum" and stats.complete:
+        text = f"Сумма чисел {stats.head} = {stats.total}"
+    elif command == "max" and stats.complete:
+        text = f"Максимум чисел {stats.head} = {stats.maximum}"
+    if text is None or len(text) > TELEGRAM_TEXT_LIMIT:
+        text = format_stats(stats)
+    return fit_message(text)
+
+
+def fit_message(text, limit=TELEGRAM_TEXT_LIMIT):
+    """Обрезает ответ до лимита длины сообщения Telegram"""
+    if len(text) <= limit:
+        return text
+    return text[:limit - 1] + "…"
@@ -0,0 +1,67 @@
+import builtins
+import contextlib
+import sys
+import time
+
+
+class StartupProfile:
+    """Отчет для --profile-startup: время этапов запуска и импортов.
+
+    stage(name) замеряет этап инициализации. trace_imports() подменяет
+    builtins.__import__ и считает собственное время каждого впервые
+    загружаемого модуля (без вложенных импортов), время суммируется по
+    пакету верхнего уровня: telebot, requests, bot и т.д."""
+
+    def __init__(self, started=None):
+        self.started = time.perf_counter() if started is None else started
+        self.stages = []
+        self.imports = {}
+        self.children = []
+        self.original_import = None
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages.append((name, time.perf_counter() - start))
+
+    def _import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        if level or name in sys.modules:
+            return self.original_import(name, globals, locals, fromlist, level)
+        self.children.append(0.0)
+        start = time.perf_counter()
+        try:
+            return self.original_import(name, globals, locals, fromlist, level)
+        finally:
+            elapsed = time.perf_counter() - start
+            own = elapsed - self.children.pop()
+            if self.children:
+                self.children[-1] += elapsed
+            package = name.partition(".")[0]
+            self.imports[package] = self.imports.get(package, 0.0) + own
+
+    def trace_imports(self):
+        if self.original_import is None:
+            self.original_import = builtins.__import__
+            builtins.__import__ = self._import
+        return self
+
+    def stop_tracing(self):
+        if self.original_import is not None:
+            builtins.__import__ = self.original_import
+            self.original_import = None
+
+    def report(self, top=10):
+        total = time.perf_counter() - self.started
+        lines = [f"Запуск: {total * 1000:.1f} мс", "", "Этапы:"]
+        for name, seconds in self.stages:
+            lines.append(f"  {name:<24} {seconds * 1000:8.1f} мс")
+        if self.imports:
+            lines += ["", f"Импорты (собственное время, топ {top}):"]
+            ranked = sorted(self.imports.items(), key=lambda item: item[1], reverse=True)
+            for package, seconds in ranked[:top]:
+                lines.append(f"  {package:<24} {seconds * 1000:8.1f} мс")
+            lines.append(f"  {'всего':<24} {sum(self.imports.values()) * 1000:8.1f} мс")
+        return "\n".join(lines)